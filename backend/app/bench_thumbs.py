@@ -0,0 +1,87 @@
+"""Compare still-image thumbnail throughput: in-process Pillow vs. an ffmpeg process per image.
+
+Run inside the API container (or anywhere with Pillow and ffmpeg):
+
+    python -m app.bench_thumbs /images --width 480 --workers 4
+
+Directories are searched recursively for images; each engine thumbnails
+the same files with the same number of concurrent workers.
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .imaging import Thumbnailer
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+def _collect(paths: list[str], limit: int) -> list[Path]:
+    files: list[Path] = []
+    for arg in paths:
+        p = Path(arg)
+        candidates = sorted(p.rglob("*")) if p.is_dir() else [p]
+        files += [f for f in candidates if f.is_file() and f.suffix.lower() in IMAGE_EXTS]
+    return files[:limit] if limit else files
+
+
+def _ffmpeg_thumb(src: Path, width: int, out_dir: Path, i: int) -> bool:
+    out = out_dir / f"{i}.jpg"
+    res = subprocess.run(
+        ["ffmpeg", "-y", "-i", str(src), "-vf", f"scale='min({width},iw)':-2", "-q:v", "4", str(out)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=False,
+    )
+    return res.returncode == 0 and out.exists()
+
+
+def _run(name: str, fn, files: list[Path], workers: int) -> None:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        ok = sum(1 for result in pool.map(fn, range(len(files)), files) if result)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<8} {ok}/{len(files)} ok  {elapsed:8.2f}s  "
+        f"{len(files) / elapsed:8.1f} img/s  {elapsed / len(files) * 1000:7.1f} ms/img"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="image files or directories")
+    parser.add_argument("--width", type=int, default=480)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=200, help="max images (0 = all)")
+    args = parser.parse_args(argv)
+
+    files = _collect(args.paths, args.limit)
+    if not files:
+        print("No images found", file=sys.stderr)
+        return 1
+    total_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
+    print(f"{len(files)} images ({total_mb:.1f} MB), width {args.width}, {args.workers} workers")
+
+    thumbnailer = Thumbnailer(args.workers)
+    if thumbnailer.available:
+        _run("pillow", lambda i, f: thumbnailer.render(f, args.width) is not None, files, args.workers)
+    else:
+        print("pillow   not installed")
+    if shutil.which("ffmpeg"):
+        with tempfile.TemporaryDirectory(prefix="bench_thumbs_") as tmp:
+            _run("ffmpeg", lambda i, f: _ffmpeg_thumb(f, args.width, Path(tmp), i), files, args.workers)
+    else:
+        print("ffmpeg   not installed")
+    thumbnailer.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
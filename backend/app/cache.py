@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+
+class CacheArea:
+    """One cache directory kept within a byte and file-count budget.
+
+    Files are tracked in least-recently-used order: `hit`/`add` move a file
+    to the recent end, `evict` deletes from the other end until the area is
+    back under budget. The index lives in memory and is rebuilt from the
+    directory by `load` (seeded with st_atime), so it also picks up files
+    written or removed by other processes. A budget of 0 means unlimited.
+
+    Files used within the last `min_age` seconds are never evicted, so a
+    thumbnail that was just generated or is being served stays put.
+    Hidden files (in-progress `.partial` writes) are ignored.
+
+    With `dirs=True` the unit is a first-level subdirectory instead of a file
+    (e.g. an HLS rendition and its segments): any path inside it counts as a
+    use of the whole directory, and eviction removes it as a unit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        root: Path,
+        max_bytes: int = 0,
+        max_files: int = 0,
+        min_age: float = 60.0,
+        dirs: bool = False,
+    ):
+        self.name = name
+        self.root = Path(root)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_files = max(0, int(max_files))
+        self.min_age = min_age
+        self.dirs = dirs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        # path -> (size, last access as time.time())
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    def owns(self, path: Path | str) -> bool:
+        return os.fspath(path).startswith(os.fspath(self.root) + os.sep)
+
+    def _key(self, path: Path | str) -> str:
+        key = os.fspath(path)
+        if self.dirs:
+            root = os.fspath(self.root) + os.sep
+            if key.startswith(root):
+                return root + key[len(root):].split(os.sep, 1)[0]
+        return key
+
+    def _usage(self, key: str) -> tuple[int, float]:
+        """(size, last access) of a cache unit; raises OSError if it's gone."""
+        st = os.stat(key)
+        if not self.dirs:
+            return int(st.st_size), max(st.st_atime, st.st_mtime)
+        size, atime = 0, max(st.st_atime, st.st_mtime)
+        for dirpath, _, filenames in os.walk(key):
+            for name in filenames:
+                try:
+                    fst = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                size += int(fst.st_size)
+                atime = max(atime, fst.st_atime, fst.st_mtime)
+        return size, atime
+
+    def _scan(self):
+        if self.dirs:
+            try:
+                with os.scandir(self.root) as it:
+                    yield from (e.path for e in it if e.is_dir() and not e.name.startswith("."))
+            except FileNotFoundError:
+                pass
+            return
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                if not name.startswith("."):
+                    yield os.path.join(dirpath, name)
+
+    def load(self) -> None:
+        """(Re)build the index from what is on disk."""
+        started = time.time()
+        found = []
+        for path in self._scan():
+            try:
+                size, atime = self._usage(path)
+            except OSError:
+                continue
+            found.append((atime, path, size))
+        found.sort()
+
+        with self._lock:
+            # Keep the in-memory recency of files we already know about, and
+            # files added while the walk was running.
+            entries = OrderedDict((path, (size, atime)) for atime, path, size in found)
+            for path, (size, atime) in self._entries.items():
+                if path in entries:
+                    if atime > entries[path][1]:
+                        entries[path] = (entries[path][0], atime)
+                elif atime >= started:
+                    entries[path] = (size, atime)
+            self._entries = OrderedDict(sorted(entries.items(), key=lambda kv: kv[1][1]))
+            self.bytes = sum(size for size, _ in self._entries.values())
+
+    def hit(self, path: Path | str) -> None:
+        with self._lock:
+            self.hits += 1
+        self.touch(path)
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def touch(self, path: Path | str) -> None:
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], time.time())
+                self._entries.move_to_end(key)
+                return
+        self.add(path)
+
+    def add(self, path: Path | str) -> None:
+        """Record a file that was just written (or replaced)."""
+        key = self._key(path)
+        try:
+            size, _ = self._usage(key)
+        except OSError:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[0]
+            self._entries[key] = (size, time.time())
+            self.bytes += size
+
+    def discard(self, path: Path | str) -> None:
+        with self._lock:
+            old = self._entries.pop(self._key(path), None)
+            if old is not None:
+                self.bytes -= old[0]
+
+    def over_budget(self) -> bool:
+        return bool(
+            (self.max_bytes and self.bytes > self.max_bytes)
+            or (self.max_files and len(self._entries) > self.max_files)
+        )
+
+    def evict(self) -> int:
+        """Delete least-recently-used files until within budget. Returns the count."""
+        evicted = 0
+        cutoff = time.time() - self.min_age
+        while True:
+            with self._lock:
+                if not self.over_budget() or not self._entries:
+                    break
+                key, (size, atime) = next(iter(self._entries.items()))
+                if atime > cutoff:
+                    break  # everything left was used just now; try again later
+                del self._entries[key]
+                self.bytes -= size
+            try:
+                if self.dirs:
+                    shutil.rmtree(key)
+                else:
+                    os.unlink(key)
+            except FileNotFoundError:
+                continue  # already gone (superseded variant, cleared cache)
+            except OSError:
+                log.warning("Could not evict cached file %s", key, exc_info=True)
+                continue
+            evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "root": str(self.root),
+                "bytes": self.bytes,
+                "files": len(self._entries),
+                "max_bytes": self.max_bytes or None,
+                "max_files": self.max_files or None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+class CacheManager:
+    """Runs eviction for a set of CacheAreas on a background thread.
+
+    `add` wakes the thread when an area goes over budget; every
+    `rescan_interval` seconds all areas are re-read from disk to account for
+    files changed outside this process.
+    """
+
+    def __init__(self, areas: list[CacheArea], rescan_interval: float = 600.0):
+        self.areas = {area.name: area for area in areas}
+        self.rescan_interval = rescan_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def area_for(self, path: Path | str) -> CacheArea | None:
+        for area in self.areas.values():
+            if area.owns(path):
+                return area
+        return None
+
+    def hit(self, path: Path | str) -> None:
+        area = self.area_for(path)
+        if area is not None:
+            area.hit(path)
+
+    def miss(self, path: Path | str) -> None:
+        area = self.area_for(path)
+        if area is not None:
+            area.miss()
+
+    def add(self, path: Path | str) -> None:
+        area = self.area_for(path)
+        if area is not None:
+            area.add(path)
+            if area.over_budget():
+                self._wake.set()
+
+    def discard(self, path: Path | str) -> None:
+        area = self.area_for(path)
+        if area is not None:
+            area.discard(path)
+
+    def rescan(self) -> None:
+        for area in self.areas.values():
+            try:
+                area.load()
+            except Exception:
+                log.exception("Scanning cache area %s failed", area.name)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="cache-evictor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {name: area.stats() for name, area in self.areas.items()}
+
+    def _loop(self) -> None:
+        self.rescan()
+        last_scan = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_scan >= self.rescan_interval:
+                self.rescan()
+                last_scan = time.monotonic()
+            for area in self.areas.values():
+                try:
+                    if area.evict():
+                        log.info("Evicted cached files from %s", area.name)
+                except Exception:
+                    log.exception("Evicting from cache area %s failed", area.name)
+            # Re-check periodically too: entries protected by min_age become evictable.
+            self._wake.wait(timeout=min(self.rescan_interval, 60.0))
+            self._wake.clear()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+PLAYLIST = "index.m3u8"
+
+
+class HlsBusy(Exception):
+    """Raised when a rendition needs a transcode and all transcode slots are taken."""
+
+
+class _Session:
+    def __init__(self, proc: subprocess.Popen, transcode: bool):
+        self.proc = proc
+        self.transcode = transcode
+        self.last_access = time.monotonic()
+
+
+class HlsPackager:
+    """Runs ffmpeg HLS packagers, at most one per rendition directory.
+
+    ffmpeg writes an EVENT playlist and its segments into the directory as it
+    goes (segments are renamed into place once complete), so players can start
+    while the rest is still being produced. A finished rendition has
+    `#EXT-X-ENDLIST` in its playlist and is served from disk from then on; an
+    unfinished one without a running packager (stopped while idle, killed,
+    crashed) is started over from scratch; after ffmpeg fails on an input it
+    is not retried for `idle_timeout` seconds.
+
+    Runs that transcode video are capped at `max_transcodes`; stream-copy
+    remuxes are cheap and not limited. A session nobody has requested anything
+    from for `idle_timeout` seconds is stopped. `on_finish(out_dir)` is called
+    whenever a session ends, e.g. to account the directory's final size.
+    """
+
+    def __init__(
+        self,
+        segment_seconds: int = 6,
+        idle_timeout: float = 60.0,
+        max_transcodes: int = 2,
+        on_finish: Callable[[Path], None] | None = None,
+    ):
+        self.segment_seconds = segment_seconds
+        self.idle_timeout = idle_timeout
+        self.on_finish = on_finish
+        self._transcodes = threading.BoundedSemaphore(max(1, max_transcodes))
+        self._lock = threading.Lock()
+        self._sessions: dict[str, _Session] = {}
+        self._failed: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._reaper: threading.Thread | None = None
+
+    @staticmethod
+    def complete(out_dir: Path) -> bool:
+        try:
+            with open(out_dir / PLAYLIST, "rb") as fh:
+                fh.seek(max(0, os.fstat(fh.fileno()).st_size - 64))
+                return b"#EXT-X-ENDLIST" in fh.read()
+        except OSError:
+            return False
+
+    def running(self, out_dir: Path) -> bool:
+        with self._lock:
+            session = self._sessions.get(os.fspath(out_dir))
+            return session is not None and session.proc.poll() is None
+
+    def ensure(self, out_dir: Path, input_args: list[str], transcode: bool) -> None:
+        """Make sure `out_dir` is finished or being produced; raises HlsBusy."""
+        key = os.fspath(out_dir)
+        self._reap_exited()  # frees the slots of runs that finished since the last sweep
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                session.last_access = time.monotonic()
+                return
+            if self.complete(out_dir):
+                return
+            if time.monotonic() - self._failed.get(key, float("-inf")) < self.idle_timeout:
+                return
+            self._failed.pop(key, None)
+            if transcode and not self._transcodes.acquire(blocking=False):
+                raise HlsBusy()
+            try:
+                shutil.rmtree(out_dir, ignore_errors=True)
+                out_dir.mkdir(parents=True, exist_ok=True)
+                proc = subprocess.Popen(
+                    [
+                        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                        *input_args,
+                        "-f", "hls",
+                        "-hls_time", str(self.segment_seconds),
+                        "-hls_playlist_type", "event",
+                        "-hls_flags", "temp_file+independent_segments",
+                        "-hls_segment_filename", str(out_dir / "seg_%05d.ts"),
+                        str(out_dir / PLAYLIST),
+                    ],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            except Exception:
+                if transcode:
+                    self._transcodes.release()
+                raise
+            self._sessions[key] = _Session(proc, transcode)
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._loop, name="hls-reaper", daemon=True)
+                self._reaper.start()
+
+    def touch(self, out_dir: Path) -> None:
+        with self._lock:
+            session = self._sessions.get(os.fspath(out_dir))
+            if session is not None:
+                session.last_access = time.monotonic()
+
+    def wait_for(self, path: Path, out_dir: Path, timeout: float) -> bool:
+        """Wait until `path` exists; gives up early once the packager has stopped."""
+        deadline = time.monotonic() + timeout
+        while not path.exists():
+            if time.monotonic() >= deadline or not self.running(out_dir):
+                return path.exists()
+            time.sleep(0.2)
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            keys = list(self._sessions)
+        for key in keys:
+            self._end(key, kill=True)
+
+    def _end(self, key: str, kill: bool = False) -> None:
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if session is not None and not kill and session.proc.returncode:
+                self._failed[key] = time.monotonic()
+        if session is None:
+            return
+        if kill and session.proc.poll() is None:
+            session.proc.terminate()
+            try:
+                session.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                session.proc.kill()
+                session.proc.wait()
+        if session.transcode:
+            self._transcodes.release()
+        if self.on_finish is not None:
+            try:
+                self.on_finish(Path(key))
+            except Exception:
+                log.exception("HLS finish callback failed for %s", key)
+
+    def _reap_exited(self) -> None:
+        with self._lock:
+            exited = [key for key, session in self._sessions.items() if session.proc.poll() is not None]
+        for key in exited:
+            self._end(key)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(timeout=5.0):
+            self._reap_exited()
+            now = time.monotonic()
+            with self._lock:
+                sessions = list(self._sessions.items())
+            for key, session in sessions:
+                if now - session.last_access > self.idle_timeout:
+                    log.info("Stopping idle HLS packager for %s", key)
+                    self._end(key, kill=True)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, engine
+from .models import Job, JobEvent
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Event logs are kept for this many of the most recent finished jobs.
+KEEP_FINISHED_JOB_EVENTS = 20
+
+# How often a running job re-reads cancel_requested from the DB (covers a
+# DELETE handled by another API process).
+CANCEL_POLL_SECONDS = 2.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# emit(message, data) records a progress event and raises JobCancelled when
+# the job has been cancelled.
+Emit = Callable[[str, "dict | None"], None]
+Handler = Callable[[Session, dict, Emit], None]
+
+_handlers: dict[str, Handler] = {}
+_cancel_events: dict[int, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def register(kind: str, handler: Handler) -> None:
+    """Register the function that runs jobs of `kind`.
+
+    The handler gets its own Session, the job params and an emit callback.
+    It should be safe to re-run from scratch: interrupted jobs are resumed by
+    running them again.
+    """
+    _handlers[kind] = handler
+
+
+def job_to_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params) if job.params else {},
+        "progress": json.loads(job.progress) if job.progress else None,
+        "error": job.error,
+        "cancel_requested": bool(job.cancel_requested),
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def active_job(db: Session, kind: str) -> Job | None:
+    return db.execute(
+        select(Job).where(Job.kind == kind, Job.status.in_(ACTIVE_STATUSES))
+    ).scalar_one_or_none()
+
+
+def submit(db: Session, kind: str, params: dict | None = None) -> tuple[Job, bool]:
+    """Queue a job and start its worker thread.
+
+    Returns (job, created). If a job of the same kind is already queued or
+    running, that job is returned instead with created=False.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    existing = active_job(db, kind)
+    if existing:
+        return existing, False
+
+    _prune_events(db)
+    job = Job(kind=kind, status="queued", params=json.dumps(params or {}))
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with another request/process (uq_jobs_active_kind).
+        db.rollback()
+        existing = active_job(db, kind)
+        if existing:
+            return existing, False
+        raise
+    db.refresh(job)
+    _start(job.id)
+    return job, True
+
+
+def cancel(db: Session, job_id: int) -> Job | None:
+    """Request cancellation. Queued jobs are cancelled immediately."""
+    job = db.get(Job, job_id)
+    if not job:
+        return None
+    if job.status in FINISHED_STATUSES:
+        return job
+
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(status="cancelled", cancel_requested=True, finished_at=datetime.utcnow())
+    )
+    db.execute(update(Job).where(Job.id == job_id).values(cancel_requested=True))
+    db.commit()
+    with _lock:
+        ev = _cancel_events.get(job_id)
+    if ev:
+        ev.set()
+    db.refresh(job)
+    return job
+
+
+def events_after(db: Session, job_id: int, after_id: int, limit: int = 500) -> list[tuple[int, str]]:
+    return [
+        (int(event_id), payload)
+        for event_id, payload in db.execute(
+            select(JobEvent.id, JobEvent.payload)
+            .where(JobEvent.job_id == job_id, JobEvent.id > after_id)
+            .order_by(JobEvent.id.asc())
+            .limit(limit)
+        )
+    ]
+
+
+def _prune_events(db: Session) -> None:
+    keep = (
+        select(Job.id)
+        .where(Job.status.in_(FINISHED_STATUSES))
+        .order_by(Job.id.desc())
+        .limit(KEEP_FINISHED_JOB_EVENTS)
+    )
+    db.execute(
+        delete(JobEvent).where(
+            JobEvent.job_id.in_(select(Job.id).where(Job.status.in_(FINISHED_STATUSES))),
+            JobEvent.job_id.not_in(keep),
+        )
+    )
+
+
+def resume_interrupted() -> None:
+    """Restart jobs left queued/running by a process that is no longer alive.
+
+    A running job holds a session-level advisory lock on its id, so being
+    able to take that lock means its worker is gone.
+    """
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Job.id, Job.status).where(Job.status.in_(ACTIVE_STATUSES))
+        ).all()
+
+    for job_id, status in rows:
+        with engine.connect() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": int(job_id)}).scalar():
+                continue
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": int(job_id)})
+        if status == "running":
+            with SessionLocal() as db:
+                db.execute(
+                    update(Job).where(Job.id == job_id, Job.status == "running").values(status="queued")
+                )
+                db.commit()
+        _start(int(job_id))
+
+
+def _start(job_id: int) -> None:
+    with _lock:
+        if job_id in _cancel_events:
+            return
+        _cancel_events[job_id] = threading.Event()
+    threading.Thread(target=_run, args=(job_id,), name=f"job-{job_id}", daemon=True).start()
+
+
+def _run(job_id: int) -> None:
+    cancel_event = _cancel_events[job_id]
+    try:
+        with engine.connect() as lock_conn:
+            if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": job_id}).scalar():
+                return  # another process is already running it
+            lock_conn.commit()  # the lock is session-level; don't sit idle in a transaction
+            try:
+                _run_locked(job_id, cancel_event)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": job_id})
+                lock_conn.commit()
+    finally:
+        with _lock:
+            _cancel_events.pop(job_id, None)
+
+
+def _run_locked(job_id: int, cancel_event: threading.Event) -> None:
+    with SessionLocal() as ev_db:
+        claimed = ev_db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued", Job.cancel_requested.is_(False))
+            .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+            .returning(Job.kind, Job.params, Job.attempts)
+        ).first()
+        ev_db.commit()
+        if not claimed:
+            return
+        kind, params, attempts = claimed
+
+        last_poll = time.monotonic()
+
+        def emit(message: str, data: dict | None = None) -> None:
+            nonlocal last_poll
+            payload = {"timestamp": datetime.utcnow().isoformat(), "message": message, "job_id": job_id}
+            if data:
+                payload.update(data)
+            encoded = json.dumps(payload)
+            ev_db.add(JobEvent(job_id=job_id, payload=encoded))
+            ev_db.execute(update(Job).where(Job.id == job_id).values(progress=encoded))
+            ev_db.commit()
+
+            if not cancel_event.is_set() and time.monotonic() - last_poll >= CANCEL_POLL_SECONDS:
+                last_poll = time.monotonic()
+                if ev_db.execute(select(Job.cancel_requested).where(Job.id == job_id)).scalar():
+                    cancel_event.set()
+            if cancel_event.is_set():
+                raise JobCancelled()
+
+        status, error = "completed", None
+        try:
+            if attempts > 1:
+                emit(f"Resuming interrupted job (attempt {attempts})", {"phase": "resume"})
+            with SessionLocal() as db:
+                try:
+                    _handlers[kind](db, json.loads(params or "{}"), emit)
+                except BaseException:
+                    db.rollback()
+                    raise
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", f"{e}\n{traceback.format_exc()}"
+
+        final = {"phase": status}
+        if error:
+            final["error"] = str(error).splitlines()[0]
+        ev_db.rollback()
+        ev_db.add(JobEvent(job_id=job_id, payload=json.dumps(
+            {"timestamp": datetime.utcnow().isoformat(), "message": f"Job {status}", "job_id": job_id, **final}
+        )))
+        ev_db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status=status, error=error, finished_at=datetime.utcnow())
+        )
+        ev_db.commit()
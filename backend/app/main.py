@@ -1,25 +1,50 @@
+import asyncio
+import base64
 import csv
 import io
+import json
+import logging
 import os
+import time
 import subprocess
 import zipfile
 import hashlib
 import mimetypes
 import shutil
+import secrets
 import tempfile
+import threading
+import urllib.parse
 import urllib.request
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import re
+from contextlib import closing, contextmanager
+from email.utils import formatdate
 from pathlib import Path
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Query, Form
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Query, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, insert, update, text, true, tuple_, literal_column, literal, cast, union_all, event, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pydantic import BaseModel
 
-from .db import Base, engine, get_db
-from .models import Performer, AppSetting, MediaItem, PerformerMedia
+from . import jobs
+from .cache import CacheArea, CacheManager
+from .hls import PLAYLIST as HLS_PLAYLIST, HlsBusy, HlsPackager
+from .imaging import Thumbnailer
+from .db import Base, SessionLocal, engine, get_db
+from .models import Performer, AppSetting, MediaItem, PerformerMedia, Job, ZipEntry
+from .matcher import KeyAutomaton, partial_hits
+from .responses import RangeFileResponse, etag_matches, negotiate_type
+from .scanner import scan_media
+from .watcher import IndexPoller, MediaWatcher, WatchBatch, batch_folders, common_folder, network_fs_type
+from .zips import ZipHandles, stored_data_offset
+
+log = logging.getLogger(__name__)
 
 APP_NAME = os.getenv("APP_NAME", "indexxxer")
 APP_VERSION = os.getenv("APP_VERSION", "0.0.0")
@@ -30,8 +55,83 @@ IMAGE_ROOT = Path(os.getenv("IMAGE_ROOT", "/images")).resolve()
 UPLOAD_IMAGE_ROOT = Path(os.getenv("UPLOAD_IMAGE_ROOT", IMAGE_ROOT)).resolve()
 THUMB_CACHE = Path(os.getenv("THUMB_CACHE", "/app/cache/thumbs")).resolve()
 ZIP_CACHE = THUMB_CACHE / "zip"
+ZIP_THUMB_DIR = ZIP_CACHE / "thumbs"
+ZIP_TMP_DIR = ZIP_CACHE / "tmp"
+MEDIA_THUMB_DIR = THUMB_CACHE / "media"
 PERFORMER_THUMB_DIR = THUMB_CACHE / "performers"
+SPRITE_DIR = THUMB_CACHE / "sprites"
+PREVIEW_DIR = THUMB_CACHE / "previews"
+HLS_DIR = THUMB_CACHE / "hls"
+# Bump to invalidate every cached thumbnail (e.g. after changing ffmpeg settings).
+THUMB_CACHE_VERSION = "2"
+# Requested thumbnail widths snap to this ladder, so an image has a bounded number of variants.
+THUMB_SIZES = (120, 240, 360, 480, 720, 960, 1280, 1600)
+# Formats offered to clients that list them in Accept, most preferred first; JPEG is the default.
+THUMB_FORMATS = [f.strip().lower() for f in os.getenv("THUMB_FORMATS", "avif,webp").split(",") if f.strip()]
+THUMB_MIME = {"jpg": "image/jpeg", "webp": "image/webp", "avif": "image/avif"}
 UPLOAD_CACHE_DIR = THUMB_CACHE / "uploads"
+# Rows written per INSERT ... ON CONFLICT statement (and per commit) while indexing.
+# Capped so a batch stays well under PostgreSQL's 65535 bind-parameter limit.
+INDEX_BATCH_SIZE = max(1, min(int(os.getenv("INDEX_BATCH_SIZE", "1000")), 10000))
+# Directory-scanning threads and the size of the queue feeding scanned files to the DB writer.
+SCAN_WORKERS = max(1, int(os.getenv("SCAN_WORKERS", "8")))
+SCAN_QUEUE_SIZE = max(1, int(os.getenv("SCAN_QUEUE_SIZE", "10000")))
+# Concurrent ffmpeg processes across the API (request thumbnails + warm-up).
+FFMPEG_MAX_PROCS = max(1, int(os.getenv("FFMPEG_MAX_PROCS", str(os.cpu_count() or 2))))
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "120"))
+# Still images are thumbnailed in-process (Pillow) on this many threads; ffmpeg
+# handles videos and anything Pillow can't read.
+IMAGE_THUMB_WORKERS = max(1, int(os.getenv("IMAGE_THUMB_WORKERS", str(os.cpu_count() or 2))))
+# How long a request waits on a thumbnail another request is already generating.
+THUMB_WAIT_TIMEOUT = float(os.getenv("THUMB_WAIT_TIMEOUT", "60"))
+# Thumbnail warm-up workers; one ffmpeg slot is left for interactive requests.
+THUMB_WARMUP_WORKERS = max(1, min(int(os.getenv("THUMB_WARMUP_WORKERS", str(FFMPEG_MAX_PROCS - 1))), FFMPEG_MAX_PROCS))
+# Queue a thumbnail warm-up job after every index run.
+THUMB_WARMUP_AFTER_INDEX = os.getenv("THUMB_WARMUP_AFTER_INDEX", "1").strip().lower() in ("1", "true", "yes")
+# Live index updates: off | auto | inotify | poll. "auto" uses inotify and falls
+# back to periodic incremental index runs when inotify can't be set up or
+# MEDIA_ROOT is on a network/FUSE mount (where inotify misses remote changes).
+MEDIA_WATCH = os.getenv("MEDIA_WATCH", "off").strip().lower()
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "300"))
+# Shortest performer key (name/alias, compacted) allowed to match inside a path.
+PARTIAL_MATCH_MIN_LEN = max(1, int(os.getenv("PARTIAL_MATCH_MIN_LEN", "5")))
+# Disk budgets per cache area: CACHE_<AREA>_MAX_MB / CACHE_<AREA>_MAX_FILES (0 = unlimited).
+# Least-recently-used files are evicted in the background once an area is over budget.
+CACHE_RESCAN_INTERVAL = float(os.getenv("CACHE_RESCAN_INTERVAL", "600"))
+# Chunk size for streaming inflated zip entries
+STREAM_CHUNK_SIZE = 256 * 1024
+# Open ZipFile handles kept per API process (avoids re-reading central directories)
+ZIP_HANDLE_CACHE_SIZE = max(1, int(os.getenv("ZIP_HANDLE_CACHE_SIZE", "32")))
+# Sprite sheets: tiles per sheet and per row
+SPRITE_MAX_TILES = 100
+SPRITE_COLUMNS = 10
+# Video scrub previews: frames per video, tiles per row and tile size (16:9, letterboxed)
+PREVIEW_FRAMES = max(1, min(int(os.getenv("PREVIEW_FRAMES", "25")), 100))
+PREVIEW_COLUMNS = 5
+PREVIEW_TILE_WIDTH, PREVIEW_TILE_HEIGHT = 160, 90
+FFPROBE_TIMEOUT = float(os.getenv("FFPROBE_TIMEOUT", "30"))
+# Threads reading media metadata while indexing. ffprobe runs share the
+# FFMPEG_MAX_PROCS slots with ffmpeg, so this never adds processes beyond that cap.
+PROBE_WORKERS = max(1, int(os.getenv("PROBE_WORKERS", str(FFMPEG_MAX_PROCS))))
+# On-the-fly HLS: stream copy when the codecs allow it, else transcode (capped, since
+# that is the expensive part). Idle packagers are stopped; renditions are cached.
+HLS_SEGMENT_SECONDS = 6
+HLS_MAX_TRANSCODES = max(1, int(os.getenv("HLS_MAX_TRANSCODES", "2")))
+HLS_IDLE_TIMEOUT = float(os.getenv("HLS_IDLE_TIMEOUT", "60"))
+HLS_WAIT_TIMEOUT = float(os.getenv("HLS_WAIT_TIMEOUT", "30"))
+HLS_MAX_WIDTH = 1920
+HLS_COPY_VIDEO_CODECS = {"h264"}
+HLS_COPY_AUDIO_CODECS = {"aac", "mp3"}
+# Performer columns /performers/facets counts by default (the sidebar tag cloud).
+# Results are cached per query until a commit writes performers or their media
+# (see _note_facet_writes), and for at most the TTL as a backstop for raw SQL.
+PERFORMER_FACETS = [
+    f.strip() for f in os.getenv(
+        "PERFORMER_FACETS", "hair_color,eye_color,boobs,cup,career_status,ethnicity,place_of_birth"
+    ).split(",") if f.strip()
+]
+PERFORMER_FACETS_TTL = float(os.getenv("PERFORMER_FACETS_TTL", "300"))
 
 app = FastAPI(title=f"{APP_NAME} API", version=APP_VERSION)
 
@@ -43,12 +143,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Performer text columns are stored trimmed, empty as NULL (see _clean_text), so
+# filters and facets can compare values exactly.
+_PERFORMER_TEXT_COLUMNS = (
+    "aliases", "date_of_birth", "career_status", "career_start", "career_end", "date_of_death",
+    "place_of_birth", "ethnicity", "boobs", "cup", "bra", "butt", "hair_color", "eye_color",
+    "piercing_locations", "tattoo_locations",
+)
+
+# create_all() only creates missing tables, so columns added to existing
+# tables after a release are applied here (idempotently) on startup.
+_SCHEMA_UPGRADES = [
+    "ALTER TABLE performers ADD COLUMN IF NOT EXISTS match_keys TEXT",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS match_pending BOOLEAN NOT NULL DEFAULT false",
+    "CREATE INDEX IF NOT EXISTS ix_media_items_match_pending ON media_items (match_pending)",
+    "CREATE INDEX IF NOT EXISTS ix_media_items_rel_path_prefix ON media_items (rel_path text_pattern_ops)",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS zip_entries_mtime BIGINT",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS duration DOUBLE PRECISION",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS width INTEGER",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS height INTEGER",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS codec VARCHAR(32)",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS bitrate BIGINT",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS frame_rate DOUBLE PRECISION",
+    "ALTER TABLE media_items ADD COLUMN IF NOT EXISTS probed_mtime BIGINT",
+    "CREATE INDEX IF NOT EXISTS ix_media_items_kind_rel_path ON media_items (kind, rel_path, id)",
+    "CREATE INDEX IF NOT EXISTS ix_performers_name_id ON performers (name, id)",
+    *(
+        f"CREATE INDEX IF NOT EXISTS ix_performers_{col} ON performers ({col})"
+        for col in ("career_status", "ethnicity", "boobs", "cup", "hair_color", "eye_color")
+    ),
+    # Values imported before text columns were trimmed on write
+    "UPDATE performers SET "
+    + ", ".join(f"{c} = NULLIF(btrim({c}), '')" for c in _PERFORMER_TEXT_COLUMNS)
+    + " WHERE "
+    + " OR ".join(f"{c} <> btrim({c}) OR {c} = ''" for c in _PERFORMER_TEXT_COLUMNS),
+]
+
+# Trigram indexes for substring search over performer names and aliases (the
+# expression must match _performer_search_text()) and media paths (/media/items?q=).
+# They need the pg_trgm extension, so they are applied separately: without it
+# search still works, by scanning.
+_TRGM_UPGRADES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_performers_search_trgm ON performers "
+    "USING gin (lower(name || ' ' || coalesce(aliases, '')) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_media_items_rel_path_trgm ON media_items USING gin (lower(rel_path) gin_trgm_ops)",
+]
+
+def _upgrade_schema() -> None:
+    with engine.begin() as conn:
+        for stmt in _SCHEMA_UPGRADES:
+            conn.execute(text(stmt))
+    try:
+        with engine.begin() as conn:
+            for stmt in _TRGM_UPGRADES:
+                conn.execute(text(stmt))
+    except Exception as e:
+        log.warning("Trigram search indexes not created (%s); search will scan", e)
+
 @app.on_event("startup")
 def startup():
     Base.metadata.create_all(bind=engine)
+    _upgrade_schema()
     THUMB_CACHE.mkdir(parents=True, exist_ok=True)
     ZIP_CACHE.mkdir(parents=True, exist_ok=True)
     PERFORMER_THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    MEDIA_THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    SPRITE_DIR.mkdir(parents=True, exist_ok=True)
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    HLS_DIR.mkdir(parents=True, exist_ok=True)
+    threading.Thread(target=_drop_legacy_thumbs, name="legacy-thumb-cleanup", daemon=True).start()
+    _caches.start()
     IMAGE_ROOT.mkdir(parents=True, exist_ok=True)
 
     # Select a writable upload root. If the preferred root is read-only, fall back
@@ -72,6 +237,47 @@ def startup():
             db.add(AppSetting(key="media_selected_path", value=str(MEDIA_ROOT)))
             db.commit()
 
+    jobs.resume_interrupted()
+    start_media_watcher()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_media_watcher()
+    _hls.stop()
+    _thumbnailer.shutdown()
+    _caches.stop()
+
+
+_zip_handles = ZipHandles(ZIP_HANDLE_CACHE_SIZE)
+_thumbnailer = Thumbnailer(IMAGE_THUMB_WORKERS)
+
+def _cache_area(name: str, root: Path, max_mb: int, max_files: int, **kwargs) -> CacheArea:
+    env = f"CACHE_{name.upper()}"
+    return CacheArea(
+        name,
+        root,
+        max_bytes=int(float(os.getenv(f"{env}_MAX_MB", str(max_mb))) * 1024 * 1024),
+        max_files=int(os.getenv(f"{env}_MAX_FILES", str(max_files))),
+        **kwargs,
+    )
+
+_caches = CacheManager(
+    [
+        _cache_area("media_thumbs", MEDIA_THUMB_DIR, 2048, 200_000),
+        _cache_area("zip_thumbs", ZIP_THUMB_DIR, 1024, 100_000),
+        _cache_area("zip_tmp", ZIP_TMP_DIR, 1024, 5_000),
+        _cache_area("performer_thumbs", PERFORMER_THUMB_DIR, 256, 20_000),
+        _cache_area("sprites", SPRITE_DIR, 1024, 20_000),
+        _cache_area("previews", PREVIEW_DIR, 1024, 50_000),
+        # One entry per rendition directory; kept while its packager may still write to it.
+        _cache_area("hls", HLS_DIR, 20480, 500, min_age=2 * HLS_IDLE_TIMEOUT, dirs=True),
+    ],
+    rescan_interval=CACHE_RESCAN_INTERVAL,
+)
+
+_hls = HlsPackager(HLS_SEGMENT_SECONDS, HLS_IDLE_TIMEOUT, HLS_MAX_TRANSCODES, on_finish=_caches.add)
+
 
 def _clear_dir(path: Path) -> None:
     """Best-effort: delete everything inside `path` and recreate it."""
@@ -86,16 +292,233 @@ def _clear_dir(path: Path) -> None:
 
 def _clear_thumb_caches() -> None:
     _clear_dir(ZIP_CACHE)
+    _clear_dir(MEDIA_THUMB_DIR)
     _clear_dir(PERFORMER_THUMB_DIR)
+    _clear_dir(SPRITE_DIR)
+    _clear_dir(PREVIEW_DIR)
+    _clear_dir(HLS_DIR)
+    _caches.rescan()
+
+
+def _drop_legacy_thumbs() -> None:
+    """Best-effort: remove thumbnails from the flat, path-keyed cache layout."""
+    for root in (THUMB_CACHE, ZIP_THUMB_DIR):
+        try:
+            for f in root.glob("*.jpg"):
+                f.unlink(missing_ok=True)
+        except Exception:
+            pass
 
 
 def _clear_performer_thumbs(performer_id: int) -> None:
     try:
-        for f in PERFORMER_THUMB_DIR.glob(f"{performer_id}_*.jpg"):
+        for f in PERFORMER_THUMB_DIR.glob(f"{performer_id}_*"):
             f.unlink(missing_ok=True)
     except Exception:
         pass
 
+_ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_MAX_PROCS)
+
+def _run_ffmpeg(args: list[str], timeout: float | None = FFMPEG_TIMEOUT) -> bool:
+    """Run `ffmpeg -y <args>`, with at most FFMPEG_MAX_PROCS running at once.
+
+    Returns False if ffmpeg couldn't be started or timed out; callers check
+    for the output file either way.
+    """
+    with _ffmpeg_slots:
+        try:
+            subprocess.run(
+                ["ffmpeg", "-y", *args],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False,
+                timeout=timeout,
+            )
+        except Exception:
+            return False
+    return True
+
+def _ffprobe(p: Path) -> dict | None:
+    """ffprobe's JSON for the container and first video stream (None if unreadable)."""
+    try:
+        with _ffmpeg_slots:
+            res = subprocess.run(
+                [
+                    "ffprobe", "-v", "error", "-select_streams", "v:0",
+                    "-show_entries", "format=duration,bit_rate:stream=codec_name,width,height,avg_frame_rate,bit_rate",
+                    "-of", "json", str(p),
+                ],
+                capture_output=True,
+                check=False,
+                timeout=FFPROBE_TIMEOUT,
+            )
+        return json.loads(res.stdout or b"{}") if res.returncode == 0 else None
+    except Exception:
+        return None
+
+def _probe_number(value, cast=float):
+    try:
+        if isinstance(value, str) and "/" in value:
+            num, den = value.split("/", 1)
+            value = float(num) / float(den)  # frame rates come as "30000/1001"
+        number = cast(float(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return number if number > 0 else None
+
+def _media_metadata(p: Path, kind: str) -> dict:
+    """MediaItem metadata columns from ffprobe (all None if it can't be read)."""
+    data = _ffprobe(p) or {}
+    fmt = data.get("format") or {}
+    stream = (data.get("streams") or [{}])[0]
+    video = kind == "video"
+    return {
+        "duration": _probe_number(fmt.get("duration")) if video else None,
+        "width": _probe_number(stream.get("width"), int),
+        "height": _probe_number(stream.get("height"), int),
+        "codec": str(stream["codec_name"])[:32] if stream.get("codec_name") else None,
+        "bitrate": _probe_number(fmt.get("bit_rate") or stream.get("bit_rate"), int) if video else None,
+        "frame_rate": _probe_number(stream.get("avg_frame_rate")) if video else None,
+    }
+
+def _probe_codecs(p: Path) -> dict[str, str]:
+    """Codec of the first stream of each type, e.g. {"video": "h264", "audio": "aac"}."""
+    try:
+        with _ffmpeg_slots:
+            res = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,codec_name", "-of", "json", str(p)],
+                capture_output=True,
+                check=False,
+                timeout=FFPROBE_TIMEOUT,
+            )
+        if res.returncode != 0:
+            return {}
+        streams = json.loads(res.stdout or b"{}").get("streams") or []
+    except Exception:
+        return {}
+    codecs: dict[str, str] = {}
+    for stream in streams:
+        if stream.get("codec_type") and stream.get("codec_name"):
+            codecs.setdefault(stream["codec_type"], stream["codec_name"])
+    return codecs
+
+def _probe_duration(p: Path) -> float | None:
+    """Container duration in seconds via ffprobe (None if unknown/unreadable)."""
+    return _probe_number(((_ffprobe(p) or {}).get("format") or {}).get("duration"))
+
+def _media_duration(rel_path: str, p: Path) -> float | None:
+    """Video duration as recorded by indexing; ffprobe only if it's missing or stale."""
+    with SessionLocal() as db:
+        item = db.execute(
+            select(MediaItem.duration, MediaItem.probed_mtime).where(MediaItem.rel_path == rel_path)
+        ).first()
+    if item is not None and item.probed_mtime == int(p.stat().st_mtime):
+        return item.duration
+    return _probe_duration(p)
+
+def _partial_path(out: Path) -> Path:
+    # Unique, hidden sibling of `out` (same suffix so ffmpeg picks the format).
+    return out.with_name(f".{out.stem}.{secrets.token_hex(6)}.partial{out.suffix}")
+
+def _ffmpeg_to(out: Path, args: list[str]) -> bool:
+    """Run ffmpeg into a temp file and atomically rename it onto `out`.
+
+    Readers never see a half-written file, even while it's being regenerated.
+    """
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _partial_path(out)
+    try:
+        _run_ffmpeg([*args, str(tmp)])
+        if tmp.exists() and tmp.stat().st_size > 0:
+            tmp.replace(out)
+            _caches.add(out)
+            return True
+        return False
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def _write_atomic(out: Path, data: bytes) -> None:
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _partial_path(out)
+    try:
+        tmp.write_bytes(data)
+        tmp.replace(out)
+        _caches.add(out)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def _image_thumb_to(out: Path, src: Path | bytes, width: int) -> bool:
+    """Downscale a still image (file or bytes) into `out` in-process, in the format of its suffix.
+
+    False if Pillow is missing or can't decode it; callers then use ffmpeg.
+    """
+    data = _thumbnailer.render(src, width, out.suffix.lstrip("."))
+    if data is None:
+        return False
+    _write_atomic(out, data)
+    return True
+
+def _still_thumb_to(out: Path, src: Path | bytes, width: int, ffmpeg_input) -> Path | None:
+    """Thumbnail a still image into `out`, or into its .jpg sibling via ffmpeg.
+
+    ffmpeg only writes JPEG here, so an image Pillow can't decode ends up as
+    JPEG whatever format was asked for. `ffmpeg_input()` returns a file path
+    ffmpeg can read. Returns the written path, or None.
+    """
+    if _image_thumb_to(out, src, width):
+        return out
+    jpg = out.with_suffix(".jpg")
+    if jpg.exists() or _ffmpeg_to(jpg, ["-i", str(ffmpeg_input()), "-vf", f"scale='min({width},iw)':-2", "-q:v", "4"]):
+        return jpg
+    return None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+_flights: dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+def _single_flight(key: str, fn, timeout: float | None = None):
+    """Run `fn()` once per `key` at a time; concurrent callers wait for its result.
+
+    Waiters give up with TimeoutError after `timeout` seconds; the generation
+    itself keeps going and its result lands in the cache for the next request.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(timeout):
+            raise TimeoutError(key)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = fn()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+def _thumb_once(out: Path, fn):
+    """Single-flight a thumbnail generation keyed by its output path (503 on wait timeout)."""
+    try:
+        return _single_flight(str(out), fn, timeout=THUMB_WAIT_TIMEOUT)
+    except TimeoutError:
+        raise HTTPException(503, "Thumbnail is still being generated", headers={"Retry-After": "2"})
+
 def _slug_first_last(name: str) -> str:
     parts = [p for p in re.split(r"\s+", (name or "").strip()) if p]
     if not parts:
@@ -124,40 +547,6 @@ def _image_target_path(performer: Performer) -> Path:
     return UPLOAD_IMAGE_ROOT / f"{slug}.jpg"
 
 
-def _save_resized_image(src: Path, dest: Path, max_width: int = 960) -> bool:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    tmp = dest.with_suffix(".tmp.jpg")
-
-    try:
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(src),
-                "-vf",
-                f"scale='min({max_width},iw)':-2",
-                "-q:v",
-                "4",
-                str(tmp),
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-    except Exception:
-        return False
-
-    if not tmp.exists():
-        return False
-
-    try:
-        tmp.replace(dest)
-    finally:
-        tmp.unlink(missing_ok=True)
-    return dest.exists()
-
-
 def _image_target_path(performer: Performer) -> Path:
     slug = _slug_first_last(performer.name)
     if not slug:
@@ -169,24 +558,11 @@ def _save_resized_image(src: Path, dest: Path, max_width: int = 960) -> bool:
     dest.parent.mkdir(parents=True, exist_ok=True)
     tmp = dest.with_suffix(".tmp.jpg")
 
-    try:
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(src),
-                "-vf",
-                f"scale='min({max_width},iw)':-2",
-                "-q:v",
-                "4",
-                str(tmp),
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-    except Exception:
+    # In-process first; ffmpeg for whatever Pillow can't decode
+    data = _thumbnailer.render(src, max_width)
+    if data is not None:
+        tmp.write_bytes(data)
+    elif not _run_ffmpeg(["-i", str(src), "-vf", f"scale='min({max_width},iw)':-2", "-q:v", "4", str(tmp)]):
         return False
 
     if not tmp.exists():
@@ -205,6 +581,10 @@ def _to_int(v):
     except ValueError:
         return None
 
+def _clean_text(v):
+    v = (v or "").strip()
+    return v or None
+
 def _to_bool(v):
     v = (v or "").strip().lower()
     if v in ("true", "1", "yes", "y"): return True
@@ -230,46 +610,174 @@ def _get_selected_media_path(db: Session) -> Path:
 def health(db: Session = Depends(get_db)):
     media_count = db.execute(select(MediaItem)).scalars().all()
     return {"app": APP_NAME, "version": APP_VERSION, "media_root": str(MEDIA_ROOT), "image_root": str(IMAGE_ROOT), "media_indexed": len(media_count)}
-@app.get("/performers")
-def list_performers(db: Session = Depends(get_db)):
-    # Aggregate media counts per performer (videos/images separated; galleries = zip).
-    counts = {}
-    for performer_id, kind, cnt in db.execute(
+# /performers query parameters: equality filters on any column (repeatable, any
+# value matches), min_/max_ range filters on the numeric ones, and sort keys
+# (prefix "-" for descending). Other parameters are rejected.
+PERFORMER_EQ_FIELDS = tuple(c.key for c in Performer.__table__.columns if c.key not in ("id", "match_keys"))
+PERFORMER_RANGE_FIELDS = ("age", "bust", "waist", "hip", "height", "weight")
+_PERFORMER_QUERY_PARAMS = {
+    "q", "has", "sort", "limit", "cursor", "count", "fields", "top",
+    *PERFORMER_EQ_FIELDS,
+    *(prefix + f for prefix in ("min_", "max_") for f in PERFORMER_RANGE_FIELDS),
+}
+PERFORMER_COUNT_KEYS = ("scene_count", "gallery_count", "video_count", "image_count")
+PERFORMER_SORT_KEYS = ("name", "id", *PERFORMER_RANGE_FIELDS, *PERFORMER_COUNT_KEYS)
+PERFORMERS_MAX_LIMIT = 1000
+# Nulls sort last in either direction (sort keys go through coalesce).
+_SORT_NULL_LAST = {False: 2**31 - 1, True: -(2**31)}
+
+def _performer_search_text():
+    # Same expression as the ix_performers_search_trgm index.
+    return func.lower(Performer.name + literal_column("' '") + func.coalesce(Performer.aliases, literal_column("''")))
+
+def _performer_counts(ids: list[int] | None = None):
+    """Media counts per performer (videos/images separated; galleries = zip)."""
+    kind = func.lower(MediaItem.kind)
+    q = (
         select(
-            PerformerMedia.performer_id,
-            MediaItem.kind,
-            func.count(MediaItem.id),
+            PerformerMedia.performer_id.label("performer_id"),
+            func.count().filter(kind.in_(("video", "image"))).label("scene_count"),
+            func.count().filter(kind == "zip").label("gallery_count"),
+            func.count().filter(kind == "video").label("video_count"),
+            func.count().filter(kind == "image").label("image_count"),
         )
         .join(MediaItem, PerformerMedia.media_item_id == MediaItem.id)
-        .group_by(PerformerMedia.performer_id, MediaItem.kind)
-    ).all():
-        entry = counts.setdefault(
-            int(performer_id),
-            {"scene_count": 0, "gallery_count": 0, "video_count": 0, "image_count": 0},
+        .group_by(PerformerMedia.performer_id)
+    )
+    if ids is not None:
+        q = q.where(PerformerMedia.performer_id.in_(ids))
+    return q
+
+def _parse_bool(value: str) -> bool:
+    v = value.strip().lower()
+    if v in ("1", "true", "yes"):
+        return True
+    if v in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+def _performer_filters(request: Request, q: str | None, has: str | None, exclude: str | None = None) -> list:
+    """WHERE clauses for the search/filter parameters of /performers (and its facets).
+
+    `exclude` leaves out the equality filter on that column.
+    """
+    filters = []
+    if q and q.strip():
+        filters.append(_performer_search_text().contains(q.strip().lower(), autoescape=True))
+    params = request.query_params
+    unknown = sorted(set(params) - _PERFORMER_QUERY_PARAMS)
+    if unknown:
+        raise HTTPException(400, f"Unknown filters: {', '.join(unknown)}")
+    for field in PERFORMER_EQ_FIELDS:
+        # Stored text is trimmed, so compare trimmed values (as the old client-side filter did)
+        values = [v.strip() for v in params.getlist(field) if v.strip()]
+        if not values or field == exclude:
+            continue
+        column = Performer.__table__.c[field]
+        try:
+            if field in ("piercings", "tattoos"):
+                values = [_parse_bool(v) for v in values]
+            elif field in PERFORMER_RANGE_FIELDS:
+                values = [int(v) for v in values]
+        except ValueError:
+            kind = "true or false" if field in ("piercings", "tattoos") else "an integer"
+            raise HTTPException(400, f"{field} must be {kind}")
+        filters.append(column.in_(values))
+    for field in PERFORMER_RANGE_FIELDS:
+        column = Performer.__table__.c[field]
+        for prefix, op in (("min_", column.__ge__), ("max_", column.__le__)):
+            value = params.get(prefix + field)
+            if value is None or value == "":
+                continue
+            try:
+                filters.append(op(int(value)))
+            except ValueError:
+                raise HTTPException(400, f"{prefix}{field} must be an integer")
+    for k in _csv_param(has):
+        if k not in ("video", "image", "zip"):
+            raise HTTPException(400, "has must be video, image or zip")
+        filters.append(
+            select(PerformerMedia.id)
+            .join(MediaItem, PerformerMedia.media_item_id == MediaItem.id)
+            .where(PerformerMedia.performer_id == Performer.id, func.lower(MediaItem.kind) == k)
+            .exists()
         )
-        k = (kind or "").lower()
-        if k == "zip":
-            entry["gallery_count"] += int(cnt)
-        elif k == "video":
-            entry["video_count"] += int(cnt)
-        elif k == "image":
-            entry["image_count"] += int(cnt)
-        entry["scene_count"] = entry["video_count"] + entry["image_count"]
+    return filters
 
-    rows = db.execute(select(Performer).order_by(Performer.name.asc())).scalars().all()
-    out = []
-    for p in rows:
-        d = p.__dict__.copy()
-        d.pop("_sa_instance_state", None)
-        c = counts.get(
-            int(p.id),
-            {"scene_count": 0, "gallery_count": 0, "video_count": 0, "image_count": 0},
-        )
-        d["scene_count"] = c["scene_count"]
-        d["gallery_count"] = c["gallery_count"]
-        d["video_count"] = c["video_count"]
-        d["image_count"] = c["image_count"]
-        out.append(d)
+def _performer_out(row, counts: dict) -> dict:
+    d = {k: v for k, v in row.items() if k != "_sort"}
+    c = counts.get(d["id"])
+    d.update({k: c[k] if c else 0 for k in PERFORMER_COUNT_KEYS})
+    return d
+
+@app.get("/performers")
+def list_performers(
+    request: Request,
+    q: str | None = Query(None, description="Substring search over name and aliases (case-insensitive)"),
+    has: str | None = Query(None, description="Comma-separated media kinds the performer must have: video,image,zip"),
+    sort: str = Query("name", description=f"One of {', '.join(PERFORMER_SORT_KEYS)}; prefix - for descending"),
+    limit: int = Query(200, description=f"Page size (max {PERFORMERS_MAX_LIMIT}); -1 returns every match as a plain list"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    count: str | None = Query(None, description="Add `total`: exact, or estimate (planner estimate, no scan)"),
+    db: Session = Depends(get_db),
+):
+    """Performers with media counts, one keyset page at a time.
+
+    Also filters by column: `?hair_color=Blonde&hair_color=Red` (any of the
+    values; fields: PERFORMER_EQ_FIELDS) and `?min_age=20&max_height=170`
+    (PERFORMER_RANGE_FIELDS). Pages continue after the last row's
+    (sort value, id) instead of using OFFSET.
+    """
+    descending = sort.startswith("-")
+    key = sort[1:] if descending else sort
+    if key not in PERFORMER_SORT_KEYS:
+        raise HTTPException(400, f"sort must be one of {', '.join(PERFORMER_SORT_KEYS)}")
+    if count not in (None, "exact", "estimate"):
+        raise HTTPException(400, "count must be exact or estimate")
+
+    filters = _performer_filters(request, q, has)
+    stmt = select(*Performer.__table__.c).where(*filters)
+    if key in PERFORMER_COUNT_KEYS:
+        counted = _performer_counts().subquery()
+        stmt = stmt.outerjoin(counted, counted.c.performer_id == Performer.id)
+        sort_expr = func.coalesce(counted.c[key], 0)
+    elif key in PERFORMER_RANGE_FIELDS:
+        sort_expr = func.coalesce(Performer.__table__.c[key], _SORT_NULL_LAST[descending])
+    else:
+        sort_expr = Performer.__table__.c[key]
+    stmt = stmt.add_columns(sort_expr.label("_sort"))
+    if descending:
+        stmt = stmt.order_by(sort_expr.desc(), Performer.id.desc())
+    else:
+        stmt = stmt.order_by(sort_expr.asc(), Performer.id.asc())
+
+    if limit is not None and limit < 0:
+        # Everything at once, as a plain list (the original behaviour; prefer pages)
+        rows = db.execute(stmt).mappings().all()
+        counts = {c["performer_id"]: c for c in db.execute(_performer_counts()).mappings()}
+        return [_performer_out(r, counts) for r in rows]
+
+    limit = max(1, min(limit, PERFORMERS_MAX_LIMIT))
+    page = stmt
+    if cursor:
+        last_value, last_id = _decode_cursor(cursor, 2)
+        expected = str if key == "name" else int
+        if not isinstance(last_value, expected) or not isinstance(last_id, int):
+            raise HTTPException(400, "Invalid cursor")
+        after = tuple_(sort_expr, Performer.id)
+        page = page.where(after < (last_value, last_id) if descending else after > (last_value, last_id))
+    rows = db.execute(page.limit(limit + 1)).mappings().all()
+
+    ids = [r["id"] for r in rows[:limit]]
+    counts = {c["performer_id"]: c for c in db.execute(_performer_counts(ids)).mappings()} if ids else {}
+    out = {
+        "items": [_performer_out(r, counts) for r in rows[:limit]],
+        "next_cursor": _encode_cursor(rows[limit - 1]["_sort"], rows[limit - 1]["id"]) if len(rows) > limit else None,
+    }
+    if count == "exact":
+        out["total"] = db.execute(select(func.count()).select_from(Performer).where(*filters)).scalar_one()
+    elif count == "estimate":
+        out["total"] = _estimate_rows(db, select(Performer.id).where(*filters))
     return out
 
 
@@ -311,7 +819,9 @@ def create_performer(payload: PerformerPayload, db: Session = Depends(get_db)):
     if existing:
         raise HTTPException(409, "Performer already exists")
 
-    p = Performer(**payload.model_dump())
+    data = payload.model_dump()
+    data.update({k: _clean_text(data[k]) for k in _PERFORMER_TEXT_COLUMNS})
+    p = Performer(**data)
     db.add(p)
     db.commit()
     db.refresh(p)
@@ -325,6 +835,94 @@ def create_performer(payload: PerformerPayload, db: Session = Depends(get_db)):
     return d
 
 
+_facets_cache: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+_facets_lock = threading.Lock()
+_facets_generation = 0
+_FACETS_CACHE_SIZE = 256
+
+def _invalidate_performer_facets() -> None:
+    global _facets_generation
+    with _facets_lock:
+        _facets_generation += 1
+        _facets_cache.clear()
+
+# Central invalidation: any session (endpoints, maintenance, index jobs) that
+# commits a write to the tables facets are counted from clears the cache.
+_FACET_TABLES = {Performer.__table__, PerformerMedia.__table__, MediaItem.__table__}
+
+@event.listens_for(Session, "after_flush")
+def _note_facet_flush(session, flush_context):
+    if any(isinstance(o, (Performer, PerformerMedia, MediaItem)) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.info["facets_stale"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_facet_writes(state):
+    # Bulk insert/update/delete statements, e.g. delete(Performer)
+    if (state.is_insert or state.is_update or state.is_delete) and getattr(state.statement, "table", None) in _FACET_TABLES:
+        state.session.info["facets_stale"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_facets_on_commit(session):
+    if session.info.pop("facets_stale", False):
+        _invalidate_performer_facets()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_facet_writes(session):
+    session.info.pop("facets_stale", None)
+
+@app.get("/performers/facets")
+def performer_facets(
+    request: Request,
+    q: str | None = Query(None, description="Substring search over name and aliases (case-insensitive)"),
+    has: str | None = Query(None, description="Comma-separated media kinds the performer must have: video,image,zip"),
+    fields: str | None = Query(None, description="Comma-separated columns to count (default: PERFORMER_FACETS)"),
+    top: int = Query(60, description="Values per column, most frequent first (0 = all)"),
+    db: Session = Depends(get_db),
+):
+    """Value -> performer count for each facet column, scoped by the /performers filters.
+
+    Each column is counted with every filter except its own, so a selected
+    value doesn't hide the alternatives. Empty values aren't counted.
+    """
+    selected = _csv_param(fields) or PERFORMER_FACETS
+    unknown = [f for f in selected if f not in PERFORMER_EQ_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+
+    key = tuple(sorted(request.query_params.multi_items()))
+    with _facets_lock:
+        hit = _facets_cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < PERFORMER_FACETS_TTL:
+            _facets_cache.move_to_end(key)
+            return hit[1]
+        generation = _facets_generation
+
+    branches = []
+    for field in selected:
+        value = cast(Performer.__table__.c[field], Text)
+        branches.append(
+            select(literal(field).label("field"), value.label("value"), func.count().label("n"))
+            .where(value.is_not(None), value != "", *_performer_filters(request, q, has, exclude=field))
+            .group_by(value)
+        )
+    counts: dict[str, list] = {f: [] for f in selected}
+    for field, value, n in db.execute(union_all(*branches)):
+        counts[field].append((value, n))
+    out = {
+        "facets": {
+            field: dict(sorted(pairs, key=lambda vn: (-vn[1], vn[0]))[: top if top > 0 else None])
+            for field, pairs in counts.items()
+        }
+    }
+
+    with _facets_lock:
+        if generation == _facets_generation:  # not invalidated meanwhile
+            _facets_cache[key] = (time.monotonic(), out)
+            while len(_facets_cache) > _FACETS_CACHE_SIZE:
+                _facets_cache.popitem(last=False)
+    return out
+
+
 @app.get("/performers/{performer_id}")
 def get_performer(performer_id: int, db: Session = Depends(get_db)):
     p = db.get(Performer, performer_id)
@@ -447,6 +1045,12 @@ def performer_media(performer_id: int, db: Session = Depends(get_db)):
                     "ext": mi.ext,
                     "size": mi.size,
                     "mtime": mi.mtime,
+                    "duration": mi.duration,
+                    "width": mi.width,
+                    "height": mi.height,
+                    "codec": mi.codec,
+                    "bitrate": mi.bitrate,
+                    "frame_rate": mi.frame_rate,
                 },
                 "confidence": float(link.confidence or 0.0),
                 "matched_by": link.matched_by or "filename",
@@ -468,8 +1072,8 @@ def get_performer_image(performer_id: int, db: Session = Depends(get_db)):
 
 
 @app.get("/performers/{performer_id}/thumb")
-def get_performer_thumb(performer_id: int, size: int = 480, db: Session = Depends(get_db)):
-    # Returns a cached thumbnail jpg (scaled to width=size, preserving aspect ratio)
+def get_performer_thumb(performer_id: int, request: Request, size: int = 480, db: Session = Depends(get_db)):
+    # Returns a cached thumbnail (scaled to a THUMB_SIZES width, format negotiated from Accept)
     p = db.get(Performer, performer_id)
     if not p:
         raise HTTPException(404, "Performer not found")
@@ -482,29 +1086,32 @@ def get_performer_thumb(performer_id: int, size: int = 480, db: Session = Depend
     if not src:
         raise HTTPException(404, "Image not found")
 
-    safe_name = re.sub(r"[^a-zA-Z0-9._-]+", "_", p.name).strip("_").lower()
-    size = max(120, min(int(size), 1600))
-    out = PERFORMER_THUMB_DIR / f"{performer_id}_{safe_name}_{size}.jpg"
+    size = _snap_thumb_size(size)
+    src_st = src.stat()
+    # Versioned on the source image so a new upload/seed image is picked up.
+    version = _thumb_version(src_st.st_size, int(src_st.st_mtime), src.name)
+    out = PERFORMER_THUMB_DIR / f"{performer_id}_{version}_{size}.{_thumb_format(request)}"
 
     if out.exists() and out.is_file():
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
-
-    # Use ffmpeg (already installed) to convert/scale into jpg
-    try:
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", str(src), "-vf", f"scale='min({size},iw)':-2", "-q:v", "4", str(out)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-    except Exception:
-        pass
-
-    if not out.exists():
+        _caches.hit(out)
+        return _thumb_response(request, out)
+    _caches.miss(out)
+
+    # In-process first; ffmpeg (already installed) for whatever Pillow can't read
+    def generate() -> Path | None:
+        if out.exists():
+            return out
+        made = _still_thumb_to(out, src, size, lambda: src)
+        if made is not None:
+            _gc_variants(made)
+        return made
+
+    made = _thumb_once(out, generate)
+    if made is None:
         # fallback: serve original
         return FileResponse(str(src), headers={"Cache-Control": "public, max-age=60"})
 
-    return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+    return _thumb_response(request, made)
 
 @app.post("/performers/import-csv")
 async def import_performers_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
@@ -532,30 +1139,30 @@ async def import_performers_csv(file: UploadFile = File(...), db: Session = Depe
         existing = db.execute(select(Performer).where(Performer.name == name)).scalar_one_or_none()
         target = existing or Performer(name=name)
 
-        target.aliases = row.get("Aliases")
-        target.date_of_birth = row.get("Date of birth")
+        target.aliases = _clean_text(row.get("Aliases"))
+        target.date_of_birth = _clean_text(row.get("Date of birth"))
         target.age = _to_int(row.get("Age"))
-        target.career_status = row.get("Career status")
-        target.career_start = row.get("Career start")
-        target.career_end = row.get("Career end")
-        target.date_of_death = row.get("Date of death")
-        target.place_of_birth = row.get("Place of birth")
-        target.ethnicity = row.get("Ethnicity")
-        target.boobs = row.get("Boobs")
+        target.career_status = _clean_text(row.get("Career status"))
+        target.career_start = _clean_text(row.get("Career start"))
+        target.career_end = _clean_text(row.get("Career end"))
+        target.date_of_death = _clean_text(row.get("Date of death"))
+        target.place_of_birth = _clean_text(row.get("Place of birth"))
+        target.ethnicity = _clean_text(row.get("Ethnicity"))
+        target.boobs = _clean_text(row.get("Boobs"))
         target.bust = _to_int(row.get("Bust"))
-        target.cup = row.get("Cup")
-        target.bra = row.get("Bra")
+        target.cup = _clean_text(row.get("Cup"))
+        target.bra = _clean_text(row.get("Bra"))
         target.waist = _to_int(row.get("Waist"))
         target.hip = _to_int(row.get("Hip"))
-        target.butt = row.get("Butt")
+        target.butt = _clean_text(row.get("Butt"))
         target.height = _to_int(row.get("Height"))
         target.weight = _to_int(row.get("Weight"))
-        target.hair_color = row.get("Hair Color")
-        target.eye_color = row.get("Eye Color")
+        target.hair_color = _clean_text(row.get("Hair Color"))
+        target.eye_color = _clean_text(row.get("Eye Color"))
         target.piercings = _to_bool(row.get("Piercings"))
-        target.piercing_locations = row.get("Piercing locations")
+        target.piercing_locations = _clean_text(row.get("Piercing locations"))
         target.tattoos = _to_bool(row.get("Tattoos"))
-        target.tattoo_locations = row.get("Tattoo locations")
+        target.tattoo_locations = _clean_text(row.get("Tattoo locations"))
 
         if existing:
             updated += 1
@@ -589,46 +1196,283 @@ def _safe_media_path(rel_path: str) -> Path:
         raise HTTPException(400, "Invalid path")
     return target
 
-def _thumb_path_for(rel_path: str) -> Path:
-    # stable filename
-    safe = re.sub(r"[^a-zA-Z0-9._-]+", "_", rel_path).strip("_")
-    return THUMB_CACHE / f"{safe}.jpg"
-
-def _zip_cache_key(rel_path: str, entry: str, size: int | None = None) -> str:
-    h = hashlib.sha1()
-    h.update(rel_path.encode("utf-8"))
-    h.update(b"::")
-    h.update(entry.encode("utf-8"))
-    if size is not None:
-        h.update(b"::")
-        h.update(str(size).encode("utf-8"))
-    return h.hexdigest()
+# Thumbnail cache layout: <root>/<ab>/<cd>/<source>_<version>_<target>.jpg
+#   source  - hash of what the thumb is of (media rel_path, or zip path + entry)
+#   version - hash of the source file's size/mtime (+ THUMB_CACHE_VERSION)
+#   target  - requested width
+# A replaced file gets a new version, so stale thumbs are never served, and the
+# shared source prefix lets superseded variants be found and removed.
+
+def _cache_hash(*parts, length: int = 20) -> str:
+    return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:length]
+
+def _thumb_version(size: int | None, mtime: int | None, *extra) -> str:
+    return _cache_hash(THUMB_CACHE_VERSION, size, mtime, *extra, length=12)
+
+def _variant_path(root: Path, source: str, version: str, target: int, fmt: str = "jpg") -> Path:
+    return root / source[:2] / source[2:4] / f"{source}_{version}_{target}.{fmt}"
+
+def _gc_variants(path: Path) -> None:
+    """Delete cached variants of the same source whose version is superseded."""
+    source, version, _ = path.stem.split("_", 2)
+    try:
+        for f in path.parent.glob(f"{source}_*"):
+            if f.stem.split("_", 2)[1] != version:
+                f.unlink(missing_ok=True)
+                _caches.discard(f)
+    except OSError:
+        pass
+
+def _thumb_path_for(rel_path: str, size: int | None, mtime: int | None, target: int = 480, fmt: str = "jpg") -> Path:
+    return _variant_path(MEDIA_THUMB_DIR, _cache_hash(rel_path), _thumb_version(size, mtime), target, fmt)
+
+def _media_thumb_variants(rel_path: str) -> list[Path]:
+    # Thumbnails and video previews of one media file.
+    source = _cache_hash(rel_path)
+    return [
+        f
+        for root in (MEDIA_THUMB_DIR, PREVIEW_DIR)
+        for f in (root / source[:2] / source[2:4]).glob(f"{source}_*")
+    ]
+
+def _drop_media_thumbs(rel_path: str) -> None:
+    for f in _media_thumb_variants(rel_path):
+        f.unlink(missing_ok=True)
+        _caches.discard(f)
+    for d in HLS_DIR.glob(f"{_cache_hash(rel_path)}_*"):
+        shutil.rmtree(d, ignore_errors=True)
+        _caches.discard(d)
+
+def _move_media_thumbs(old_rel: str, new_rel: str) -> None:
+    """Carry cached thumbnails over to a file's new path (versions don't depend on it)."""
+    old_source, new_source = _cache_hash(old_rel), _cache_hash(new_rel)
+    for f in _media_thumb_variants(old_rel):
+        dest_dir = f.parent.parent.parent / new_source[:2] / new_source[2:4]
+        try:
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            dest = dest_dir / f.name.replace(old_source, new_source, 1)
+            f.replace(dest)
+            _caches.discard(f)
+            _caches.add(dest)
+        except OSError:
+            pass
+
+def _zip_thumb_path(rel_path: str, entry: str, zip_stat: os.stat_result, target: int, fmt: str = "jpg") -> Path:
+    return _variant_path(
+        ZIP_THUMB_DIR,
+        _cache_hash(rel_path, entry),
+        _thumb_version(zip_stat.st_size, int(zip_stat.st_mtime)),
+        target,
+        fmt,
+    )
+
+def _snap_thumb_size(size: int) -> int:
+    """Nearest width on THUMB_SIZES (ties go to the larger one)."""
+    return min(THUMB_SIZES, key=lambda step: (abs(step - size), -step))
+
+def _offered_thumb_formats() -> list[str]:
+    return [f for f in THUMB_FORMATS if f in THUMB_MIME and f in _thumbnailer.formats]
+
+def _thumb_format(request: Request) -> str:
+    offered = [THUMB_MIME[f] for f in _offered_thumb_formats()]
+    mime = negotiate_type(request.headers.get("accept"), offered, THUMB_MIME["jpg"])
+    return next(f for f, m in THUMB_MIME.items() if m == mime)
+
+def _thumb_response(request: Request, out: Path) -> Response:
+    """Serve a cached thumbnail variant with a strong ETag.
+
+    Variant names are derived from the source's size/mtime, the width and the
+    format, and rendering is deterministic, so the name identifies the bytes.
+    Vary: Accept because the format was negotiated.
+    """
+    headers = {
+        "ETag": f'"{out.name}"',
+        "Vary": "Accept",
+        "Cache-Control": "public, max-age=3600",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(str(out), media_type=THUMB_MIME.get(out.suffix.lstrip("."), "image/jpeg"), headers=headers)
 
 def _zip_is_image(name: str) -> bool:
     ext = (Path(name).suffix or "").lower()
     return ext in {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 
-def _zip_list_images(zip_full: Path) -> list[str]:
-    out: list[str] = []
-    with zipfile.ZipFile(zip_full, "r") as z:
-        for info in z.infolist():
-            if info.is_dir():
-                continue
-            if _zip_is_image(info.filename):
-                out.append(info.filename)
+def _zip_read_entries(z: zipfile.ZipFile) -> list[dict]:
+    """Image entries from a zip's central directory, as zip_entries rows."""
+    infos = [i for i in z.infolist() if not i.is_dir() and _zip_is_image(i.filename)]
     # stable ordering
-    out.sort(key=lambda s: s.lower())
-    return out
+    infos.sort(key=lambda i: i.filename.lower())
+    return [
+        {
+            "position": n,
+            "name": i.filename,
+            "header_offset": i.header_offset,
+            "compress_size": i.compress_size,
+            "file_size": i.file_size,
+            "compress_type": i.compress_type,
+            "flag_bits": i.flag_bits,
+            "crc": i.CRC,
+        }
+        for n, i in enumerate(infos)
+    ]
+
+def _store_zip_entries(db: Session, media_id: int, mtime: int | None, entries: list[dict]) -> None:
+    """Replace a zip's recorded entries (the caller commits)."""
+    db.execute(delete(ZipEntry).where(ZipEntry.media_item_id == media_id))
+    if entries:
+        db.execute(insert(ZipEntry), [{"media_item_id": media_id, **e} for e in entries])
+    db.execute(update(MediaItem).where(MediaItem.id == media_id).values(zip_entries_mtime=mtime))
+
+_ZIP_ENTRY_COLUMNS = (
+    ZipEntry.position, ZipEntry.name, ZipEntry.header_offset, ZipEntry.compress_size,
+    ZipEntry.file_size, ZipEntry.compress_type, ZipEntry.flag_bits, ZipEntry.crc,
+)
+
+def _zip_entries(rel_path: str, zip_full: Path, name: str | None = None) -> list[dict]:
+    """Image entries of a zip (only `name`, if given), in gallery order.
+
+    Served from zip_entries while the recorded mtime matches the file; an
+    unindexed or changed zip is read through the open-handle cache and, if
+    it has a MediaItem, its rows are refreshed.
+    """
+    mtime = int(zip_full.stat().st_mtime)
+    with SessionLocal() as db:
+        item = db.execute(
+            select(MediaItem.id, MediaItem.zip_entries_mtime).where(MediaItem.rel_path == rel_path)
+        ).first()
+        if item is not None and item.zip_entries_mtime == mtime:
+            q = select(*_ZIP_ENTRY_COLUMNS).where(ZipEntry.media_item_id == item.id)
+            if name is not None:
+                q = q.where(ZipEntry.name == name)
+            return [row._asdict() for row in db.execute(q.order_by(ZipEntry.position.asc()))]
 
-def _zip_extract_to_tmp(zip_full: Path, entry: str, tmp_path: Path) -> Path:
-    tmp_path.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_full, "r") as z:
         try:
-            with z.open(entry, "r") as f:
-                tmp_path.write_bytes(f.read())
-        except KeyError:
-            raise HTTPException(404, "Entry not found in zip")
+            with _zip_handles.lease(zip_full) as z:
+                entries = _zip_read_entries(z)
+        except zipfile.BadZipFile:
+            raise HTTPException(400, "Invalid zip file")
+        if item is not None:
+            _store_zip_entries(db, item.id, mtime, entries)
+            db.commit()
+    if name is not None:
+        return [e for e in entries if e["name"] == name]
+    return entries
+
+def _zip_entry(rel_path: str, zip_full: Path, name: str) -> dict:
+    found = _zip_entries(rel_path, zip_full, name)
+    if not found:
+        raise HTTPException(404, "Entry not found in zip")
+    return found[0]
+
+def _zip_cover(rel_path: str, zip_full: Path) -> str | None:
+    # Cover = first image entry
+    with SessionLocal() as db:
+        item = db.execute(
+            select(MediaItem.id, MediaItem.zip_entries_mtime).where(MediaItem.rel_path == rel_path)
+        ).first()
+        if item is not None and item.zip_entries_mtime == int(zip_full.stat().st_mtime):
+            return db.execute(
+                select(ZipEntry.name)
+                .where(ZipEntry.media_item_id == item.id)
+                .order_by(ZipEntry.position.asc())
+                .limit(1)
+            ).scalar_one_or_none()
+    entries = _zip_entries(rel_path, zip_full)
+    return entries[0]["name"] if entries else None
+
+def _probe_media_metadata(db: Session, emit, prefix: str = "", rel_paths: list[str] | None = None) -> int:
+    """Fill the ffprobe metadata of videos/images that are new or changed since their last probe.
+
+    Limited to the scope `prefix`, or to `rel_paths` when given. Files that
+    can't be probed are recorded with empty metadata so they aren't retried
+    until they change.
+    """
+    q = select(MediaItem.id, MediaItem.rel_path, MediaItem.kind, MediaItem.mtime).where(
+        MediaItem.kind.in_(("video", "image")),
+        MediaItem.probed_mtime.is_distinct_from(MediaItem.mtime),
+    )
+    q = q.where(MediaItem.rel_path.in_(rel_paths)) if rel_paths is not None else q.where(_in_scope(prefix))
+    todo = db.execute(q).all()
+    if not todo:
+        return 0
+    emit(f"Reading metadata of {len(todo)} files...", {"phase": "metadata", "total": len(todo)})
+
+    def probe(row) -> dict:
+        return {"id": row.id, "probed_mtime": row.mtime, **_media_metadata(MEDIA_ROOT / row.rel_path, row.kind)}
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="ffprobe") as pool:
+        for i in range(0, len(todo), 100):
+            chunk = todo[i:i + 100]
+            db.execute(update(MediaItem), list(pool.map(probe, chunk)))
+            db.commit()
+            done += len(chunk)
+            emit(f"Read metadata of {done}/{len(todo)} files...", {"phase": "metadata", "done": done, "total": len(todo)})
+    return done
+
+def _index_zip_entries(db: Session, prefix: str, emit) -> int:
+    """Record the image entries of zips in scope whose listing is missing or out of date."""
+    todo = db.execute(
+        select(MediaItem.id, MediaItem.rel_path, MediaItem.mtime).where(
+            MediaItem.kind == "zip",
+            _in_scope(prefix),
+            MediaItem.zip_entries_mtime.is_distinct_from(MediaItem.mtime),
+        )
+    ).all()
+    if not todo:
+        return 0
+    emit(f"Reading {len(todo)} zip listings...", {"phase": "zip_entries", "total": len(todo)})
+
+    def read(row) -> list[dict]:
+        try:
+            with zipfile.ZipFile(MEDIA_ROOT / row.rel_path, "r") as z:
+                return _zip_read_entries(z)
+        except (OSError, zipfile.BadZipFile):
+            return []  # recorded as empty, so a broken zip isn't re-read every run
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="zip-index") as pool:
+        for i in range(0, len(todo), 100):
+            chunk = todo[i:i + 100]
+            for row, entries in zip(chunk, pool.map(read, chunk)):
+                _store_zip_entries(db, row.id, row.mtime, entries)
+            db.commit()
+            done += len(chunk)
+            emit(f"Read {done}/{len(todo)} zip listings...", {"phase": "zip_entries", "done": done, "total": len(todo)})
+    return done
+
+def _zip_tmp_path(rel_path: str, zip_full: Path, entry: str) -> Path:
+    # Versioned on the zip's size/mtime, so a replaced archive never serves stale bytes.
+    st = zip_full.stat()
+    version = _thumb_version(st.st_size, int(st.st_mtime))
+    return ZIP_TMP_DIR / f"{_cache_hash(rel_path, entry)}_{version}{Path(entry).suffix.lower() or '.bin'}"
+
+def _zip_extracted(rel_path: str, zip_full: Path, entry: str) -> Path:
+    """Path of `entry` extracted into the zip tmp cache, extracting it on a miss."""
+    tmp = _zip_tmp_path(rel_path, zip_full, entry)
+    if tmp.exists():
+        _caches.hit(tmp)
+        return tmp
+    _caches.miss(tmp)
+    return _zip_extract_to_tmp(zip_full, entry, tmp)
+
+def _iter_zip_entry(zip_full: Path, entry: str):
+    with _zip_handles.lease(zip_full) as z, z.open(entry, "r") as f:
+        while chunk := f.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+def _zip_entry_bytes(zip_full: Path, entry: str) -> bytes:
+    try:
+        with _zip_handles.lease(zip_full) as z:
+            return z.read(entry)
+    except KeyError:
+        raise HTTPException(404, "Entry not found in zip")
+
+def _zip_extract_to_tmp(zip_full: Path, entry: str, tmp_path: Path) -> Path:
+    _write_atomic(tmp_path, _zip_entry_bytes(zip_full, entry))
     return tmp_path
+
 def _classify_kind(p: Path) -> str:
     ext = p.suffix.lower().lstrip(".")
     if ext in {"mp4","mkv","avi","mov","wmv","webm","m4v"}:
@@ -641,286 +1485,1150 @@ def _classify_kind(p: Path) -> str:
         return "pdf"
     return "other"
 
-@app.post("/media/index")
-async def media_index(db: Session = Depends(get_db)):
-    import json
-    from datetime import datetime
+def _indexable_kind(name: str) -> str | None:
+    # Only index images, zips, and videos
+    kind = _classify_kind(Path(name))
+    return kind if kind in ("image", "video", "zip") else None
+
+def _upsert_media_batch(db: Session, rows: list[dict]) -> None:
+    """Write a chunk of scanned files with a single INSERT ... ON CONFLICT and commit it.
+
+    Written rows are flagged match_pending for the matching phase.
+    """
+    if not rows:
+        return
+    stmt = pg_insert(MediaItem).values([{**r, "match_pending": True} for r in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MediaItem.rel_path],
+        set_={
+            "kind": stmt.excluded.kind,
+            "ext": stmt.excluded.ext,
+            "size": stmt.excluded.size,
+            "mtime": stmt.excluded.mtime,
+            "match_pending": True,
+        },
+    )
+    db.execute(stmt)
+    db.commit()
 
-    async def generate():
-        created = 0
-        updated = 0
-        total_files = 0
-
-        def send_progress(msg: str, data: dict = None):
-            payload = {"timestamp": datetime.utcnow().isoformat(), "message": msg}
-            if data:
-                payload.update(data)
-            return f"data: {json.dumps(payload)}\n\n"
-
-        yield send_progress("Starting media indexing...", {"phase": "scan"})
-
-        for root, dirs, files in os.walk(MEDIA_ROOT):
-            dirs[:] = [d for d in dirs if not d.startswith(".")]
-            for fn in files:
-                if fn.startswith("."):
-                    continue
-                total_files += 1
-                full = Path(root) / fn
-                if not full.is_file():
-                    continue
-                try:
-                    rel = str(full.relative_to(MEDIA_ROOT))
-                except Exception:
-                    continue
+def _resolve_index_scope(db: Session, rel_path: str | None) -> str:
+    """Folder to index, relative to MEDIA_ROOT ("" for all of it).
 
-                st = full.stat()
-                kind = _classify_kind(full)
-                ext = full.suffix.lower().lstrip(".") or None
+    Defaults to the folder picked with /media/select.
+    """
+    if rel_path is None:
+        target = _get_selected_media_path(db)
+    else:
+        target = (MEDIA_ROOT / rel_path).resolve()
+        try:
+            target.relative_to(MEDIA_ROOT)
+        except Exception:
+            raise HTTPException(400, "Invalid path")
+    if not target.exists() or not target.is_dir():
+        raise HTTPException(404, "Folder not found")
+    rel = target.relative_to(MEDIA_ROOT).as_posix()
+    return "" if rel == "." else rel
+
+def _scope_prefix(scope: str) -> str:
+    return f"{scope}/" if scope else ""
+
+def _in_scope(prefix: str):
+    """SQL filter for MediaItems under `prefix` (everything when empty)."""
+    return MediaItem.rel_path.startswith(prefix, autoescape=True) if prefix else true()
+
+def _purge_media_items(db: Session, ids: list[int], chunk_size: int = INDEX_BATCH_SIZE) -> int:
+    """Bulk-delete MediaItems (and their performer links) by id, in chunks."""
+    deleted = 0
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        db.execute(delete(PerformerMedia).where(PerformerMedia.media_item_id.in_(chunk)))
+        deleted += db.execute(delete(MediaItem).where(MediaItem.id.in_(chunk))).rowcount or 0
+    db.commit()
+    return deleted
+
+def _performer_match_keys(name: str | None, aliases: str | None) -> list[str]:
+    """Compact, whitespace-free lookup keys for a performer's name and aliases.
+
+    "firstname.lastname" becomes "firstnamelastname". Sorted and de-duplicated
+    so the joined list doubles as a change signature (Performer.match_keys).
+    """
+    keys = set()
+    if name:
+        keys.add(_norm_compact(name))
+    for alias in (aliases or "").split("|"):
+        a = alias.strip()
+        if a:
+            keys.add(_norm_compact(a))
+    keys.discard("")
+    return sorted(keys)
+
+def _media_path_keys(rel_path: str) -> set[str]:
+    rel = Path(rel_path)
+    return {_norm_compact(part) for part in rel.parts[:-1]} | {_norm_compact(rel.stem)}
+
+def _match_media_path(
+    rel_path: str,
+    key_to_performers: dict[str, list[int]],
+    automaton: KeyAutomaton | None = None,
+) -> dict[int, tuple[float, str]]:
+    """Match one media path against the performer key map.
+
+    Exact folder/filename hits come first; when an `automaton` over the same
+    keys is given, performers whose key only occurs somewhere inside the path
+    (e.g. studio_jane_doe_and_john_roe_1080p.mp4) are added as "partial".
+    Returns {performer_id: (confidence, matched_by)}.
+    """
+    rel = Path(rel_path)
+    out: dict[int, tuple[float, str]] = {}
+
+    # First try exact directory matches (e.g. media/Firstname Lastname/file.mp4)
+    for dir_key in {_norm_compact(part) for part in rel.parts[:-1]}:
+        for performer_id in key_to_performers.get(dir_key, []):
+            out[performer_id] = (1.0, "folder")
+
+    # Fallback to filename matches when no folder match was found.
+    if not out:
+        filename_key = _norm_compact(rel.stem)
+        rel_len = max(len(_norm_compact(rel_path)), 1)
+        for performer_id in key_to_performers.get(filename_key, []):
+            out.setdefault(performer_id, (len(filename_key) / rel_len, "filename"))
+
+    if automaton is not None:
+        for key, confidence in partial_hits(
+            automaton, _norm(str(rel.with_suffix(""))), min_len=PARTIAL_MATCH_MIN_LEN
+        ).items():
+            for performer_id in key_to_performers.get(key, []):
+                if performer_id not in out or out[performer_id][1] == "partial" and out[performer_id][0] < confidence:
+                    out[performer_id] = (confidence, "partial")
+    return out
 
-                # Only index images, zips, and videos
-                if kind not in ("image", "video", "zip"):
-                    continue
+def _sync_performer_links(
+    db: Session,
+    desired: dict[tuple[int, int], tuple[float, str]],
+    media_ids: list[int],
+    performer_ids: list[int],
+    rel_prefix: str = "",
+) -> tuple[int, int, int]:
+    """Diff PerformerMedia rows touching `media_ids` or `performer_ids` against `desired`.
+
+    Links in that scope missing from `desired` are deleted, new ones inserted
+    and changed confidence/matched_by updated; everything else is left alone.
+    Links are further limited to media under `rel_prefix` when given.
+    Returns (added, removed, updated).
+    """
+    existing: dict[tuple[int, int], tuple[int, float, str]] = {}
+    for ids, column in ((media_ids, PerformerMedia.media_item_id), (performer_ids, PerformerMedia.performer_id)):
+        for i in range(0, len(ids), INDEX_BATCH_SIZE):
+            for link_id, performer_id, item_id, confidence, matched_by in db.execute(
+                select(
+                    PerformerMedia.id,
+                    PerformerMedia.performer_id,
+                    PerformerMedia.media_item_id,
+                    PerformerMedia.confidence,
+                    PerformerMedia.matched_by,
+                )
+                .join(MediaItem, PerformerMedia.media_item_id == MediaItem.id)
+                .where(column.in_(ids[i:i + INDEX_BATCH_SIZE]), _in_scope(rel_prefix))
+            ):
+                existing[(int(performer_id), int(item_id))] = (int(link_id), float(confidence or 0.0), matched_by)
+
+    stale = [link[0] for key, link in existing.items() if key not in desired]
+    for i in range(0, len(stale), INDEX_BATCH_SIZE):
+        db.execute(delete(PerformerMedia).where(PerformerMedia.id.in_(stale[i:i + INDEX_BATCH_SIZE])))
+
+    rows = []
+    for (performer_id, item_id), (confidence, matched_by) in desired.items():
+        link = existing.get((performer_id, item_id))
+        if link and link[1] == confidence and link[2] == matched_by:
+            continue
+        rows.append(
+            {
+                "performer_id": performer_id,
+                "media_item_id": item_id,
+                "confidence": confidence,
+                "matched_by": matched_by,
+            }
+        )
+    for i in range(0, len(rows), INDEX_BATCH_SIZE):
+        stmt = pg_insert(PerformerMedia).values(rows[i:i + INDEX_BATCH_SIZE])
+        db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_performer_media",
+                set_={"confidence": stmt.excluded.confidence, "matched_by": stmt.excluded.matched_by},
+            )
+        )
 
-                existing = db.execute(select(MediaItem).where(MediaItem.rel_path == rel)).scalar_one_or_none()
-                if existing:
-                    existing.kind = kind
-                    existing.ext = ext
-                    existing.size = int(st.st_size)
-                    existing.mtime = int(st.st_mtime)
+    added = sum(1 for r in rows if (r["performer_id"], r["media_item_id"]) not in existing)
+    return added, len(stale), len(rows) - added
+
+_automaton_cache: tuple[int, KeyAutomaton] | None = None
+
+def _key_automaton(keys) -> KeyAutomaton:
+    """KeyAutomaton over `keys`, reused while the performer key set is unchanged."""
+    global _automaton_cache
+    fingerprint = hash(tuple(sorted(keys)))
+    if _automaton_cache is None or _automaton_cache[0] != fingerprint:
+        _automaton_cache = (fingerprint, KeyAutomaton(keys))
+    return _automaton_cache[1]
+
+def _match_performers(
+    db: Session,
+    emit,
+    full: bool = False,
+    scope: str = "",
+    rematch_performers: bool = True,
+) -> tuple[int, int, int]:
+    """Match pending media and changed performers; returns (added, removed, updated) links.
+
+    With rematch_performers=False only match_pending media is processed (used
+    by the watcher for a handful of paths).
+    """
+    prefix = _scope_prefix(scope)
+
+    # Only re-match what changed: media written by a scan (match_pending)
+    # against every performer, and performers whose name/aliases changed since
+    # the last run against the whole library. Links are diffed, not wiped, so
+    # the rest of the table (and /performers counts) stay intact meanwhile.
+    changed_media: dict[int, str] = {
+        int(item_id): rel
+        for item_id, rel in db.execute(
+            select(MediaItem.id, MediaItem.rel_path).where(MediaItem.match_pending.is_(True), _in_scope(prefix))
+        )
+    }
+    key_to_performers: dict[str, list[int]] = {}
+    changed_performers: dict[int, str] = {}
+    for performer_id, name, aliases, match_keys in db.execute(
+        select(Performer.id, Performer.name, Performer.aliases, Performer.match_keys)
+    ):
+        keys = _performer_match_keys(name, aliases)
+        for key in keys:
+            key_to_performers.setdefault(key, []).append(int(performer_id))
+        signature = "|".join(keys)
+        if full or signature != match_keys:
+            changed_performers[int(performer_id)] = signature
+
+    automaton = _key_automaton(key_to_performers)
+
+    desired: dict[tuple[int, int], tuple[float, str]] = {}
+    for idx, (item_id, rel) in enumerate(changed_media.items()):
+        if (idx + 1) % 50 == 0:
+            emit(
+                f"Matching media item {idx + 1}/{len(changed_media)}...",
+                {
+                    "phase": "matching",
+                    "media_item": idx + 1,
+                    "total_media": len(changed_media),
+                },
+            )
+        for performer_id, match in _match_media_path(rel, key_to_performers, automaton).items():
+            desired[(performer_id, item_id)] = match
+
+    rematched_media: list[int] = []
+    if changed_performers and rematch_performers:
+        emit(
+            f"Matching {len(changed_performers)} new or changed performers against the library...",
+            {"phase": "matching", "changed_performers": len(changed_performers)},
+        )
+        changed_keys = {
+            key
+            for key, performer_ids in key_to_performers.items()
+            if any(pid in changed_performers for pid in performer_ids)
+        }
+        changed_automaton = KeyAutomaton(changed_keys)
+        # Every item a changed performer matches now or was linked to is
+        # re-matched as a whole, against all performers: folder-over-filename
+        # precedence can add or drop links of unchanged performers there too.
+        linked_items: set[int] = set()
+        changed_ids = list(changed_performers)
+        for i in range(0, len(changed_ids), INDEX_BATCH_SIZE):
+            linked_items.update(
+                int(item_id)
+                for item_id in db.execute(
+                    select(PerformerMedia.media_item_id)
+                    .join(MediaItem, PerformerMedia.media_item_id == MediaItem.id)
+                    .where(PerformerMedia.performer_id.in_(changed_ids[i:i + INDEX_BATCH_SIZE]), _in_scope(prefix))
+                ).scalars()
+            )
+        for item_id, rel in db.execute(
+            select(MediaItem.id, MediaItem.rel_path).where(_in_scope(prefix)).execution_options(yield_per=5000)
+        ):
+            if item_id in changed_media:
+                continue
+            linked = item_id in linked_items
+            if not linked and not (_media_path_keys(rel) & changed_keys) and not partial_hits(
+                changed_automaton, _norm(str(Path(rel).with_suffix(""))), min_len=PARTIAL_MATCH_MIN_LEN
+            ):
+                continue
+            matches = _match_media_path(rel, key_to_performers, automaton)
+            if not linked and not any(performer_id in changed_performers for performer_id in matches):
+                continue
+            rematched_media.append(int(item_id))
+            for performer_id, match in matches.items():
+                desired[(performer_id, int(item_id))] = match
+
+    added, removed, relinked = _sync_performer_links(
+        db,
+        desired,
+        [*changed_media, *rematched_media],
+        list(changed_performers) if rematch_performers else [],
+        rel_prefix=prefix,
+    )
+    # A scoped run only re-matched changed performers inside the scope, so
+    # leave them flagged for the next full-library run.
+    if rematch_performers and not scope:
+        for performer_id, signature in changed_performers.items():
+            db.execute(
+                update(Performer).where(Performer.id == performer_id).values(match_keys=signature)
+            )
+    matched_ids = list(changed_media)
+    for i in range(0, len(matched_ids), INDEX_BATCH_SIZE):
+        db.execute(
+            update(MediaItem)
+            .where(MediaItem.id.in_(matched_ids[i:i + INDEX_BATCH_SIZE]))
+            .values(match_pending=False)
+        )
+    db.commit()
+
+    emit(
+        f"Matching complete: {added} performer-media links created, {removed} removed, {relinked} updated",
+        {
+            "phase": "complete",
+            "matches": added,
+            "links_removed": removed,
+            "links_updated": relinked,
+        },
+    )
+    return added, removed, relinked
+
+# Advisory lock (two-key form, so it can't collide with the per-job locks in
+# jobs.py) held while an index run or a watcher batch writes media rows: a run
+# starting mid-batch waits for the batch rather than interleaving with it.
+_INDEX_WRITE_LOCK = (0x1DE7, 1)
+
+@contextmanager
+def _index_write_lock(wait: bool):
+    """Yields whether the lock was taken; with wait=True it always is."""
+    with engine.connect() as conn:
+        params = {"a": _INDEX_WRITE_LOCK[0], "b": _INDEX_WRITE_LOCK[1]}
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:a, :b)"), params)
+        elif not conn.execute(text("SELECT pg_try_advisory_lock(:a, :b)"), params).scalar():
+            yield False
+            return
+        conn.commit()  # session-level lock; don't sit idle in a transaction
+        try:
+            yield True
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:a, :b)"), params)
+            conn.commit()
+
+def _run_media_index(db: Session, params: dict, emit) -> None:
+    """Scan MEDIA_ROOT, reconcile deleted files and (re)match performers.
+
+    With params["scope"] set, only that sub-folder is scanned, reconciled and
+    re-matched; rows and links elsewhere are left untouched. Runs inside an
+    "index" background job (see jobs.py); progress goes out through `emit`.
+    Safe to re-run after an interruption: batches already written are seen as
+    unchanged, and their match_pending flag makes sure they still get matched.
+    """
+    full = bool(params.get("full"))
+    scope = params.get("scope") or ""
+    prefix = _scope_prefix(scope)
+
+    created = 0
+    updated = 0
+    unchanged = 0
+    deleted = 0
+    seen: set[str] = set()
+    pending: list[dict] = []
+    walk_errors: list[OSError] = []
+
+    emit(
+        f"Starting media indexing{f' of {scope}' if scope else ''}...",
+        {"phase": "scan", "incremental": not full, "scope": scope},
+    )
+
+    # Preload what we already know in a single query so unchanged files can be
+    # skipped without a per-file SELECT (and without dirtying their rows).
+    known: dict[str, tuple[int, int | None, int | None]] = {
+        rel: (item_id, size, mtime)
+        for item_id, rel, size, mtime in db.execute(
+            select(MediaItem.id, MediaItem.rel_path, MediaItem.size, MediaItem.mtime).where(_in_scope(prefix))
+        )
+    }
+
+    scanned = scan_media(
+        MEDIA_ROOT / scope if scope else MEDIA_ROOT,
+        _indexable_kind,
+        workers=SCAN_WORKERS,
+        queue_size=SCAN_QUEUE_SIZE,
+        onerror=walk_errors.append,
+        rel_prefix=prefix,
+    )
+    with closing(scanned):
+        for rel, kind, ext, size, mtime in scanned:
+            seen.add(rel)
+            prev = known.get(rel)
+            if prev and not full and prev[1] == size and prev[2] == mtime:
+                unchanged += 1
+            else:
+                pending.append({"rel_path": rel, "kind": kind, "ext": ext, "size": size, "mtime": mtime})
+                if prev:
                     updated += 1
                 else:
-                    db.add(MediaItem(rel_path=rel, kind=kind, ext=ext, size=int(st.st_size), mtime=int(st.st_mtime)))
                     created += 1
+                if len(pending) >= INDEX_BATCH_SIZE:
+                    _upsert_media_batch(db, pending)
+                    pending = []
+
+            if (created + updated + unchanged) % 50 == 0:
+                emit(f"Scanned {created + updated + unchanged} files...", {
+                    "created": created,
+                    "updated": updated,
+                    "unchanged": unchanged,
+                    "phase": "scan"
+                })
+
+    _upsert_media_batch(db, pending)
+    emit(f"Media scan complete: {created} created, {updated} updated, {unchanged} unchanged", {
+        "created": created,
+        "updated": updated,
+        "unchanged": unchanged,
+        "phase": "scan_complete"
+    })
+
+    # Reconcile: anything we had indexed but didn't see on disk is gone.
+    # A walk error (e.g. an unmounted share) would make everything look
+    # deleted, so only purge after a clean walk.
+    stale = [rel for rel in known if rel not in seen]
+    if stale and walk_errors:
+        emit(
+            f"Skipping cleanup of {len(stale)} missing files: {len(walk_errors)} folders could not be read",
+            {"phase": "reconcile", "deleted": 0, "walk_errors": len(walk_errors)},
+        )
+    elif stale:
+        emit(f"Removing {len(stale)} deleted files...", {"phase": "reconcile"})
+        deleted = _purge_media_items(db, [known[rel][0] for rel in stale])
+        for rel in stale:
+            _drop_media_thumbs(rel)
+    emit(f"Reconcile complete: {deleted} deleted", {
+        "deleted": deleted,
+        "phase": "reconcile_complete"
+    })
+
+    _index_zip_entries(db, prefix, emit)
+    _probe_media_metadata(db, emit, prefix=prefix)
+
+    emit("Starting performer matching...", {"phase": "matching"})
+    added, removed, relinked = _match_performers(db, emit, full=full, scope=scope)
+
+    total = db.execute(select(func.count(MediaItem.id))).scalar_one()
+    emit("Indexing finished!", {
+        "phase": "done",
+        "created": created,
+        "updated": updated,
+        "unchanged": unchanged,
+        "deleted": deleted,
+        "total": int(total),
+        "matches": added,
+        "media_root": str(MEDIA_ROOT),
+        "scope": scope,
+    })
 
-                if (created + updated) % 50 == 0:
-                    yield send_progress(f"Scanned {created + updated} files...", {
-                        "created": created,
-                        "updated": updated,
-                        "phase": "scan"
-                    })
-
-        db.commit()
-        yield send_progress(f"Media scan complete: {created} created, {updated} updated", {
-            "created": created,
-            "updated": updated,
-            "phase": "scan_complete"
-        })
+    if THUMB_WARMUP_AFTER_INDEX:
+        with SessionLocal() as jobs_db:
+            job, _ = jobs.submit(jobs_db, "thumbs", {"scope": scope})
+            emit(f"Thumbnail warm-up queued (job {job.id})", {"phase": "done", "thumbs_job_id": job.id})
 
-        yield send_progress("Starting performer matching...", {"phase": "matching"})
-
-        db.execute(delete(PerformerMedia))
-        db.commit()
-
-        performers = db.execute(select(Performer)).scalars().all()
-        media_items = db.execute(select(MediaItem)).scalars().all()
-
-        # Build a lookup of normalized performer names/aliases so we can match
-        # paths without repeatedly scanning every performer. Keys are compact,
-        # whitespace-free strings (e.g. "firstname.lastname" becomes
-        # "firstnamelastname").
-        key_to_performers: dict[str, list[Performer]] = {}
-        for performer in performers:
-            keys = []
-            if performer.name:
-                keys.append(_norm_compact(performer.name))
-            if performer.aliases:
-                for alias in performer.aliases.split("|"):
-                    a = alias.strip()
-                    if a:
-                        keys.append(_norm_compact(a))
-
-            for key in keys:
-                key_to_performers.setdefault(key, []).append(performer)
-
-        matches_created = 0
-        seen_links: set[tuple[int, int]] = set()
-
-        for idx, item in enumerate(media_items):
-            if (idx + 1) % 50 == 0:
-                yield send_progress(
-                    f"Matching media item {idx + 1}/{len(media_items)}...",
-                    {
-                        "phase": "matching",
-                        "matches": matches_created,
-                        "media_item": idx + 1,
-                        "total_media": len(media_items),
-                    },
-                )
 
-            rel_path = Path(item.rel_path)
-            rel_norm = _norm_compact(item.rel_path)
-
-            # First try exact directory matches (e.g. media/Firstname Lastname/file.mp4)
-            folder_matched = False
-            dir_keys = {_norm_compact(part) for part in rel_path.parts[:-1]}
-            for dir_key in dir_keys:
-                for performer in key_to_performers.get(dir_key, []):
-                    link_key = (performer.id, item.id)
-                    if link_key in seen_links:
-                        continue
-                    db.add(
-                        PerformerMedia(
-                            performer_id=performer.id,
-                            media_item_id=item.id,
-                            confidence=1.0,
-                            matched_by="folder",
-                        )
-                    )
-                    seen_links.add(link_key)
-                    matches_created += 1
-                    folder_matched = True
-
-            # Fallback to filename matches when no folder match was found.
-            # This keeps compatibility with previous behavior while avoiding
-            # quadratic performer/media scans.
-            if folder_matched:
-                continue
 
-            filename_key = _norm_compact(rel_path.stem)
-            for performer in key_to_performers.get(filename_key, []):
-                link_key = (performer.id, item.id)
-                if link_key in seen_links:
+def _run_index_job(db: Session, params: dict, emit) -> None:
+    with _index_write_lock(wait=True):
+        _run_media_index(db, params, emit)
+
+jobs.register("index", _run_index_job)
+
+
+def _run_thumb_warmup(db: Session, params: dict, emit) -> None:
+    """Pre-generate media thumbnails so grids don't spawn ffmpeg on first view.
+
+    Items whose cached thumbnail is newer than the file are skipped; the rest
+    go to a pool of THUMB_WARMUP_WORKERS threads (each running one ffmpeg at a
+    time, within the global FFMPEG_MAX_PROCS cap).
+    """
+    scope = params.get("scope") or ""
+    # The variant browsers will ask for: the most preferred format on offer
+    fmt = (_offered_thumb_formats() or ["jpg"])[0]
+    rows = db.execute(
+        select(MediaItem.rel_path, MediaItem.size, MediaItem.mtime)
+        .where(MediaItem.kind.in_(("image", "video", "zip")), _in_scope(_scope_prefix(scope)))
+        .order_by(MediaItem.id.desc())  # newest first
+    ).all()
+    db.rollback()  # don't hold a transaction open while ffmpeg runs
+
+    total = len(rows)
+    generated = skipped = failed = 0
+    emit(f"Warming up thumbnails for {total} items...", {"phase": "thumbs", "total": total})
+
+    def warm(rel: str) -> bool:
+        try:
+            return _generate_media_thumb(MEDIA_ROOT / rel, rel, fmt=fmt) is not None
+        except Exception:
+            return False
+
+    def report() -> None:
+        done = generated + skipped + failed
+        if done % 50 == 0 or done == total:
+            emit(f"Thumbnails {done}/{total}...", {
+                "phase": "thumbs",
+                "generated": generated,
+                "skipped": skipped,
+                "failed": failed,
+                "total": total,
+            })
+
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=THUMB_WARMUP_WORKERS, thread_name_prefix="thumb-warmup") as pool:
+        try:
+            for rel, size, mtime in rows:
+                if _thumb_path_for(rel, size, mtime, fmt=fmt).exists():
+                    skipped += 1
+                    report()
                     continue
-                rel_len = max(len(rel_norm), 1)
-                db.add(
-                    PerformerMedia(
-                        performer_id=performer.id,
-                        media_item_id=item.id,
-                        confidence=len(filename_key) / rel_len,
-                        matched_by="filename",
-                    )
-                )
-                seen_links.add(link_key)
-                matches_created += 1
+                in_flight.add(pool.submit(warm, rel))
+                if len(in_flight) >= THUMB_WARMUP_WORKERS * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        if fut.result():
+                            generated += 1
+                        else:
+                            failed += 1
+                        report()
+            for fut in in_flight:
+                if fut.result():
+                    generated += 1
+                else:
+                    failed += 1
+                report()
+        except BaseException:
+            for fut in in_flight:
+                fut.cancel()
+            raise
+
+    emit(f"Thumbnail warm-up finished: {generated} generated, {skipped} already current, {failed} failed", {
+        "phase": "thumbs_complete",
+        "generated": generated,
+        "skipped": skipped,
+        "failed": failed,
+        "total": total,
+    })
+
+
+jobs.register("thumbs", _run_thumb_warmup)
+
+
+def _move_media(db: Session, src: str, dest: str, is_dir: bool) -> bool:
+    """Rename MediaItems in place so their ids, links and thumbnails survive.
+
+    Returns False when there was nothing indexed at `src`.
+    """
+    if is_dir:
+        src_prefix, dest_prefix = _scope_prefix(src), _scope_prefix(dest)
+        rows = db.execute(select(MediaItem.id, MediaItem.rel_path).where(_in_scope(src_prefix))).all()
+        if not rows:
+            return False
+        clash = db.execute(select(MediaItem.id).where(_in_scope(dest_prefix))).scalars().all()
+        _purge_media_items(db, list(clash))
+        db.execute(
+            update(MediaItem)
+            .where(_in_scope(src_prefix))
+            .values(
+                rel_path=func.concat(dest_prefix, func.substr(MediaItem.rel_path, len(src_prefix) + 1)),
+                match_pending=True,
+            )
+        )
+        renames = [(rel, dest_prefix + rel[len(src_prefix):]) for _, rel in rows]
+    else:
+        item = db.execute(select(MediaItem).where(MediaItem.rel_path == src)).scalar_one_or_none()
+        if not item:
+            return False
+        kind = _indexable_kind(Path(dest).name)
+        if kind is None:
+            # e.g. renamed to a non-media extension
+            _purge_media_items(db, [item.id])
+            _drop_media_thumbs(src)
+            return True
+        clash = db.execute(select(MediaItem.id).where(MediaItem.rel_path == dest)).scalars().all()
+        _purge_media_items(db, list(clash))
+        item.rel_path = dest
+        item.kind = kind
+        item.ext = Path(dest).suffix.lower().lstrip(".") or None
+        item.match_pending = True
+        renames = [(src, dest)]
+    db.commit()
 
-        db.commit()
+    for old, new in renames:
+        _move_media_thumbs(old, new)
+    return True
+
+
+def _apply_watch_batch(batch: WatchBatch) -> bool:
+    with _index_write_lock(wait=False) as locked, SessionLocal() as db:
+        if not locked or jobs.active_job(db, "index"):
+            return False  # retry once the index run is done
+
+        changed = dict(batch.changed)
+        for src, dest, is_dir in batch.moves:
+            if not _move_media(db, src, dest, is_dir):
+                changed[dest] = is_dir
+
+        stale_ids: list[int] = []
+        for rel, is_dir in batch.deleted.items():
+            where = _in_scope(_scope_prefix(rel)) if is_dir else MediaItem.rel_path == rel
+            for item_id, item_rel in db.execute(select(MediaItem.id, MediaItem.rel_path).where(where)):
+                stale_ids.append(int(item_id))
+                _drop_media_thumbs(item_rel)
+        _purge_media_items(db, stale_ids)
+
+        rows: list[dict] = []
+        for rel, is_dir in changed.items():
+            full_path = MEDIA_ROOT / rel
+            if is_dir:
+                with closing(
+                    scan_media(full_path, _indexable_kind, workers=SCAN_WORKERS, rel_prefix=_scope_prefix(rel))
+                ) as scanned:
+                    rows.extend(f._asdict() for f in scanned)
+                continue
+            kind = _indexable_kind(full_path.name)
+            if kind is None:
+                continue
+            try:
+                st = full_path.stat()
+            except OSError:
+                continue  # already gone again; a delete event follows
+            if not full_path.is_file():
+                continue
+            rows.append({
+                "rel_path": rel,
+                "kind": kind,
+                "ext": full_path.suffix.lower().lstrip(".") or None,
+                "size": int(st.st_size),
+                "mtime": int(st.st_mtime),
+            })
+        for i in range(0, len(rows), INDEX_BATCH_SIZE):
+            _upsert_media_batch(db, rows[i:i + INDEX_BATCH_SIZE])
+            _probe_media_metadata(db, lambda *_: None, rel_paths=[r["rel_path"] for r in rows[i:i + INDEX_BATCH_SIZE]])
+
+        added, removed, relinked = _match_performers(db, lambda *_: None, rematch_performers=False)
+        log.info(
+            "Watcher: %d moved, %d deleted, %d upserted, links +%d/-%d/~%d",
+            len(batch.moves), len(stale_ids), len(rows), added, removed, relinked,
+        )
+    return True
+
+
+def _index_watch_batch(batch: WatchBatch) -> None:
+    """Fallback for a batch _apply_watch_batch failed on: index the folder it touched."""
+    scope = common_folder(batch_folders(batch))
+    while scope and not (MEDIA_ROOT / scope).is_dir():
+        scope = os.path.dirname(scope)
+    with SessionLocal() as db:
+        job, created = jobs.submit(db, "index", {"full": False, "scope": scope})
+    if not created:
+        log.warning("Index job %s already running; changes under %r wait for the next run", job.id, scope or "/")
+
+
+def _submit_poll_index(scope: str) -> bool:
+    with SessionLocal() as db:
+        _, created = jobs.submit(db, "index", {"full": False, "scope": scope})
+    return created
+
+
+_watch_services: list = []
+
+def start_media_watcher(mode: str = MEDIA_WATCH) -> None:
+    """Start the live index updater for MEDIA_WATCH mode (no-op when "off")."""
+    if mode == "auto":
+        fstype = network_fs_type(MEDIA_ROOT)
+        if fstype:
+            log.info("%s is on %s, where inotify misses remote changes; polling instead", MEDIA_ROOT, fstype)
+            mode = "poll"
+    if mode in ("auto", "inotify"):
+        watcher = MediaWatcher(
+            MEDIA_ROOT, _apply_watch_batch, debounce=WATCH_DEBOUNCE_SECONDS, fallback=_index_watch_batch
+        )
+        try:
+            watcher.start()
+            _watch_services.append(watcher)
+            log.info("Watching %s for changes (inotify)", MEDIA_ROOT)
+            return
+        except Exception:
+            if mode == "inotify":
+                raise
+            log.warning("inotify unavailable for %s, falling back to polling", MEDIA_ROOT, exc_info=True)
+            watcher.stop()
+        mode = "poll"
+    if mode == "poll":
+        poller = IndexPoller(MEDIA_ROOT, _submit_poll_index, WATCH_POLL_INTERVAL)
+        poller.start()
+        _watch_services.append(poller)
+        log.info("Polling %s every %ss for changes", MEDIA_ROOT, WATCH_POLL_INTERVAL)
+
+def stop_media_watcher() -> None:
+    while _watch_services:
+        _watch_services.pop().stop()
+
+def run_media_watcher() -> None:
+    """Blocking entry point for running the watcher as its own process."""
+    Base.metadata.create_all(bind=engine)
+    _upgrade_schema()
+    start_media_watcher(MEDIA_WATCH if MEDIA_WATCH != "off" else "auto")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_media_watcher()
 
-        yield send_progress(f"Matching complete: {matches_created} performer-media links created", {
-            "phase": "complete",
-            "matches": matches_created
-        })
 
-        total = db.execute(select(MediaItem)).scalars().all()
-        yield send_progress("Indexing finished!", {
-            "phase": "done",
-            "created": created,
-            "updated": updated,
-            "total": len(total),
-            "matches": matches_created,
-            "media_root": str(MEDIA_ROOT)
-        })
+def _job_event_stream(job_id: int, after_id: int = 0):
+    """SSE of a job's events from `after_id` on, until the job has finished.
+
+    Each event carries its id, so a client can re-attach with Last-Event-ID
+    (or ?after=) and pick up where it left off.
+    """
+    async def generate():
+        last_id = after_id
+        while True:
+            def poll():
+                with SessionLocal() as db:
+                    status = db.execute(select(Job.status).where(Job.id == job_id)).scalar()
+                    return status, jobs.events_after(db, job_id, last_id)
+
+            status, events = await run_in_threadpool(poll)
+            for event_id, payload in events:
+                last_id = event_id
+                yield f"id: {event_id}\ndata: {payload}\n\n"
+            if status is None or (status in jobs.FINISHED_STATUSES and not events):
+                return
+            if not events:
+                await asyncio.sleep(0.5)
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+@app.post("/media/index")
+def media_index(
+    full: bool = Query(False, description="Rewrite every row instead of skipping unchanged files"),
+    rel_path: str | None = Query(None, description="Folder to index, relative to MEDIA_ROOT (defaults to the selected folder)"),
+    db: Session = Depends(get_db),
+):
+    # Starts (or attaches to) the background index job and streams its progress.
+    # Closing the stream doesn't stop the job; see /jobs/* to manage it.
+    scope = _resolve_index_scope(db, rel_path)
+    job, created = jobs.submit(db, "index", {"full": full, "scope": scope})
+    if not created:
+        running = json.loads(job.params) if job.params else {}
+        if bool(running.get("full")) != full or (running.get("scope") or "") != scope:
+            # Attaching would silently drop this request's full/rel_path
+            raise HTTPException(409, {"message": "An index job with different parameters is already running", "job": jobs.job_to_dict(job)})
+    return _job_event_stream(job.id)
+
+
+@app.post("/jobs/index", status_code=202)
+def jobs_index(
+    full: bool = Query(False, description="Rewrite every row instead of skipping unchanged files"),
+    rel_path: str | None = Query(None, description="Folder to index, relative to MEDIA_ROOT (defaults to the selected folder)"),
+    db: Session = Depends(get_db),
+):
+    scope = _resolve_index_scope(db, rel_path)
+    job, created = jobs.submit(db, "index", {"full": full, "scope": scope})
+    if not created:
+        raise HTTPException(409, {"message": "An index job is already running", "job": jobs.job_to_dict(job)})
+    return jobs.job_to_dict(job)
+
+
+@app.post("/jobs/thumbs", status_code=202)
+def jobs_thumbs(
+    rel_path: str | None = Query(None, description="Folder to warm up, relative to MEDIA_ROOT (defaults to the selected folder)"),
+    db: Session = Depends(get_db),
+):
+    scope = _resolve_index_scope(db, rel_path)
+    job, created = jobs.submit(db, "thumbs", {"scope": scope})
+    if not created:
+        raise HTTPException(409, {"message": "A thumbnail warm-up job is already running", "job": jobs.job_to_dict(job)})
+    return jobs.job_to_dict(job)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return jobs.job_to_dict(job)
+
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: int, request: Request, after: int = 0, db: Session = Depends(get_db)):
+    if not db.get(Job, job_id):
+        raise HTTPException(404, "Job not found")
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return _job_event_stream(job_id, after)
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    job = jobs.cancel(db, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return jobs.job_to_dict(job)
+
+
 @app.get("/media/stream")
-def media_stream(rel_path: str = Query(..., description="Relative path within MEDIA_ROOT")):
+def media_stream(request: Request, rel_path: str = Query(..., description="Relative path within MEDIA_ROOT")):
     p = _safe_media_path(rel_path)
     if not p.exists() or not p.is_file():
         raise HTTPException(404, "File not found")
 
+    # Ranges (single and multi), If-Range and 304s are handled by RangeFileResponse;
+    # a seek only reads the bytes it asks for.
+    st = p.stat()
     mime, _ = mimetypes.guess_type(str(p))
-    return FileResponse(str(p), media_type=mime or "application/octet-stream", headers={"Accept-Ranges": "bytes"})
+    return RangeFileResponse(
+        p,
+        request.headers,
+        etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+        last_modified=st.st_mtime,
+        length=st.st_size,
+        media_type=mime,
+    )
+
+def _generate_media_thumb(p: Path, rel_path: str, target: int = 480, fmt: str = "jpg") -> Path | None:
+    """Create (or reuse) the cached thumbnail for an image, video or zip cover.
+
+    Concurrent calls for the same file share one generation. Returns the
+    thumbnail path (a JPEG one if `fmt` couldn't be produced), or None when
+    it couldn't be generated.
+    """
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    out = _thumb_path_for(rel_path, st.st_size, int(st.st_mtime), target, fmt)
+    if out.exists():
+        _caches.hit(out)
+        return out
+    _caches.miss(out)
+
+    def generate() -> Path | None:
+        if out.exists():
+            return out  # finished by the flight we just missed
+
+        kind = _classify_kind(p)
+        made = None
+        if kind == "image":
+            # Downscale in-process; ffmpeg only for what Pillow can't decode
+            made = _still_thumb_to(out, p, target, lambda: p)
+
+        elif kind == "video" and fmt != "jpg":
+            # ffmpeg grabs the frame as JPEG; other formats are re-encoded from that
+            made = _generate_media_thumb(p, rel_path, target)
+            if made is not None and _image_thumb_to(out, made, target):
+                made = out
+
+        elif kind == "video":
+            # generate a representative frame scaled to `target` width
+            duration = _media_duration(rel_path, p)
+            if duration:
+                # Known length: one seek that can't land past the end (30s in, or a third of a short clip)
+                attempts = [["-ss", f"{30.0 if duration > 90 else duration / 3:.3f}"], []]
+            else:
+                attempts = [
+                    ["-ss", "00:00:30"],  # prefer a representative frame 30s in
+                    ["-ss", "00:00:01"],  # fallback to early frame
+                    [],  # final fallback: first frame
+                ]
+            for seek in attempts:
+                if _ffmpeg_to(out, [*seek, "-i", str(p), "-frames:v", "1", "-vf", f"scale='min({target},iw)':-2", "-q:v", "4"]):
+                    made = out
+                    break
+
+        elif kind == "zip":
+            entry = _zip_cover(rel_path, p)
+            if entry is None:
+                return None
+            made = _still_thumb_to(out, _zip_entry_bytes(p, entry), target, lambda: _zip_extracted(rel_path, p, entry))
+
+        if made is None or not made.exists():
+            return None
+        _gc_variants(made)
+        return made
+
+    return _thumb_once(out, generate)
 
 @app.get("/media/thumb")
-def media_thumb(rel_path: str = Query(..., description="Relative path within MEDIA_ROOT")):
+def media_thumb(
+    request: Request,
+    rel_path: str = Query(..., description="Relative path within MEDIA_ROOT"),
+    size: int = Query(480, description="Width; snapped to the nearest THUMB_SIZES step"),
+):
+    """Thumbnail of an image, video or zip cover, as AVIF/WebP/JPEG depending on Accept."""
     p = _safe_media_path(rel_path)
     if not p.exists() or not p.is_file():
         raise HTTPException(404, "File not found")
 
-    out = _thumb_path_for(rel_path)
-    if out.exists() and out.is_file():
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
-
     kind = _classify_kind(p)
-    if kind == "image":
-        # for now, just serve original image (browser will scale); still cache a copy as jpg
-        try:
-            # If it's already jpg/jpeg, we can copy; otherwise best-effort convert via ffmpeg if present
-            if p.suffix.lower() in [".jpg", ".jpeg"]:
-                out.write_bytes(p.read_bytes())
-            else:
-                # convert to jpg thumbnail-ish with ffmpeg (scale longest edge to 480)
-                subprocess.run(
-                    ["ffmpeg", "-y", "-i", str(p), "-vf", "scale='min(480,iw)':-2", "-q:v", "4", str(out)],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    check=False,
-                )
-                if not out.exists():
-                    out.write_bytes(p.read_bytes())
-        except Exception:
-            return FileResponse(str(p))
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
-
-    if kind == "video":
-        # generate a frame at ~1s (or first frame) scaled to 480 width
-        attempts = [
-            ["-ss", "00:00:30"],  # prefer a representative frame 30s in
-            ["-ss", "00:00:01"],  # fallback to early frame
-            [],  # final fallback: first frame
-        ]
+    if kind not in ("image", "video", "zip"):
+        raise HTTPException(415, "No thumbnail for this file type")
+    if kind == "zip" and _zip_cover(rel_path, p) is None:
+        raise HTTPException(404, "No images found in zip")
 
-        for seek in attempts:
-            if out.exists():
-                break
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    *seek,
-                    "-i",
-                    str(p),
-                    "-frames:v",
-                    "1",
-                    "-vf",
-                    "scale='min(480,iw)':-2",
-                    "-q:v",
-                    "4",
-                    str(out),
-                ],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=False,
-            )
-        if not out.exists():
-            raise HTTPException(500, "Failed to generate thumbnail (ffmpeg unavailable?)")
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+    try:
+        out = _generate_media_thumb(p, rel_path, _snap_thumb_size(size), _thumb_format(request))
+    except HTTPException:
+        raise
+    except Exception:
+        out = None
+    if out is not None:
+        return _thumb_response(request, out)
 
+    if kind == "image":
+        # for now, just serve original image (browser will scale)
+        return FileResponse(str(p))
     if kind == "zip":
-        entries = _zip_list_images(p)
-        if not entries:
-            raise HTTPException(404, "No images found in zip")
+        # fallback: serve the original cover entry
+        entry = _zip_cover(rel_path, p)
+        tmp = _zip_extracted(rel_path, p, entry)
+        mime, _ = mimetypes.guess_type(entry)
+        return FileResponse(str(tmp), media_type=mime or "application/octet-stream", headers={"Cache-Control": "public, max-age=60"})
+    raise HTTPException(500, "Failed to generate thumbnail (ffmpeg unavailable?)")
 
-        entry = entries[0]
-        size = 480
-        key = _zip_cache_key(rel_path, entry, size=size)
-        out = ZIP_CACHE / "thumbs" / f"{key}.jpg"
+def _vtt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
 
-        if out.exists() and out.is_file():
-            return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+def _generate_video_preview(p: Path, rel_path: str) -> dict | None:
+    """Create (or reuse) the scrub preview of a video: a tiled sprite plus its layout.
 
-        tmp = ZIP_CACHE / "tmp" / f"{key}{Path(entry).suffix.lower() or '.bin'}"
-        _zip_extract_to_tmp(p, entry, tmp)
+    All frames come from one ffmpeg run with one fast input seek per frame, at
+    the middle of each of PREVIEW_FRAMES equal slices of the probed duration.
+    Returns the layout (see /media/preview) or None if it couldn't be made.
+    """
+    st = p.stat()
+    sprite = _variant_path(PREVIEW_DIR, _cache_hash(rel_path), _thumb_version(st.st_size, int(st.st_mtime)), PREVIEW_FRAMES)
+    meta_path = sprite.with_suffix(".json")
 
+    def cached() -> dict | None:
         try:
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", str(tmp), "-vf", f"scale='min({size},iw)':-2", "-q:v", "4", str(out)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=False,
+            meta = json.loads(meta_path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        return meta if sprite.exists() else None
+
+    meta = cached()
+    if meta is not None:
+        _caches.hit(meta_path)
+        return {**meta, "sprite": sprite}
+    _caches.miss(meta_path)
+
+    def generate() -> dict | None:
+        meta = cached()
+        if meta is not None:
+            return meta
+        duration = _media_duration(rel_path, p)
+        if not duration:
+            return None
+        frames = PREVIEW_FRAMES
+        columns = min(PREVIEW_COLUMNS, frames)
+        rows = -(-frames // columns)
+        interval = duration / frames
+        w, h = PREVIEW_TILE_WIDTH, PREVIEW_TILE_HEIGHT
+
+        args: list[str] = []
+        chains = []
+        for i in range(frames):
+            args += ["-ss", f"{(i + 0.5) * interval:.3f}", "-i", str(p)]
+            chains.append(
+                f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,"
+                f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p[f{i}]"
             )
-        except Exception:
-            pass
-
-        if not out.exists():
-            # fallback: serve the extracted original entry
-            mime, _ = mimetypes.guess_type(entry)
-            return FileResponse(str(tmp), media_type=mime or "application/octet-stream", headers={"Cache-Control": "public, max-age=60"})
+        graph = ";".join([*chains, "".join(f"[f{i}]" for i in range(frames)) + f"concat=n={frames}:v=1:a=0,tile={columns}x{rows}[out]"])
+        if not _ffmpeg_to(sprite, [*args, "-filter_complex", graph, "-map", "[out]", "-frames:v", "1", "-q:v", "5"]):
+            return None
+        meta = {
+            "duration": duration,
+            "frames": frames,
+            "interval": interval,
+            "columns": columns,
+            "rows": rows,
+            "tile_width": w,
+            "tile_height": h,
+        }
+        _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        _gc_variants(sprite)
+        return meta
+
+    meta = _thumb_once(sprite, generate)
+    return {**meta, "sprite": sprite} if meta is not None else None
+
+def _video_for_preview(rel_path: str) -> Path:
+    p = _safe_media_path(rel_path)
+    if not p.exists() or not p.is_file():
+        raise HTTPException(404, "File not found")
+    if _classify_kind(p) != "video":
+        raise HTTPException(415, "Previews are only available for videos")
+    return p
 
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+@app.get("/media/preview")
+def media_preview(rel_path: str = Query(..., description="Video path relative to MEDIA_ROOT"), format: str = "vtt"):
+    """Scrub thumbnails for a video: a WebVTT thumbnail track (default) or the layout as JSON.
+
+    VTT cues point at `preview/sprite?rel_path=...#xywh=x,y,w,h`, relative to
+    this URL, so the track works through the frontend proxy as well.
+    """
+    p = _video_for_preview(rel_path)
+    preview = _generate_video_preview(p, rel_path)
+    if preview is None:
+        raise HTTPException(500, "Failed to generate preview (ffmpeg unavailable?)")
+
+    sprite_url = f"preview/sprite?rel_path={urllib.parse.quote(rel_path, safe='')}"
+    w, h, columns = preview["tile_width"], preview["tile_height"], preview["columns"]
+    if format == "json":
+        return {
+            "rel_path": rel_path,
+            "sprite_url": sprite_url,
+            **{k: v for k, v in preview.items() if k != "sprite"},
+        }
+    if format != "vtt":
+        raise HTTPException(400, "format must be vtt or json")
+
+    lines = ["WEBVTT", ""]
+    for i in range(preview["frames"]):
+        start = i * preview["interval"]
+        end = min(preview["duration"], start + preview["interval"])
+        x, y = (i % columns) * w, (i // columns) * h
+        lines += [f"{_vtt_time(start)} --> {_vtt_time(end)}", f"{sprite_url}#xywh={x},{y},{w},{h}", ""]
+    return Response("\n".join(lines), media_type="text/vtt", headers={"Cache-Control": "public, max-age=300"})
+
+@app.get("/media/preview/sprite")
+def media_preview_sprite(rel_path: str = Query(..., description="Video path relative to MEDIA_ROOT")):
+    p = _video_for_preview(rel_path)
+    preview = _generate_video_preview(p, rel_path)
+    if preview is None:
+        raise HTTPException(500, "Failed to generate preview (ffmpeg unavailable?)")
+    return FileResponse(str(preview["sprite"]), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+
+def _hls_rendition(rel_path: str) -> tuple[Path, Path]:
+    """The video and the directory its HLS rendition lives in (keyed like thumbnails)."""
+    p = _safe_media_path(rel_path)
+    if not p.exists() or not p.is_file():
+        raise HTTPException(404, "File not found")
+    if _classify_kind(p) != "video":
+        raise HTTPException(415, "HLS is only available for videos")
+    st = p.stat()
+    return p, HLS_DIR / f"{_cache_hash(rel_path)}_{_thumb_version(st.st_size, int(st.st_mtime))}"
+
+def _hls_input_args(p: Path) -> tuple[list[str], bool]:
+    """ffmpeg input/codec arguments for a video, and whether the video is transcoded.
+
+    H.264 video and AAC/MP3 audio are copied into MPEG-TS segments as is;
+    anything else is re-encoded (audio re-encoding is cheap and not counted).
+    """
+    codecs = _probe_codecs(p)
+    video, audio = codecs.get("video"), codecs.get("audio")
+    if video is None:
+        raise HTTPException(415, "No playable video stream")
+    args = ["-i", str(p), "-map", "0:v:0", "-map", "0:a:0?", "-sn", "-dn"]
+    transcode = video not in HLS_COPY_VIDEO_CODECS
+    if transcode:
+        args += [
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+            "-vf", f"scale='min({HLS_MAX_WIDTH},iw)':-2",
+            # Keyframes on segment boundaries so segments come out HLS_SEGMENT_SECONDS long
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        ]
+    else:
+        args += ["-c:v", "copy"]
+    if audio is None or audio in HLS_COPY_AUDIO_CODECS:
+        args += ["-c:a", "copy"]
+    else:
+        args += ["-c:a", "aac", "-b:a", "160k", "-ac", "2"]
+    return args, transcode
+
+def _hls_start(p: Path, out_dir: Path) -> None:
+    """Make sure the rendition is finished or being packaged (503 when transcode slots are full)."""
+    if HlsPackager.complete(out_dir) or _hls.running(out_dir):
+        _hls.touch(out_dir)
+        return
+    args, transcode = _hls_input_args(p)
+    try:
+        _hls.ensure(out_dir, args, transcode)
+    except HlsBusy:
+        raise HTTPException(503, "All transcode slots are busy", headers={"Retry-After": "10"})
+    # Renditions of a replaced file are never asked for again
+    source, version = out_dir.name.split("_", 1)
+    for d in HLS_DIR.glob(f"{source}_*"):
+        if d.name.split("_", 1)[1] != version and not _hls.running(d):
+            shutil.rmtree(d, ignore_errors=True)
+            _caches.discard(d)
+
+def _hls_wait(path: Path, out_dir: Path) -> None:
+    if _hls.wait_for(path, out_dir, HLS_WAIT_TIMEOUT):
+        return
+    if _hls.running(out_dir):
+        raise HTTPException(503, "Still packaging", headers={"Retry-After": "2"})
+    if HlsPackager.complete(out_dir):
+        raise HTTPException(404, "Segment not found")
+    raise HTTPException(500, "Failed to package video (ffmpeg unavailable?)")
+
+@app.get("/media/hls/index.m3u8")
+def media_hls_playlist(rel_path: str = Query(..., description="Video path relative to MEDIA_ROOT")):
+    """HLS playlist for a video, for containers/codecs browsers can't play from /media/stream.
+
+    Packaging starts on the first request and the playlist grows while it
+    runs (an EVENT playlist, so players can start right away). Segment URIs
+    are relative to this URL so it works through the frontend proxy as well.
+    """
+    p, out_dir = _hls_rendition(rel_path)
+    _hls_start(p, out_dir)
+    playlist = out_dir / HLS_PLAYLIST
+    _hls_wait(playlist, out_dir)
+    _caches.hit(playlist)
+
+    body = playlist.read_text()
+    quoted = urllib.parse.quote(rel_path, safe="")
+    lines = [
+        line if not line.strip() or line.startswith("#") else f"segment?rel_path={quoted}&name={line.strip()}"
+        for line in body.splitlines()
+    ]
+    finished = "#EXT-X-ENDLIST" in body
+    return Response(
+        "\n".join(lines) + "\n",
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "public, max-age=300" if finished else "no-cache"},
+    )
 
-    raise HTTPException(415, "No thumbnail for this file type")
+@app.get("/media/hls/segment")
+def media_hls_segment(
+    rel_path: str = Query(..., description="Video path relative to MEDIA_ROOT"),
+    name: str = Query(..., description="Segment file name from the playlist"),
+):
+    if not re.fullmatch(r"seg_\d{5}\.ts", name):
+        raise HTTPException(404, "Segment not found")
+    p, out_dir = _hls_rendition(rel_path)
+    segment = out_dir / name
+    if segment.exists():
+        _hls.touch(out_dir)
+    else:
+        # Not written yet, or the rendition was evicted/stopped: (re)start and wait for it
+        _hls_start(p, out_dir)
+        _hls_wait(segment, out_dir)
+    _caches.hit(segment)
+    return FileResponse(str(segment), media_type="video/mp2t", headers={"Cache-Control": "public, max-age=3600"})
 
 @app.get("/zip/entries")
 def zip_entries(rel_path: str = Query(..., description="Zip file path relative to MEDIA_ROOT")):
@@ -929,71 +2637,381 @@ def zip_entries(rel_path: str = Query(..., description="Zip file path relative t
         raise HTTPException(404, "Zip not found")
     if zfull.suffix.lower() != ".zip":
         raise HTTPException(400, "Not a zip file")
-    entries = _zip_list_images(zfull)
+    entries = [e["name"] for e in _zip_entries(rel_path, zfull)]
     return {"rel_path": rel_path, "count": len(entries), "entries": entries}
 
 @app.get("/zip/image")
-def zip_image(rel_path: str = Query(...), entry: str = Query(...)):
+def zip_image(request: Request, rel_path: str = Query(...), entry: str = Query(...)):
     zfull = _safe_media_path(rel_path)
     if not zfull.exists() or not zfull.is_file():
         raise HTTPException(404, "Zip not found")
     if zfull.suffix.lower() != ".zip":
         raise HTTPException(400, "Not a zip file")
-    # Return the original bytes for the entry
-    tmp_key = _zip_cache_key(rel_path, entry)
-    tmp = ZIP_CACHE / "tmp" / f"{tmp_key}{Path(entry).suffix.lower() or '.bin'}"
-    _zip_extract_to_tmp(zfull, entry, tmp)
+    # Stream the entry's bytes straight out of the archive; nothing is written to disk.
+    info = _zip_entry(rel_path, zfull, entry)
+    st = zfull.stat()
+    etag = f'"{_cache_hash(st.st_size, st.st_mtime_ns, entry, info["crc"])}"'
     mime, _ = mimetypes.guess_type(entry)
-    return FileResponse(str(tmp), media_type=mime or "application/octet-stream", headers={"Cache-Control": "public, max-age=60"})
+
+    data_offset = None
+    if info["compress_type"] == zipfile.ZIP_STORED and not info["flag_bits"] & 0x1:
+        data_offset = stored_data_offset(zfull, info["header_offset"])
+    if data_offset is not None:
+        # Stored: serve a slice of the zip file itself, with range/conditional support.
+        return RangeFileResponse(
+            zfull,
+            request.headers,
+            etag=etag,
+            last_modified=st.st_mtime,
+            offset=data_offset,
+            length=info["file_size"],
+            media_type=mime,
+            headers={"Cache-Control": "public, max-age=60"},
+        )
+
+    # Compressed: inflate chunk by chunk. Ranges would need a full decode, so none.
+    headers = {
+        "Cache-Control": "public, max-age=60",
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    headers.update({"Accept-Ranges": "none", "Content-Length": str(info["file_size"])})
+    return StreamingResponse(_iter_zip_entry(zfull, entry), media_type=mime or "application/octet-stream", headers=headers)
 
 @app.get("/zip/thumb")
-def zip_thumb(rel_path: str = Query(...), entry: str = Query(...), size: int = 360):
+def zip_thumb(request: Request, rel_path: str = Query(...), entry: str = Query(...), size: int = 360):
     zfull = _safe_media_path(rel_path)
     if not zfull.exists() or not zfull.is_file():
         raise HTTPException(404, "Zip not found")
     if zfull.suffix.lower() != ".zip":
         raise HTTPException(400, "Not a zip file")
 
-    size = max(120, min(int(size), 1600))
-    key = _zip_cache_key(rel_path, entry, size=size)
-    out = ZIP_CACHE / "thumbs" / f"{key}.jpg"
+    size = _snap_thumb_size(size)
+    out = _zip_thumb_path(rel_path, entry, zfull.stat(), size, _thumb_format(request))
     if out.exists() and out.is_file():
-        return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+        _caches.hit(out)
+        return _thumb_response(request, out)
+    _caches.miss(out)
+
+    def generate() -> Path | None:
+        if out.exists():
+            return out
+        # Decoded straight from the entry's bytes; only the ffmpeg fallback needs it on disk
+        made = _still_thumb_to(out, _zip_entry_bytes(zfull, entry), size, lambda: _zip_extracted(rel_path, zfull, entry))
+        if made is not None:
+            _gc_variants(made)
+        return made
+
+    made = _thumb_once(out, generate)
+    if made is None:
+        # fallback: serve the extracted original
+        tmp = _zip_extracted(rel_path, zfull, entry)
+        mime, _ = mimetypes.guess_type(entry)
+        return FileResponse(str(tmp), media_type=mime or "application/octet-stream", headers={"Cache-Control": "public, max-age=60"})
 
-    tmp = ZIP_CACHE / "tmp" / f"{key}{Path(entry).suffix.lower() or '.bin'}"
-    _zip_extract_to_tmp(zfull, entry, tmp)
+    return _thumb_response(request, made)
 
-    # Generate jpg thumb via ffmpeg (scale width=size)
-    try:
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", str(tmp), "-vf", f"scale='min({size},iw)':-2", "-q:v", "4", str(out)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
+# ------------------------------
+# Sprite sheets: one image + coordinate map for a whole grid of thumbnails
+# ------------------------------
+
+class SpritePayload(BaseModel):
+    # Zip gallery tiles: `entries` of `rel_path`, or a page of its entries in gallery order
+    rel_path: str | None = None
+    entries: list[str] | None = None
+    offset: int = 0
+    limit: int = SPRITE_MAX_TILES
+    # Media tiles (images, videos, zip covers) by MediaItem id
+    media_ids: list[int] | None = None
+    size: int = 160
+    format: str = "jpg"
+
+
+def _sprite_sources_zip(rel_path: str, entries: list[str] | None, offset: int, limit: int) -> tuple[list[dict], list]:
+    zfull = _safe_media_path(rel_path)
+    if not zfull.exists() or not zfull.is_file() or zfull.suffix.lower() != ".zip":
+        raise HTTPException(404, "Zip not found")
+    if entries is None:
+        entries = [e["name"] for e in _zip_entries(rel_path, zfull)][max(0, offset):max(0, offset) + limit]
+    st = zfull.stat()
+    version = _thumb_version(st.st_size, int(st.st_mtime))
+
+    def source(entry: str):
+        def path() -> Path | None:
+            # Prefer an already cached thumbnail over the full-size original.
+            thumb = _zip_thumb_path(rel_path, entry, st, 360)
+            return thumb if thumb.exists() else _zip_extracted(rel_path, zfull, entry)
+        return path
+
+    tiles = [{"entry": e} for e in entries]
+    return tiles, [(("zip", rel_path, e, version), source(e)) for e in entries]
+
+
+def _sprite_sources_media(db: Session, media_ids: list[int]) -> tuple[list[dict], list]:
+    rows = {
+        item_id: rel
+        for item_id, rel in db.execute(
+            select(MediaItem.id, MediaItem.rel_path).where(
+                MediaItem.id.in_(media_ids), MediaItem.kind.in_(("image", "video", "zip"))
+            )
         )
-    except Exception:
-        pass
+    }
+    tiles, sources = [], []
+    for item_id in media_ids:
+        rel = rows.get(item_id)
+        if rel is None:
+            continue
+        p = MEDIA_ROOT / rel
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        tiles.append({"id": item_id, "rel_path": rel})
+        sources.append((("media", rel, st.st_size, int(st.st_mtime)), lambda p=p, rel=rel: _generate_media_thumb(p, rel)))
+    return tiles, sources
+
+
+def _sprite_compose(out: Path, inputs: list[Path], size: int, columns: int, fmt: str) -> bool:
+    """Scale/crop every input to a size x size tile and stack them in one ffmpeg run."""
+    args: list[str] = []
+    chains = []
+    for i, path in enumerate(inputs):
+        args += ["-i", str(path)]
+        chains.append(
+            f"[{i}:v]scale={size}:{size}:force_original_aspect_ratio=increase,"
+            f"crop={size}:{size},setsar=1,format=yuv420p[t{i}]"
+        )
+    if len(inputs) == 1:
+        graph, label = chains[0], "[t0]"
+    else:
+        layout = "|".join(f"{(i % columns) * size}_{(i // columns) * size}" for i in range(len(inputs)))
+        stack = "".join(f"[t{i}]" for i in range(len(inputs)))
+        graph, label = ";".join([*chains, f"{stack}xstack=inputs={len(inputs)}:layout={layout}:fill=black[out]"]), "[out]"
+    codec = ["-c:v", "libwebp", "-quality", "75"] if fmt == "webp" else ["-q:v", "4"]
+    return _ffmpeg_to(out, [*args, "-filter_complex", graph, "-map", label, "-frames:v", "1", *codec])
 
-    if not out.exists():
-        # fallback: serve the extracted original
-        mime, _ = mimetypes.guess_type(entry)
-        return FileResponse(str(tmp), media_type=mime or "application/octet-stream", headers={"Cache-Control": "public, max-age=60"})
 
-    return FileResponse(str(out), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=300"})
+def _build_sprite(key: str, tiles: list[dict], sources: list, size: int, fmt: str) -> dict:
+    # Resolve every tile to an input file (generating/extracting as needed, in parallel).
+    def resolve(source) -> Path | None:
+        try:
+            return source()
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=FFMPEG_MAX_PROCS, thread_name_prefix="sprite") as pool:
+        paths = list(pool.map(resolve, [fn for _, fn in sources]))
+
+    out = _sprite_path(key, fmt)
+    placed = [(tile, path) for tile, path in zip(tiles, paths) if path is not None]
+    columns = max(1, min(SPRITE_COLUMNS, len(placed)))
+    ok = bool(placed) and _sprite_compose(out, [path for _, path in placed], size, columns, fmt)
+    if placed and not ok:
+        # One undecodable input fails the whole run: find it by normalizing each
+        # tile on its own, then stack the ones that worked.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            normalized = []
+            for n, (tile, path) in enumerate(placed):
+                tile_out = Path(tmpdir) / f"{n}.jpg"
+                if _ffmpeg_to(tile_out, ["-i", str(path), "-frames:v", "1", "-vf", f"scale='min({size * 2},iw)':-2", "-q:v", "3"]):
+                    normalized.append((tile, tile_out))
+            placed = normalized
+            columns = max(1, min(SPRITE_COLUMNS, len(placed)))
+            ok = bool(placed) and _sprite_compose(out, [path for _, path in placed], size, columns, fmt)
+    if not ok:
+        placed = []
+
+    for tile in tiles:
+        tile["x"] = tile["y"] = None  # not in the sprite: use the per-item thumb
+    for i, (tile, _) in enumerate(placed):
+        tile["x"], tile["y"] = (i % columns) * size, (i // columns) * size
+    rows = -(-len(placed) // columns) if placed else 0
+    sprite = {
+        "key": key,
+        "url": f"/sprites/{out.name}" if placed else None,
+        "format": fmt,
+        "tile_size": size,
+        "columns": columns if placed else 0,
+        "rows": rows,
+        "width": columns * size if placed else 0,
+        "height": rows * size,
+        "tiles": tiles,
+    }
+    _write_atomic(_sprite_path(key, "json"), json.dumps(sprite).encode("utf-8"))
+    return sprite
+
+
+def _sprite_path(key: str, ext: str) -> Path:
+    return SPRITE_DIR / key[:2] / f"{key}.{ext}"
+
+
+def _cached_sprite(key: str, fmt: str) -> dict | None:
+    # The map and the image are evicted independently; only use complete pairs.
+    try:
+        sprite = json.loads(_sprite_path(key, "json").read_bytes())
+    except (OSError, ValueError):
+        return None
+    if sprite.get("url") and not _sprite_path(key, fmt).exists():
+        return None
+    return sprite
+
+
+@app.post("/sprites")
+def create_sprite(payload: SpritePayload, db: Session = Depends(get_db)):
+    """Sprite sheet + coordinate map for up to SPRITE_MAX_TILES zip entries or media items.
+
+    Sprites are keyed by the tiles' content (paths plus file size/mtime), so
+    the same grid is generated once and then served from the cache. Tiles
+    that couldn't be rendered come back with x/y = null.
+    """
+    fmt = payload.format.lower()
+    if fmt not in ("jpg", "webp"):
+        raise HTTPException(400, "format must be jpg or webp")
+    size = max(64, min(int(payload.size), 480))
+    if payload.media_ids is not None:
+        if len(payload.media_ids) > SPRITE_MAX_TILES:
+            raise HTTPException(400, f"At most {SPRITE_MAX_TILES} tiles per sprite")
+        tiles, sources = _sprite_sources_media(db, payload.media_ids)
+    elif payload.rel_path:
+        limit = max(1, min(payload.limit, SPRITE_MAX_TILES))
+        if payload.entries is not None and len(payload.entries) > SPRITE_MAX_TILES:
+            raise HTTPException(400, f"At most {SPRITE_MAX_TILES} tiles per sprite")
+        tiles, sources = _sprite_sources_zip(payload.rel_path, payload.entries, payload.offset, limit)
+    else:
+        raise HTTPException(400, "rel_path or media_ids required")
+
+    key = _cache_hash(THUMB_CACHE_VERSION, size, fmt, *(part for ident, _ in sources for part in ident), length=40)
+    map_path = _sprite_path(key, "json")
+    sprite = _cached_sprite(key, fmt)
+    if sprite is not None:
+        _caches.hit(map_path)
+        return sprite
+    _caches.miss(map_path)
+
+    def generate() -> dict:
+        return _cached_sprite(key, fmt) or _build_sprite(key, tiles, sources, size, fmt)
+
+    return _thumb_once(map_path, generate)
+
+
+@app.get("/sprites/{name}")
+def get_sprite(name: str):
+    m = re.fullmatch(r"([0-9a-f]{40})\.(jpg|webp)", name)
+    if not m:
+        raise HTTPException(404, "Sprite not found")
+    path = _sprite_path(m.group(1), m.group(2))
+    if not path.exists():
+        raise HTTPException(404, "Sprite not found")
+    _caches.hit(path)
+    # Content-keyed: a changed grid gets a new name, so this never goes stale.
+    return FileResponse(
+        str(path),
+        media_type="image/webp" if m.group(2) == "webp" else "image/jpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+# Columns /media/items can return; the rest (match_pending, zip_entries_mtime,
+# probed_mtime) is indexing bookkeeping.
+MEDIA_ITEM_FIELDS = (
+    "id", "rel_path", "kind", "ext", "size", "mtime",
+    "duration", "width", "height", "codec", "bitrate", "frame_rate",
+)
+MEDIA_ITEMS_MAX_LIMIT = 1000
+
+def _csv_param(value: str | None) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+def _encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(400, "Invalid cursor")
+    return values
+
+def _estimate_rows(db: Session, stmt) -> int:
+    """Row count the planner expects for `stmt` (EXPLAIN, nothing is scanned)."""
+    conn = db.connection()
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 @app.get("/media/items")
-def media_items(limit: int = -1, offset: int = 0, kind: str | None = None, db: Session = Depends(get_db)):
-    q = select(MediaItem).order_by(MediaItem.rel_path.asc())
+def media_items(
+    limit: int = Query(200, description=f"Page size (max {MEDIA_ITEMS_MAX_LIMIT}); -1 returns every match as a plain list"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    kind: str | None = Query(None, description="Comma-separated kinds, e.g. video,image"),
+    ext: str | None = Query(None, description="Comma-separated extensions, e.g. mp4,mkv"),
+    prefix: str | None = Query(None, description="Only items under this folder (relative to MEDIA_ROOT)"),
+    q: str | None = Query(None, description="Case-insensitive substring of rel_path"),
+    min_size: int | None = None,
+    max_size: int | None = None,
+    min_mtime: int | None = None,
+    max_mtime: int | None = None,
+    fields: str | None = Query(None, description="Comma-separated columns to return (default: all)"),
+    count: str | None = Query(None, description="Add `total`: exact, or estimate (planner estimate, no scan)"),
+    db: Session = Depends(get_db),
+):
+    """Indexed media in (rel_path, id) order, one keyset page at a time.
+
+    Pages are fetched with `cursor` (WHERE (rel_path, id) > last row) rather
+    than OFFSET, so a deep page costs the same as the first one.
+    """
+    selected = _csv_param(fields) or list(MEDIA_ITEM_FIELDS)
+    unknown = [f for f in selected if f not in MEDIA_ITEM_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    if count not in (None, "exact", "estimate"):
+        raise HTTPException(400, "count must be exact or estimate")
+
+    filters = []
     if kind:
-        q = q.where(MediaItem.kind == kind)
-    if limit and limit > 0:
-        q = q.offset(offset).limit(limit)
-    rows = db.execute(q).scalars().all()
-    out = []
-    for r in rows:
-        d = r.__dict__.copy()
-        d.pop("_sa_instance_state", None)
-        out.append(d)
+        filters.append(MediaItem.kind.in_(_csv_param(kind)))
+    if ext:
+        filters.append(MediaItem.ext.in_([e.lower().lstrip(".") for e in _csv_param(ext)]))
+    if prefix and prefix.strip("/"):
+        filters.append(_in_scope(_scope_prefix(prefix.strip("/"))))
+    if q and q.strip():
+        filters.append(func.lower(MediaItem.rel_path).contains(q.strip().lower(), autoescape=True))
+    for column, low, high in ((MediaItem.size, min_size, max_size), (MediaItem.mtime, min_mtime, max_mtime)):
+        if low is not None:
+            filters.append(column >= low)
+        if high is not None:
+            filters.append(column <= high)
+
+    # The key columns are always read (for the cursor) but only returned when asked for.
+    columns = [MediaItem.__table__.c[f] for f in dict.fromkeys([*selected, "rel_path", "id"])]
+    q = select(*columns).where(*filters).order_by(MediaItem.rel_path.asc(), MediaItem.id.asc())
+
+    if limit is not None and limit < 0:
+        # Everything at once, as a plain list (the original behaviour; prefer pages)
+        return [{f: row[f] for f in selected} for row in db.execute(q).mappings()]
+
+    limit = max(1, min(limit, MEDIA_ITEMS_MAX_LIMIT))
+    page = q
+    if cursor:
+        last_path, last_id = _decode_cursor(cursor, 2)
+        if not isinstance(last_path, str) or not isinstance(last_id, int):
+            raise HTTPException(400, "Invalid cursor")
+        page = page.where(tuple_(MediaItem.rel_path, MediaItem.id) > (last_path, last_id))
+    rows = db.execute(page.limit(limit + 1)).mappings().all()
+
+    out = {
+        "items": [{f: row[f] for f in selected} for row in rows[:limit]],
+        "next_cursor": _encode_cursor(rows[limit - 1]["rel_path"], rows[limit - 1]["id"]) if len(rows) > limit else None,
+    }
+    if count == "exact":
+        out["total"] = db.execute(select(func.count()).select_from(MediaItem).where(*filters)).scalar_one()
+    elif count == "estimate":
+        out["total"] = _estimate_rows(db, select(MediaItem.id).where(*filters))
     return out
 
 @app.get("/media/current")
@@ -1053,6 +3071,12 @@ def media_select(rel_path: str, db: Session = Depends(get_db)):
     return {"selected_path": str(requested)}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Disk usage, budgets and hit/miss counters per cache area (this API process)."""
+    return _caches.stats()
+
+
 # ------------------------------
 # Maintenance / reset endpoints
 # ------------------------------
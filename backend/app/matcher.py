@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from typing import Iterable, Iterator
+
+
+class KeyAutomaton:
+    """Aho–Corasick automaton over a fixed set of keys.
+
+    Finds every occurrence of every key in a text in a single pass, so the
+    cost per path depends on the path length and the number of hits, not on
+    how many keys (performer names/aliases) there are.
+
+    Transitions live in one flat dict keyed by (state << 8 | char code)
+    rather than a dict per trie node, which keeps memory reasonable for
+    ~100k keys.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys: list[str] = []
+        goto: dict[int, int] = {}
+        terminal: dict[int, int] = {}
+        depth = array("i", [0])
+        children: list[list[int]] = [[]]
+
+        for key in dict.fromkeys(k for k in keys if k):
+            state = 0
+            for ch in key:
+                edge = (state << 8) | (ord(ch) & 0xFF)
+                nxt = goto.get(edge)
+                if nxt is None:
+                    nxt = len(depth)
+                    goto[edge] = nxt
+                    depth.append(depth[state] + 1)
+                    children.append([])
+                    children[state].append(edge)
+                state = nxt
+            if state not in terminal:
+                terminal[state] = len(self.keys)
+                self.keys.append(key)
+
+        # Breadth-first pass to fill failure links and "next terminal" links.
+        fail = array("i", [0]) * len(depth)
+        out_link = array("i", [-1]) * len(depth)
+        todo = deque()
+        for edge in children[0]:
+            todo.append(goto[edge])
+        while todo:
+            state = todo.popleft()
+            for edge in children[state]:
+                nxt = goto[edge]
+                code = edge & 0xFF
+                f = fail[state]
+                while f and ((f << 8) | code) not in goto:
+                    f = fail[f]
+                target = goto.get((f << 8) | code, 0)
+                fail[nxt] = target if target != nxt else 0
+                out_link[nxt] = fail[nxt] if fail[nxt] in terminal else out_link[fail[nxt]]
+                todo.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._terminal = terminal
+        self._out_link = out_link
+        self._depth = depth
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def finditer(self, text: str) -> Iterator[tuple[int, int, str]]:
+        """Yield (start, end, key) for every key occurrence in `text`."""
+        goto, fail, terminal, out_link, depth = (
+            self._goto, self._fail, self._terminal, self._out_link, self._depth,
+        )
+        state = 0
+        for i, ch in enumerate(text):
+            code = ord(ch) & 0xFF
+            nxt = goto.get((state << 8) | code)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto.get((state << 8) | code)
+            state = nxt or 0
+
+            hit = state if state in terminal else out_link[state]
+            while hit > 0:
+                yield i + 1 - depth[hit], i + 1, self.keys[terminal[hit]]
+                hit = out_link[hit]
+
+
+def partial_hits(
+    automaton: KeyAutomaton,
+    normalized: str,
+    min_len: int = 5,
+    unaligned_min_len: int = 10,
+) -> dict[str, float]:
+    """Find keys occurring anywhere in a space-separated, normalized string.
+
+    Keys are compact (no spaces), so matching runs over the compacted text and
+    token boundaries are tracked separately. Returns {key: confidence}.
+
+    Confidence favors hits aligned to token boundaries on both ends and
+    longer keys; it stays below the 1.0 used for exact folder matches. Hits
+    shorter than `min_len`, hits aligned on neither end shorter than
+    `unaligned_min_len`, and hits contained in a longer hit are dropped.
+    """
+    tokens = normalized.split()
+    if not tokens or not len(automaton):
+        return {}
+
+    boundaries = {0}
+    pos = 0
+    for tok in tokens:
+        pos += len(tok)
+        boundaries.add(pos)
+    text = "".join(tokens)
+
+    spans = []
+    for start, end, key in automaton.finditer(text):
+        if end - start < min_len:
+            continue
+        aligned = (start in boundaries) + (end in boundaries)
+        if not aligned and end - start < unaligned_min_len:
+            continue
+        spans.append((start, end, key, aligned))
+
+    out: dict[str, float] = {}
+    for start, end, key, aligned in spans:
+        if any(s <= start and end <= e and (e - s) > (end - start) for s, e, _, _ in spans):
+            continue
+        length_factor = min(1.0, (end - start) / 12)
+        boundary_factor = (0.3, 0.6, 1.0)[aligned]
+        confidence = round(0.9 * boundary_factor * (0.5 + 0.5 * length_factor), 4)
+        if confidence > out.get(key, 0.0):
+            out[key] = confidence
+    return out
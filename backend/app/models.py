@@ -12,7 +12,9 @@ from sqlalchemy import (
     ForeignKey,
     Float,
     DateTime,
+    Index,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +23,10 @@ from .db import Base
 
 class Performer(Base):
     __tablename__ = "performers"
+    __table_args__ = (
+        # Keyset pages of /performers in name order.
+        Index("ix_performers_name_id", "name", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
@@ -30,17 +36,17 @@ class Performer(Base):
     date_of_birth: Mapped[str | None] = mapped_column(String(32), nullable=True)
     age: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
-    career_status: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    career_status: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     career_start: Mapped[str | None] = mapped_column(String(32), nullable=True)
     career_end: Mapped[str | None] = mapped_column(String(32), nullable=True)
 
     date_of_death: Mapped[str | None] = mapped_column(String(32), nullable=True)
     place_of_birth: Mapped[str | None] = mapped_column(Text, nullable=True)
-    ethnicity: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    ethnicity: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
 
-    boobs: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    boobs: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     bust: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    cup: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    cup: Mapped[str | None] = mapped_column(String(16), nullable=True, index=True)
     bra: Mapped[str | None] = mapped_column(String(32), nullable=True)
     waist: Mapped[int | None] = mapped_column(Integer, nullable=True)
     hip: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -49,8 +55,8 @@ class Performer(Base):
     height: Mapped[int | None] = mapped_column(Integer, nullable=True)  # cm
     weight: Mapped[int | None] = mapped_column(Integer, nullable=True)  # kg
 
-    hair_color: Mapped[str | None] = mapped_column(String(64), nullable=True)
-    eye_color: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    hair_color: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    eye_color: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
 
     piercings: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     piercing_locations: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -58,6 +64,10 @@ class Performer(Base):
     tattoos: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
     tattoo_locations: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # Normalized name/alias keys as of the last matching run. Indexing compares
+    # this to the current keys to find performers that need re-matching.
+    match_keys: Mapped[str | None] = mapped_column(Text, nullable=True)
+
     # Many-to-many: Performer <-> MediaItem
     media_links: Mapped[list["PerformerMedia"]] = relationship(
         "PerformerMedia",
@@ -76,6 +86,12 @@ class AppSetting(Base):
 
 class MediaItem(Base):
     __tablename__ = "media_items"
+    __table_args__ = (
+        # Supports rel_path LIKE 'prefix/%' for folder-scoped indexing.
+        Index("ix_media_items_rel_path_prefix", "rel_path", postgresql_ops={"rel_path": "text_pattern_ops"}),
+        # Keyset pages of /media/items filtered by kind.
+        Index("ix_media_items_kind_rel_path", "kind", "rel_path", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     rel_path: Mapped[str] = mapped_column(Text, unique=True, index=True)
@@ -83,6 +99,20 @@ class MediaItem(Base):
     ext: Mapped[str | None] = mapped_column(String(16), nullable=True)
     size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     mtime: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Set when the row is written by a scan and cleared once performer matching
+    # has processed it, so an interrupted index run re-matches it when resumed.
+    match_pending: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", index=True)
+    # mtime of the zip when its zip_entries rows were read (None = not read yet).
+    zip_entries_mtime: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    # ffprobe metadata for videos/images; probed_mtime is the mtime it was read at.
+    duration: Mapped[float | None] = mapped_column(Float, nullable=True)  # seconds
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    codec: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    bitrate: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # bits/s
+    frame_rate: Mapped[float | None] = mapped_column(Float, nullable=True)
+    probed_mtime: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     performer_links: Mapped[list["PerformerMedia"]] = relationship(
         "PerformerMedia",
@@ -92,6 +122,29 @@ class MediaItem(Base):
     )
 
 
+class ZipEntry(Base):
+    """An image inside an indexed zip, as recorded in the zip's central directory."""
+
+    __tablename__ = "zip_entries"
+    __table_args__ = (
+        Index("ix_zip_entries_media_position", "media_item_id", "position"),
+        Index("ix_zip_entries_media_name", "media_item_id", "name"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    media_item_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("media_items.id", ondelete="CASCADE"), nullable=False
+    )
+    position: Mapped[int] = mapped_column(Integer)  # gallery order (case-insensitive name)
+    name: Mapped[str] = mapped_column(Text)
+    header_offset: Mapped[int] = mapped_column(BigInteger)
+    compress_size: Mapped[int] = mapped_column(BigInteger)
+    file_size: Mapped[int] = mapped_column(BigInteger)
+    compress_type: Mapped[int] = mapped_column(Integer)
+    flag_bits: Mapped[int] = mapped_column(Integer, default=0)
+    crc: Mapped[int] = mapped_column(BigInteger)
+
+
 class PerformerMedia(Base):
     __tablename__ = "performer_media"
     __table_args__ = (
@@ -112,3 +165,39 @@ class PerformerMedia(Base):
 
     performer = relationship("Performer", back_populates="media_links")
     media_item = relationship("MediaItem", back_populates="performer_links")
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # At most one queued/running job per kind (e.g. a single index run).
+        Index(
+            "uq_jobs_active_kind",
+            "kind",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(32), index=True)
+    status: Mapped[str] = mapped_column(String(16), index=True, default="queued")  # queued|running|completed|failed|cancelled
+    params: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON
+    progress: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON of the latest event
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, default=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class JobEvent(Base):
+    __tablename__ = "job_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("jobs.id", ondelete="CASCADE"), index=True
+    )
+    payload: Mapped[str] = mapped_column(Text)  # JSON
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+
+# More ranges than this (after merging) get the whole body instead; RFC 9110
+# lets a server ignore Range, and it keeps tiny-range floods cheap.
+MAX_RANGES = 16
+
+
+def parse_ranges(header: str | None, size: int) -> list[tuple[int, int]] | None:
+    """Inclusive (start, end) byte ranges from a Range header, sorted and merged.
+
+    None means "send the whole body" (no/malformed header, or too many
+    ranges); an empty list means none of the ranges can be satisfied (416).
+    """
+    if not header or not header.strip().startswith("bytes="):
+        return None
+    ranges = []
+    for spec in header.strip()[6:].split(","):
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None  # syntactically invalid: ignore the header
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, end))
+
+    ranges.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def etag_matches(header: str | None, etag: str, weak: bool = True) -> bool:
+    """Whether an If-None-Match (weak comparison) / If-Range (strong) header matches."""
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    if weak:
+        tags = [t.removeprefix("W/") for t in tags]
+    return "*" in tags or etag in tags
+
+
+def negotiate_type(accept: str | None, offered: list[str], default: str) -> str:
+    """The media type from `offered` that an Accept header prefers.
+
+    Only explicitly listed types count: browsers send `image/*` and `*/*`
+    for formats they can't decode, too. Ties go to the earlier offer;
+    `default` is returned when none of them is listed.
+    """
+    prefs: dict[str, float] = {}
+    for part in (accept or "").split(","):
+        media, *params = [x.strip() for x in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        prefs[media.lower()] = q
+
+    best, best_q = default, 0.0
+    for media in offered:
+        if prefs.get(media, 0.0) > best_q:
+            best, best_q = media, prefs[media]
+    return best
+
+
+def _not_modified_since(header: str | None, last_modified: float) -> bool:
+    if not header:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class RangeFileResponse(Response):
+    """A file (or a byte slice of one) with conditional and range request support.
+
+    Handles If-None-Match / If-Modified-Since (304), Range with single and
+    multiple ranges (206, multipart/byteranges for several), If-Range and
+    unsatisfiable ranges (416). Only the requested bytes are read. When the
+    server offers the ASGI zero-copy extension the body goes out through
+    sendfile; otherwise it is read with pread in CHUNK_SIZE pieces.
+
+    `offset`/`length` select a slice of the file (e.g. a stored zip entry);
+    byte positions in Range/Content-Range are relative to that slice.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        request_headers: Mapping[str, str],
+        *,
+        etag: str,
+        last_modified: float,
+        offset: int = 0,
+        length: int | None = None,
+        media_type: str | None = None,
+        headers: Mapping[str, str] | None = None,
+    ):
+        self.path = os.fspath(path)
+        self.offset = offset
+        size = length if length is not None else os.stat(self.path).st_size - offset
+        self.media_type = media_type or "application/octet-stream"
+        self.background = None
+        self.body = b""
+        # Body segments: bytes, or (position in slice, count) to read from the file
+        self.segments: list[bytes | tuple[int, int]] = []
+
+        out = {
+            **(headers or {}),
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(last_modified, usegmt=True),
+        }
+        if_none_match = request_headers.get("if-none-match")
+        if etag_matches(if_none_match, etag) or (
+            if_none_match is None and _not_modified_since(request_headers.get("if-modified-since"), last_modified)
+        ):
+            self.status_code = 304
+            self._set_headers(out)
+            return
+
+        if_range = request_headers.get("if-range")
+        range_valid = if_range is None or (
+            etag_matches(if_range, etag, weak=False)
+            if if_range.strip().startswith(("\"", "W/"))
+            else if_range.strip() == out["last-modified"]
+        )
+        ranges = parse_ranges(request_headers.get("range"), size) if range_valid else None
+
+        if ranges is None:
+            self.status_code = 200
+            out["content-type"] = self.media_type
+            out["content-length"] = str(size)
+            self.segments = [(0, size)]
+        elif not ranges:
+            self.status_code = 416
+            out["content-range"] = f"bytes */{size}"
+            out["content-length"] = "0"
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            out["content-type"] = self.media_type
+            out["content-range"] = f"bytes {start}-{end}/{size}"
+            out["content-length"] = str(end - start + 1)
+            self.segments = [(start, end - start + 1)]
+        else:
+            boundary = secrets.token_hex(12)
+            self.status_code = 206
+            out["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            total = 0
+            for start, end in ranges:
+                part = (
+                    f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.segments += [part, (start, end - start + 1), b"\r\n"]
+                total += len(part) + (end - start + 1) + 2
+            closing = f"--{boundary}--\r\n".encode("latin-1")
+            self.segments.append(closing)
+            out["content-length"] = str(total + len(closing))
+        self._set_headers(out)
+
+    def _set_headers(self, headers: Mapping[str, str]) -> None:
+        self.raw_headers = [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers.items()]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.segments:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Players abort a request on every seek, and servers may keep accepting
+        # send() after the client is gone: stop reading the file as soon as the
+        # disconnect arrives (as Starlette's StreamingResponse does).
+        disconnected = anyio.Event()
+        async with anyio.create_task_group() as tg:
+
+            async def listen_for_disconnect() -> None:
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        disconnected.set()
+                        tg.cancel_scope.cancel()
+                        return
+
+            tg.start_soon(listen_for_disconnect)
+            await self._send_segments(scope, send, disconnected)
+            tg.cancel_scope.cancel()
+
+    async def _send_segments(self, scope: Scope, send: Send, disconnected: anyio.Event) -> None:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        f = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for segment in self.segments:
+                if disconnected.is_set():
+                    return
+                if isinstance(segment, bytes):
+                    await send({"type": "http.response.body", "body": segment, "more_body": True})
+                    continue
+                pos, remaining = self.offset + segment[0], segment[1]
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": f,
+                        "offset": pos,
+                        "count": remaining,
+                        "more_body": True,
+                    })
+                    continue
+                while remaining > 0 and not disconnected.is_set():
+                    chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), min(CHUNK_SIZE, remaining), pos)
+                    if not chunk:
+                        break  # file shrank underneath us; the client sees a short body
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    pos += len(chunk)
+                    remaining -= len(chunk)
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(f.close)
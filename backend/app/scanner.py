@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, NamedTuple
+
+
+class ScannedFile(NamedTuple):
+    rel_path: str
+    kind: str
+    ext: str | None
+    size: int
+    mtime: int
+
+
+_DONE = object()
+
+
+def scan_media(
+    root: str | os.PathLike,
+    classify: Callable[[str], str | None],
+    workers: int = 8,
+    queue_size: int = 10000,
+    onerror: Callable[[OSError], None] | None = None,
+    rel_prefix: str = "",
+) -> Iterator[ScannedFile]:
+    """Walk `root` with a pool of os.scandir workers and yield indexable files.
+
+    `classify(filename)` returns the media kind, or None to skip the file
+    without stat'ing it. Hidden files and folders are ignored and directory
+    symlinks are not followed (same as os.walk). Directory read errors are
+    passed to `onerror`, like os.walk's argument of the same name.
+    `rel_prefix` is prepended to every rel_path (e.g. "Studio/" when scanning
+    MEDIA_ROOT/Studio).
+
+    Records are handed over through a bounded queue, so workers block instead
+    of buffering the whole library when the consumer (the DB writer) falls
+    behind. Closing the generator early stops the workers.
+    """
+    out: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    dirs: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = 1  # directories queued or being scanned
+    workers = max(1, workers)
+
+    def emit(item) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_dir(path: str, prefix: str) -> None:
+        nonlocal pending
+        if stop.is_set():
+            return
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if stop.is_set():
+                        return
+                    name = entry.name
+                    if name.startswith("."):
+                        continue
+                    rel = prefix + name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            with lock:
+                                pending += 1
+                            dirs.put((entry.path, rel + os.sep))
+                            continue
+                        kind = classify(name)
+                        if kind is None or not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    ext = os.path.splitext(name)[1].lower().lstrip(".") or None
+                    if not emit(ScannedFile(rel, kind, ext, int(st.st_size), int(st.st_mtime))):
+                        return
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+
+    def worker() -> None:
+        nonlocal pending
+        while True:
+            job = dirs.get()
+            if job is None:
+                return
+            try:
+                scan_dir(*job)
+            finally:
+                with lock:
+                    pending -= 1
+                    finished = pending == 0
+                if finished:
+                    for _ in range(workers):
+                        dirs.put(None)
+                    emit(_DONE)
+
+    dirs.put((os.fspath(root), rel_prefix))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-scan")
+    for _ in range(workers):
+        pool.submit(worker)
+
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        for _ in range(workers):
+            dirs.put(None)
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple
+
+log = logging.getLogger(__name__)
+
+
+class WatchBatch(NamedTuple):
+    # (src_rel, dest_rel, is_dir), in the order they happened
+    moves: list[tuple[str, str, bool]]
+    # rel_path -> is_dir
+    deleted: dict[str, bool]
+    # rel_path -> is_dir (created or modified)
+    changed: dict[str, bool]
+
+
+# apply(batch) -> True when applied, False to retry the batch later (e.g. while
+# a full index run is in progress).
+ApplyBatch = Callable[[WatchBatch], bool]
+
+
+def common_folder(rels: Iterable[str]) -> str:
+    """Deepest folder (relative, "" = root) containing every one of `rels`."""
+    common: list[str] | None = None
+    for rel in rels:
+        parts = [p for p in rel.split("/") if p]
+        if common is None:
+            common = parts
+            continue
+        n = 0
+        while n < min(len(common), len(parts)) and common[n] == parts[n]:
+            n += 1
+        del common[n:]
+    return "/".join(common or [])
+
+
+def batch_folders(batch: WatchBatch) -> list[str]:
+    """Folders that, indexed, cover every path in `batch`."""
+    folders = []
+    for rel, is_dir in [
+        *((src, is_dir) for src, _, is_dir in batch.moves),
+        *((dest, is_dir) for _, dest, is_dir in batch.moves),
+        *batch.deleted.items(),
+        *batch.changed.items(),
+    ]:
+        folders.append(rel if is_dir and rel not in batch.deleted else os.path.dirname(rel))
+    return folders
+
+
+# Filesystems where inotify starts fine but never sees changes made by other hosts.
+_NETWORK_FS = ("nfs", "nfs4", "cifs", "smb3", "smbfs")
+
+
+def network_fs_type(path: Path) -> str | None:
+    """Type of the network/FUSE filesystem `path` lives on (from /proc/mounts), else None."""
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts", encoding="utf-8", errors="replace") as fh:
+            for line in fh:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Mount points escape spaces etc. as octal (\040)
+                mount = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1])
+                if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) >= len(best):
+                    best, fstype = mount, fields[2]
+    except OSError:
+        return None
+    if fstype and (fstype in _NETWORK_FS or fstype.startswith("fuse")):
+        return fstype
+    return None
+
+
+class MediaWatcher:
+    """Collects inotify events under `root` into debounced WatchBatches.
+
+    Events are coalesced per path and handed to `apply` once nothing has
+    changed for `debounce` seconds (or at the latest after `max_delay`), so a
+    file being copied in produces one upsert rather than hundreds.
+    Hidden files/folders are ignored.
+
+    A batch `apply` declines (returns False) is retried; one it raises on
+    would most likely fail the same way again and hold up everything after
+    it, so it is dropped and handed to `fallback` (e.g. a scoped index run).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        apply: ApplyBatch,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        fallback: Callable[[WatchBatch], None] | None = None,
+    ):
+        self.root = Path(root)
+        self.apply = apply
+        self.fallback = fallback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread: threading.Thread | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._moves: list[tuple[str, str, bool]] = []
+        self._deleted: dict[str, bool] = {}
+        self._changed: dict[str, bool] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+
+    # -- event intake -------------------------------------------------
+
+    def _rel(self, path: str | bytes) -> str | None:
+        try:
+            rel = Path(os.fsdecode(path)).relative_to(self.root)
+        except ValueError:
+            return None
+        if not rel.parts or any(part.startswith(".") for part in rel.parts):
+            return None
+        return rel.as_posix()
+
+    def _touch(self) -> None:
+        now = time.monotonic()
+        if not self._first_event:
+            self._first_event = now
+        self._last_event = now
+        self._wake.set()
+
+    def on_created_or_modified(self, path, is_dir: bool) -> None:
+        rel = self._rel(path)
+        if rel is None:
+            return
+        with self._lock:
+            self._deleted.pop(rel, None)
+            self._changed[rel] = is_dir
+            self._touch()
+
+    def on_deleted(self, path, is_dir: bool) -> None:
+        rel = self._rel(path)
+        if rel is None:
+            return
+        with self._lock:
+            self._changed.pop(rel, None)
+            self._deleted[rel] = is_dir
+            self._touch()
+
+    def on_moved(self, src, dest, is_dir: bool) -> None:
+        src_rel, dest_rel = self._rel(src), self._rel(dest)
+        if src_rel is None and dest_rel is None:
+            return
+        if src_rel is None:
+            # Moved in from a hidden/outside path: just a new file/folder.
+            return self.on_created_or_modified(dest, is_dir)
+        if dest_rel is None:
+            return self.on_deleted(src, is_dir)
+        with self._lock:
+            if src_rel in self._changed:
+                # Created (or still being written) within this batch: it has no
+                # row to carry over yet, so treat it as a plain upsert at dest.
+                del self._changed[src_rel]
+                self._deleted[src_rel] = is_dir
+                self._changed[dest_rel] = is_dir
+            else:
+                self._moves.append((src_rel, dest_rel, is_dir))
+            self._deleted.pop(dest_rel, None)
+            self._touch()
+
+    # -- lifecycle ----------------------------------------------------
+
+    def start(self) -> None:
+        """Start the inotify observer and the debounce thread."""
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                watcher.on_created_or_modified(event.src_path, event.is_directory)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.on_created_or_modified(event.src_path, False)
+
+            def on_closed(self, event):
+                watcher.on_created_or_modified(event.src_path, False)
+
+            def on_deleted(self, event):
+                watcher.on_deleted(event.src_path, event.is_directory)
+
+            def on_moved(self, event):
+                watcher.on_moved(event.src_path, event.dest_path, event.is_directory)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.root), recursive=True)
+        observer.start()
+        self._observer = observer
+        self._thread = threading.Thread(target=self._loop, name="media-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _take_batch(self) -> WatchBatch | None:
+        with self._lock:
+            if not (self._moves or self._deleted or self._changed):
+                self._first_event = self._last_event = 0.0
+                return None
+            now = time.monotonic()
+            if now - self._last_event < self.debounce and now - self._first_event < self.max_delay:
+                return None
+            batch = WatchBatch(self._moves, self._deleted, self._changed)
+            self._reset()
+            return batch
+
+    def _requeue(self, batch: WatchBatch) -> None:
+        # Put a batch we couldn't apply back in front of anything newer.
+        with self._lock:
+            moves, deleted, changed = self._moves, self._deleted, self._changed
+            self._reset()
+            self._moves = list(batch.moves)
+            self._deleted = dict(batch.deleted)
+            self._changed = dict(batch.changed)
+            self._touch()
+        for src, dest, is_dir in moves:
+            self.on_moved(self.root / src, self.root / dest, is_dir)
+        for rel, is_dir in deleted.items():
+            self.on_deleted(self.root / rel, is_dir)
+        for rel, is_dir in changed.items():
+            self.on_created_or_modified(self.root / rel, is_dir)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.debounce)
+            self._wake.clear()
+            batch = self._take_batch()
+            if batch is None:
+                continue
+            try:
+                applied = self.apply(batch)
+            except Exception:
+                log.exception("Applying media watcher batch failed; dropping it")
+                if self.fallback is not None:
+                    try:
+                        self.fallback(batch)
+                    except Exception:
+                        log.exception("Media watcher fallback failed")
+                continue
+            if not applied:
+                self._requeue(batch)
+                self._stop.wait(self.max_delay)
+
+
+def dir_mtimes(root: Path) -> dict[str, int]:
+    """mtime of every non-hidden folder under `root` (relative path -> ns; "" = root).
+
+    Only directories are stat'ed, which is far cheaper than an index run's
+    stat of every file on a network mount.
+    """
+    out: dict[str, int] = {}
+    stack = [os.fspath(root)]
+    while stack:
+        path = stack.pop()
+        try:
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            out["" if rel == "." else rel] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+        except OSError:
+            continue
+    return out
+
+
+class IndexPoller:
+    """Polling fallback for mounts that don't deliver inotify events (NFS/SMB).
+
+    Every `interval` seconds the folder mtimes under `root` are compared to
+    the previous pass; when something changed, `trigger(scope)` submits an
+    incremental index run of the deepest folder covering the changes (the
+    first pass covers everything, to catch up after downtime). trigger
+    returns False when it couldn't start a run, and the changes are retried
+    on the next pass. A file rewritten in place doesn't touch its folder's
+    mtime, so that alone isn't picked up until some other change nearby.
+    """
+
+    def __init__(self, root: Path, trigger: Callable[[str], bool], interval: float):
+        self.root = Path(root)
+        self.trigger = trigger
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="media-poller", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    @staticmethod
+    def changed_scope(before: dict[str, int] | None, after: dict[str, int]) -> str | None:
+        """Folder to re-index for the difference between two dir_mtimes() passes (None = nothing)."""
+        if before is None:
+            return ""
+        changed = [rel for rel, mtime in after.items() if before.get(rel) != mtime]
+        # A removed folder's parent changed too, but may not be listed yet on a lagging mount
+        changed += [os.path.dirname(rel) for rel in before if rel not in after]
+        return common_folder(changed) if changed else None
+
+    def _loop(self) -> None:
+        snapshot: dict[str, int] | None = None
+        while not self._stop.wait(self.interval):
+            try:
+                current = dir_mtimes(self.root)
+                scope = self.changed_scope(snapshot, current)
+                if scope is None or self.trigger(scope):
+                    snapshot = current
+            except Exception:
+                log.exception("Periodic index run failed to start")
+
+
+if __name__ == "__main__":
+    # Separate entry point: python -m app.watcher (MEDIA_WATCH picks the mode).
+    from .main import run_media_watcher
+
+    logging.basicConfig(level=logging.INFO)
+    run_media_watcher()
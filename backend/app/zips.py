@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+_LOCAL_HEADER = struct.Struct("<4s22xHH")  # signature ... name length, extra length
+
+
+class _Handle:
+    __slots__ = ("sig", "zip", "users", "evicted")
+
+    def __init__(self, sig: tuple[int, int], z: zipfile.ZipFile):
+        self.sig = sig
+        self.zip = z
+        self.users = 1
+        self.evicted = False
+
+
+class ZipHandles:
+    """Small LRU of open ZipFile objects, so repeated reads from the same
+    archive don't re-parse its central directory.
+
+    Handles are keyed by path and reopened when the file's size or mtime
+    changes. ZipFile allows concurrent member reads from several threads.
+    Callers hold a handle through `lease()`; a handle that is evicted or
+    replaced while leased is closed only once its last lease ends.
+    """
+
+    def __init__(self, size: int = 32):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._handles: OrderedDict[str, _Handle] = OrderedDict()
+
+    @contextmanager
+    def lease(self, path: Path | str) -> Iterator[zipfile.ZipFile]:
+        handle = self._acquire(path)
+        try:
+            yield handle.zip
+        finally:
+            self._release(handle)
+
+    def _acquire(self, path: Path | str) -> _Handle:
+        key = os.fspath(path)
+        st = os.stat(key)
+        sig = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._handles.get(key)
+            if cached is not None and cached.sig == sig:
+                cached.users += 1
+                self._handles.move_to_end(key)
+                return cached
+
+        handle = _Handle(sig, zipfile.ZipFile(key, "r"))
+        with self._lock:
+            stale = [self._handles.pop(key, None)]
+            self._handles[key] = handle
+            while len(self._handles) > self.size:
+                stale.append(self._handles.popitem(last=False)[1])
+            idle = self._evict(stale)
+        for z in idle:
+            z.close()
+        return handle
+
+    def _release(self, handle: _Handle) -> None:
+        with self._lock:
+            handle.users -= 1
+            close = handle.evicted and handle.users == 0
+        if close:
+            handle.zip.close()
+
+    @staticmethod
+    def _evict(handles) -> list[zipfile.ZipFile]:
+        # Marks handles as evicted; returns those nobody is using (to close). Call with the lock held.
+        idle = []
+        for handle in handles:
+            if handle is None:
+                continue
+            handle.evicted = True
+            if handle.users == 0:
+                idle.append(handle.zip)
+        return idle
+
+    def clear(self) -> None:
+        with self._lock:
+            idle = self._evict(list(self._handles.values()))
+            self._handles.clear()
+        for z in idle:
+            z.close()
+
+
+def stored_data_offset(path: Path | str, header_offset: int) -> int | None:
+    """Absolute offset of an entry's data, read from its local file header.
+
+    The local header's extra field can differ from the central directory's,
+    so the offset can't be derived from the listing alone.
+    """
+    with open(path, "rb") as fh:
+        fh.seek(header_offset)
+        header = fh.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size:
+        return None
+    signature, name_len, extra_len = _LOCAL_HEADER.unpack(header)
+    if signature != b"PK\x03\x04":
+        return None
+    return header_offset + _LOCAL_HEADER.size + name_len + extra_len
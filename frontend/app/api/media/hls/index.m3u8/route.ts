@@ -0,0 +1,22 @@
+import { NextResponse } from "next/server";
+
+export async function GET(req: Request) {
+  const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
+  const url = new URL(req.url);
+  const rel = url.searchParams.get("rel_path");
+  if (!rel) return NextResponse.json({ error: "rel_path required" }, { status: 400 });
+
+  // Segment URIs in the playlist are relative (segment?...), so they resolve to /api/media/hls/segment.
+  const res = await fetch(`${apiBase}/media/hls/index.m3u8?rel_path=${encodeURIComponent(rel)}`, {
+    cache: "no-store",
+    signal: req.signal,
+  });
+  const headers = new Headers({
+    "content-type": res.headers.get("content-type") || "application/vnd.apple.mpegurl",
+    // The playlist grows while the API is still packaging; the API says when it's final.
+    "cache-control": res.headers.get("cache-control") || "no-cache",
+  });
+  const retryAfter = res.headers.get("retry-after");
+  if (retryAfter) headers.set("retry-after", retryAfter);
+  return new NextResponse(await res.text(), { status: res.status, headers });
+}
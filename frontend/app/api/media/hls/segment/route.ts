@@ -0,0 +1,20 @@
+import { NextResponse } from "next/server";
+
+export async function GET(req: Request) {
+  const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
+  const url = new URL(req.url);
+  const rel = url.searchParams.get("rel_path");
+  const name = url.searchParams.get("name");
+  if (!rel || !name) return NextResponse.json({ error: "rel_path and name required" }, { status: 400 });
+
+  const res = await fetch(
+    `${apiBase}/media/hls/segment?rel_path=${encodeURIComponent(rel)}&name=${encodeURIComponent(name)}`,
+    { cache: "no-store", signal: req.signal },
+  );
+  const headers = new Headers();
+  for (const header of ["content-type", "content-length", "cache-control", "retry-after"]) {
+    const value = res.headers.get(header);
+    if (value) headers.set(header, value);
+  }
+  return new NextResponse(res.body, { status: res.status, headers });
+}
@@ -1,10 +1,12 @@
 import { NextResponse } from "next/server";
 
-export async function POST() {
+export async function POST(req: Request) {
   const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
-  const res = await fetch(`${apiBase}/media/index`, { method: "POST" });
-  const text = await res.text();
-  return new NextResponse(text, {
+  const url = new URL(req.url);
+  const qs = url.searchParams.toString();
+  const res = await fetch(`${apiBase}/media/index${qs ? "?" + qs : ""}`, { method: "POST", cache: "no-store" });
+  // Pass the SSE progress stream through instead of buffering it.
+  return new NextResponse(res.body, {
     status: res.status,
     headers: { "content-type": res.headers.get("content-type") || "application/json" },
   });
@@ -0,0 +1,18 @@
+import { NextResponse } from "next/server";
+
+export async function GET(req: Request) {
+  const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
+  const url = new URL(req.url);
+  const rel = url.searchParams.get("rel_path") || "";
+  const format = url.searchParams.get("format") || "vtt";
+  // Cue URLs in the VTT are relative (preview/sprite?...), so they resolve to /api/media/preview/sprite.
+  const res = await fetch(`${apiBase}/media/preview?rel_path=${encodeURIComponent(rel)}&format=${encodeURIComponent(format)}`, { cache: "no-store" });
+  const text = await res.text();
+  return new NextResponse(text, {
+    status: res.status,
+    headers: {
+      "content-type": res.headers.get("content-type") || "text/vtt",
+      "cache-control": "public, max-age=300",
+    },
+  });
+}
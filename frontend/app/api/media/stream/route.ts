@@ -1,5 +1,16 @@
 import { NextRequest, NextResponse } from "next/server";
 
+// Forwarded both ways so seeks fetch only the requested bytes and revalidation can 304.
+const FORWARD_REQUEST_HEADERS = ["range", "if-range", "if-none-match", "if-modified-since"];
+const FORWARD_RESPONSE_HEADERS = [
+  "content-type",
+  "content-length",
+  "content-range",
+  "accept-ranges",
+  "etag",
+  "last-modified",
+];
+
 export async function GET(req: NextRequest) {
   const url = new URL(req.url);
   const rel_path = url.searchParams.get("rel_path");
@@ -13,29 +24,28 @@ export async function GET(req: NextRequest) {
     process.env.API_INTERNAL_BASE || "http://api:8000"
   );
 
+  const upstreamHeaders = new Headers();
+  for (const name of FORWARD_REQUEST_HEADERS) {
+    const value = req.headers.get(name);
+    if (value) upstreamHeaders.set(name, value);
+  }
+
   const res = await fetch(apiUrl.toString(), {
-    headers: {
-      Range: req.headers.get("range") || "",
-    },
+    headers: upstreamHeaders,
+    cache: "no-store",
+    // Abort the upstream read when the player drops the request (e.g. on seek).
+    signal: req.signal,
   });
 
   const headers = new Headers();
-  if (res.headers.get("content-type")) {
-    headers.set("content-type", res.headers.get("content-type")!);
-  }
-  if (res.headers.get("content-length")) {
-    headers.set("content-length", res.headers.get("content-length")!);
-  }
-  if (res.headers.get("content-range")) {
-    headers.set("content-range", res.headers.get("content-range")!);
-  }
-  if (res.headers.get("accept-ranges")) {
-    headers.set("accept-ranges", res.headers.get("accept-ranges")!);
+  for (const name of FORWARD_RESPONSE_HEADERS) {
+    const value = res.headers.get(name);
+    if (value) headers.set(name, value);
   }
 
   headers.set("Cache-Control", "public, max-age=3600");
 
-  return new NextResponse(res.body, {
+  return new NextResponse(res.status === 304 ? null : res.body, {
     status: res.status,
     headers,
   });
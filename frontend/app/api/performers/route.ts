@@ -1,8 +1,10 @@
 import { NextResponse } from "next/server";
 
-export async function GET() {
+export async function GET(req: Request) {
   const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
-  const res = await fetch(`${apiBase}/performers`, { cache: "no-store" });
+  const url = new URL(req.url);
+  const qs = url.searchParams.toString();
+  const res = await fetch(`${apiBase}/performers${qs ? "?" + qs : ""}`, { cache: "no-store" });
   const text = await res.text();
   return new NextResponse(text, {
     status: res.status,
@@ -0,0 +1,14 @@
+import { NextResponse } from "next/server";
+
+export async function GET(_req: Request, ctx: { params: { name: string } }) {
+  const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
+  const res = await fetch(`${apiBase}/sprites/${encodeURIComponent(ctx.params.name)}`, { cache: "no-store" });
+  return new NextResponse(res.body, {
+    status: res.status,
+    headers: {
+      "content-type": res.headers.get("content-type") || "image/jpeg",
+      // Sprite names are content hashes, so they never change.
+      "cache-control": res.ok ? "public, max-age=31536000, immutable" : "no-store",
+    },
+  });
+}
@@ -0,0 +1,15 @@
+import { NextResponse } from "next/server";
+
+export async function POST(req: Request) {
+  const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
+  const res = await fetch(`${apiBase}/sprites`, {
+    method: "POST",
+    headers: { "content-type": "application/json" },
+    body: await req.text(),
+  });
+  const text = await res.text();
+  return new NextResponse(text, {
+    status: res.status,
+    headers: { "content-type": res.headers.get("content-type") || "application/json" },
+  });
+}
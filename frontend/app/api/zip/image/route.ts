@@ -1,18 +1,43 @@
 import { NextResponse } from "next/server";
 
+const FORWARD_REQUEST_HEADERS = ["range", "if-range", "if-none-match"];
+const FORWARD_RESPONSE_HEADERS = [
+  "content-type",
+  "content-length",
+  "content-range",
+  "accept-ranges",
+  "etag",
+  "last-modified",
+];
+
 export async function GET(req: Request) {
   const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
   const url = new URL(req.url);
   const rel_path = url.searchParams.get("rel_path");
   const entry = url.searchParams.get("entry");
   if (!rel_path || !entry) return NextResponse.json({ error: "rel_path and entry required" }, { status: 400 });
-  const res = await fetch(`${apiBase}/zip/image?rel_path=${encodeURIComponent(rel_path)}&entry=${encodeURIComponent(entry)}`, { cache: "no-store" });
-  const buf = await res.arrayBuffer();
-  return new NextResponse(buf, {
+
+  const upstreamHeaders = new Headers();
+  for (const name of FORWARD_REQUEST_HEADERS) {
+    const value = req.headers.get(name);
+    if (value) upstreamHeaders.set(name, value);
+  }
+  const res = await fetch(`${apiBase}/zip/image?rel_path=${encodeURIComponent(rel_path)}&entry=${encodeURIComponent(entry)}`, {
+    cache: "no-store",
+    headers: upstreamHeaders,
+  });
+
+  const headers = new Headers();
+  for (const name of FORWARD_RESPONSE_HEADERS) {
+    const value = res.headers.get(name);
+    if (value) headers.set(name, value);
+  }
+  if (!headers.has("content-type")) headers.set("content-type", "application/octet-stream");
+  headers.set("cache-control", "public, max-age=60");
+
+  // Stream the body through rather than buffering whole images.
+  return new NextResponse(res.status === 304 ? null : res.body, {
     status: res.status,
-    headers: {
-      "content-type": res.headers.get("content-type") || "application/octet-stream",
-      "cache-control": "public, max-age=60",
-    },
+    headers,
   });
 }
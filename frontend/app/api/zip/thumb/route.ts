@@ -1,5 +1,9 @@
 import { NextResponse } from "next/server";
 
+// Accept picks the format (AVIF/WebP/JPEG); the validators let the browser revalidate with a 304.
+const FORWARD_REQUEST_HEADERS = ["accept", "if-none-match"];
+const FORWARD_RESPONSE_HEADERS = ["content-type", "content-length", "etag", "vary", "cache-control"];
+
 export async function GET(req: Request) {
   const apiBase = process.env.API_INTERNAL_BASE || "http://api:8000";
   const url = new URL(req.url);
@@ -7,13 +11,23 @@ export async function GET(req: Request) {
   const entry = url.searchParams.get("entry");
   const size = url.searchParams.get("size") || "360";
   if (!rel_path || !entry) return NextResponse.json({ error: "rel_path and entry required" }, { status: 400 });
-  const res = await fetch(`${apiBase}/zip/thumb?rel_path=${encodeURIComponent(rel_path)}&entry=${encodeURIComponent(entry)}&size=${encodeURIComponent(size)}`, { cache: "no-store" });
-  const buf = await res.arrayBuffer();
-  return new NextResponse(buf, {
-    status: res.status,
-    headers: {
-      "content-type": res.headers.get("content-type") || "image/jpeg",
-      "cache-control": "public, max-age=300",
-    },
+
+  const upstreamHeaders = new Headers();
+  for (const name of FORWARD_REQUEST_HEADERS) {
+    const value = req.headers.get(name);
+    if (value) upstreamHeaders.set(name, value);
+  }
+  const res = await fetch(`${apiBase}/zip/thumb?rel_path=${encodeURIComponent(rel_path)}&entry=${encodeURIComponent(entry)}&size=${encodeURIComponent(size)}`, {
+    cache: "no-store",
+    headers: upstreamHeaders,
   });
+
+  const headers = new Headers();
+  for (const name of FORWARD_RESPONSE_HEADERS) {
+    const value = res.headers.get(name);
+    if (value) headers.set(name, value);
+  }
+  if (!headers.has("content-type")) headers.set("content-type", "image/jpeg");
+  if (!headers.has("cache-control")) headers.set("cache-control", "public, max-age=300");
+  return new NextResponse(res.status === 304 ? null : res.body, { status: res.status, headers });
 }
@@ -1,9 +1,26 @@
 'use client';
 
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useState, type CSSProperties } from "react";
 import { useRouter, useSearchParams } from "next/navigation";
 
 type MediaItem = { rel_path: string; kind: string; ext?: string | null; size?: number; mtime?: number };
+type SpriteTile = { url: string; x: number; y: number; width: number; height: number; tile: number };
+
+// Entry thumbnails are loaded as sprite sheets of this many tiles (one request per page).
+const SPRITE_PAGE = 100;
+const SPRITE_TILE_SIZE = 240;
+
+function spriteStyle(t: SpriteTile): CSSProperties {
+  // Scale the sheet so one tile fills the (square) box, then move to the tile.
+  const px = t.width > t.tile ? (t.x / (t.width - t.tile)) * 100 : 0;
+  const py = t.height > t.tile ? (t.y / (t.height - t.tile)) * 100 : 0;
+  return {
+    backgroundImage: `url(${t.url})`,
+    backgroundSize: `${(t.width / t.tile) * 100}% ${(t.height / t.tile) * 100}%`,
+    backgroundPosition: `${px}% ${py}%`,
+    backgroundRepeat: "no-repeat",
+  };
+}
 
 function basename(p: string) {
   const parts = p.split("/").filter(Boolean);
@@ -20,6 +37,8 @@ export default function GalleriesClient() {
   const [loadingEntries, setLoadingEntries] = useState(false);
   const [err, setErr] = useState<string>("");
   const [thumbErrors, setThumbErrors] = useState<Record<string, boolean>>({});
+  // entry -> sprite tile; null = not in a sprite (use the single thumb); missing = still loading
+  const [spriteTiles, setSpriteTiles] = useState<Record<string, SpriteTile | null>>({});
 
   const [open, setOpen] = useState(false);
   const [openSrc, setOpenSrc] = useState("");
@@ -73,7 +92,7 @@ export default function GalleriesClient() {
     (async () => {
       setErr("");
       try {
-        const res = await fetch(`/api/media/items?limit=-1`, { cache: "no-store" });
+        const res = await fetch(`/api/media/items?limit=-1&kind=zip`, { cache: "no-store" });
         const j = await res.json();
         const all = Array.isArray(j) ? j : j?.items || [];
         setItems(all);
@@ -139,6 +158,41 @@ export default function GalleriesClient() {
     return () => controller.abort();
   }, [selected]);
 
+  // Load entry thumbnails as sprite sheets, one page at a time.
+  useEffect(() => {
+    setSpriteTiles({});
+    if (!selected || entries.length === 0) return;
+    const controller = new AbortController();
+
+    (async () => {
+      for (let offset = 0; offset < entries.length; offset += SPRITE_PAGE) {
+        const page = entries.slice(offset, offset + SPRITE_PAGE);
+        const next: Record<string, SpriteTile | null> = Object.fromEntries(page.map((e) => [e, null]));
+        try {
+          const res = await fetch(`/api/sprites`, {
+            method: "POST",
+            headers: { "content-type": "application/json" },
+            body: JSON.stringify({ rel_path: selected, entries: page, size: SPRITE_TILE_SIZE }),
+            signal: controller.signal,
+          });
+          if (res.ok) {
+            const j = await res.json();
+            for (const t of j?.url ? j.tiles || [] : []) {
+              if (t.x == null || t.y == null) continue;
+              next[t.entry] = { url: `/api${j.url}`, x: t.x, y: t.y, width: j.width, height: j.height, tile: j.tile_size };
+            }
+          }
+        } catch {
+          if (controller.signal.aborted) return;
+        }
+        if (controller.signal.aborted) return;
+        setSpriteTiles((prev) => ({ ...prev, ...next }));
+      }
+    })();
+
+    return () => controller.abort();
+  }, [selected, entries]);
+
   function selectGallery(relPath: string) {
     // Update state immediately for responsiveness
     setSelected(relPath);
@@ -308,12 +362,18 @@ export default function GalleriesClient() {
                     e.currentTarget.style.boxShadow = "0 2px 8px rgba(0,0,0,0.08)";
                   }}
                 >
-                  <img
-                    src={`/api/zip/thumb?rel_path=${encodeURIComponent(selected)}&entry=${encodeURIComponent(entry)}&size=360`}
-                    alt={entry}
-                    style={{ width: "100%", height: 200, objectFit: "cover", display: "block" }}
-                    loading="lazy"
-                  />
+                  {spriteTiles[entry] ? (
+                    <div role="img" aria-label={entry} style={{ width: "100%", aspectRatio: "1 / 1", ...spriteStyle(spriteTiles[entry]!) }} />
+                  ) : spriteTiles[entry] === null ? (
+                    <img
+                      src={`/api/zip/thumb?rel_path=${encodeURIComponent(selected)}&entry=${encodeURIComponent(entry)}&size=360`}
+                      alt={entry}
+                      style={{ width: "100%", aspectRatio: "1 / 1", objectFit: "cover", display: "block" }}
+                      loading="lazy"
+                    />
+                  ) : (
+                    <div style={{ width: "100%", aspectRatio: "1 / 1", background: "linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%)" }} />
+                  )}
                 </button>
               ))}
             </div>
@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useMemo, useRef, useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 import PerformerCard from "../components/PerformerCard";
 
 type Performer = any;
@@ -16,15 +16,23 @@ const PAGE_SIZES: Array<{ label: string; value: number }> = [
 ];
 
 export default function Page() {
+  // The current page of performers (search, filters and paging run server-side)
   const [performers, setPerformers] = useState<Performer[]>([]);
-  const [mediaItems, setMediaItems] = useState<any[]>([]);
+  const [total, setTotal] = useState<number>(0);
+  // Sidebar tag counts per column (value -> performers), from /performers/facets
+  const [facets, setFacets] = useState<Record<string, Record<string, number>>>({});
   const [err, setErr] = useState<string>("");
   const [apiStatus, setApiStatus] = useState<string>("checking...");
   const [q, setQ] = useState<string>("");
+  const [debouncedQ, setDebouncedQ] = useState<string>("");
   const [fieldFilter, setFieldFilter] = useState<{ key: string; value: string } | null>(null);
   const [mediaKindFilter, setMediaKindFilter] = useState<"video" | "image" | "zip" | null>(null);
   const [pageSize, setPageSize] = useState<number>(25);
   const [page, setPage] = useState<number>(1);
+  // Keyset cursors: cursors[i] fetches page i + 1 (null = first page)
+  const [cursors, setCursors] = useState<Array<string | null>>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [reloadKey, setReloadKey] = useState<number>(0);
   const [newName, setNewName] = useState<string>("");
   const [newAliases, setNewAliases] = useState<string>("");
   const [busy, setBusy] = useState<boolean>(false);
@@ -33,9 +41,6 @@ export default function Page() {
   const appName = process.env.NEXT_PUBLIC_APP_NAME || "indexxxer";
   const appVersion = process.env.NEXT_PUBLIC_APP_VERSION || "0.0.0";
 
-  // background thumbnail preloading bookkeeping
-  const preloadAbortRef = useRef<{ aborted: boolean }>({ aborted: false });
-
   useEffect(() => {
     (async () => {
       // Health
@@ -49,31 +54,6 @@ export default function Page() {
       } catch (e: any) {
         setApiStatus(`failed: ${e?.message || e}`);
       }
-
-      // Performers
-      setErr("");
-      try {
-        const res = await fetch(`/api/performers`, { cache: "no-store" });
-        if (!res.ok) {
-          const t = await res.text().catch(() => "");
-          setErr(`API error: ${res.status} ${t ? "- " + t : ""}`);
-          return;
-        }
-        const data = await res.json();
-        setPerformers(Array.isArray(data) ? data : []);
-
-        // Media items (for galleries list)
-        try {
-          const mres = await fetch(`/api/media/items?limit=-1`, { cache: "no-store" });
-          const mj = await mres.json();
-          const all = Array.isArray(mj) ? mj : mj?.items || [];
-          setMediaItems(all);
-        } catch {
-          setMediaItems([]);
-        }
-      } catch (e: any) {
-        setErr(`Fetch failed: ${e?.message || e}`);
-      }
     })();
   }, []);
 
@@ -94,12 +74,76 @@ export default function Page() {
     }
   }, []);
 
+  // Search as you type, without a request per keystroke
+  useEffect(() => {
+    const t = setTimeout(() => setDebouncedQ(q.trim()), 200);
+    return () => clearTimeout(t);
+  }, [q]);
+
+  // Back to page 1 whenever filters or pageSize change
+  useEffect(() => {
+    setPage(1);
+    setCursors([null]);
+  }, [debouncedQ, fieldFilter, mediaKindFilter, pageSize]);
+
+  const cursor = cursors[page - 1] ?? null;
 
-  const galleries = useMemo(() => {
-    return (mediaItems || []).filter((x: any) => x.kind === "zip").sort((a: any, b: any) => String(a.rel_path).localeCompare(String(b.rel_path)));
-  }, [mediaItems]);
+  // Search/filter parameters shared by the performer list and the sidebar facets
+  const filterQuery = useMemo(() => {
+    const params = new URLSearchParams();
+    if (debouncedQ) params.set("q", debouncedQ);
+    if (fieldFilter) params.set(fieldFilter.key, fieldFilter.value);
+    if (mediaKindFilter) params.set("has", mediaKindFilter);
+    return params.toString();
+  }, [debouncedQ, fieldFilter, mediaKindFilter]);
+
+  useEffect(() => {
+    const ctrl = new AbortController();
+    (async () => {
+      setErr("");
+      const params = new URLSearchParams(filterQuery);
+      params.set("limit", String(pageSize));
+      params.set("count", "exact");
+      if (cursor && pageSize !== -1) params.set("cursor", cursor);
+      try {
+        const res = await fetch(`/api/performers?${params.toString()}`, { cache: "no-store", signal: ctrl.signal });
+        if (!res.ok) {
+          const t = await res.text().catch(() => "");
+          setErr(`API error: ${res.status} ${t ? "- " + t : ""}`);
+          return;
+        }
+        const data = await res.json();
+        if (Array.isArray(data)) {
+          setPerformers(data);
+          setTotal(data.length);
+          setNextCursor(null);
+        } else {
+          setPerformers(data?.items || []);
+          setTotal(data?.total ?? 0);
+          setNextCursor(data?.next_cursor ?? null);
+        }
+      } catch (e: any) {
+        if (e?.name !== "AbortError") setErr(`Fetch failed: ${e?.message || e}`);
+      }
+    })();
+    return () => ctrl.abort();
+  }, [filterQuery, pageSize, cursor, reloadKey]);
+
+  useEffect(() => {
+    const ctrl = new AbortController();
+    (async () => {
+      try {
+        const res = await fetch(`/api/performers/facets?${filterQuery}`, { cache: "no-store", signal: ctrl.signal });
+        if (!res.ok) return;
+        const data = await res.json();
+        setFacets(data?.facets || {});
+      } catch {
+        // sidebar only; keep the previous counts
+      }
+    })();
+    return () => ctrl.abort();
+  }, [filterQuery, reloadKey]);
 
-  
   const tagCloud = useMemo(() => {
     const fields: Array<[string, keyof Performer]> = [
       ["Hair", "hair_color"],
@@ -112,12 +156,11 @@ export default function Page() {
     const buckets: Record<string, Record<string, number>> = {};
     for (const [label] of fields) buckets[label] = {};
 
-    for (const p of performers || []) {
-      for (const [label, key] of fields) {
-        const raw = (p as any)[key];
-        const v = String(raw ?? "").trim();
+    for (const [label, key] of fields) {
+      for (const [raw, c] of Object.entries(facets[key as string] || {})) {
+        const v = raw.trim();
         if (!v || v === "Unknown") continue;
-        buckets[label][v] = (buckets[label][v] || 0) + 1;
+        buckets[label][v] = (buckets[label][v] || 0) + c;
       }
     }
 
@@ -137,82 +180,16 @@ export default function Page() {
         }),
       };
     });
-  }, [performers]);
-const filtered = useMemo(() => {
-    const qq = q.trim().toLowerCase();
-    return performers.filter((p) => {
-      if (fieldFilter) {
-        const pv = (p as any)?.[fieldFilter.key];
-        const s = pv === null || pv === undefined ? "" : String(pv);
-        if (s.trim() !== fieldFilter.value) return false;
-      }
-      if (mediaKindFilter === "video" && !((p as any)?.video_count > 0)) return false;
-      if (mediaKindFilter === "image" && !((p as any)?.image_count > 0)) return false;
-      if (mediaKindFilter === "zip" && !((p as any)?.gallery_count > 0)) return false;
-      if (!qq) return true;
-      const name = String(p?.name || "").toLowerCase();
-      const aliases = String(p?.aliases || "").toLowerCase();
-      return name.includes(qq) || aliases.includes(qq);
-    });
-  }, [performers, q, fieldFilter, mediaKindFilter]);
-
-  // Reset to page 1 whenever filters or pageSize change
-  useEffect(() => {
-    setPage(1);
-  }, [q, fieldFilter, mediaKindFilter, pageSize]);
-
-  const total = filtered.length;
-  const effectivePageSize = pageSize === -1 ? total || 1 : pageSize;
-  const totalPages = pageSize === -1 ? 1 : Math.max(1, Math.ceil(total / effectivePageSize));
-  const safePage = Math.min(Math.max(1, page), totalPages);
-
+  }, [facets]);
 
-  const paged = useMemo(() => {
-    if (pageSize === -1) return filtered;
-    const start = (safePage - 1) * effectivePageSize;
-    return filtered.slice(start, start + effectivePageSize);
-  }, [filtered, pageSize, safePage, effectivePageSize]);
+  const totalPages = pageSize === -1 ? 1 : Math.max(1, Math.ceil(total / pageSize));
+  const hasNext = pageSize !== -1 && !!nextCursor;
 
-  // Background preload thumbnails for ALL filtered performers (not just those displayed)
-  useEffect(() => {
-    preloadAbortRef.current.aborted = true;
-    const token = { aborted: false };
-    preloadAbortRef.current = token;
-
-    const list = filtered.map((p) => p?.id).filter((x) => typeof x === "number" || typeof x === "string");
-    if (!list.length) return;
-
-    let i = 0;
-    const chunk = 24; // small chunks to keep UI snappy
-
-    const run = () => {
-      if (token.aborted) return;
-
-      const end = Math.min(i + chunk, list.length);
-      for (; i < end; i++) {
-        const id = list[i];
-        // preload thumb into browser cache
-        const img = new Image();
-        img.src = `/api/performers/${id}/thumb?size=480`;
-      }
-
-      if (i < list.length) {
-        // schedule next chunk when browser is idle-ish
-        if (typeof (window as any).requestIdleCallback === "function") {
-          (window as any).requestIdleCallback(run, { timeout: 1000 });
-        } else {
-          setTimeout(run, 50);
-        }
-      }
-    };
-
-    // start after first paint
-    setTimeout(run, 0);
-
-    return () => {
-      token.aborted = true;
-    };
-  }, [filtered]);
+  const goNext = () => {
+    if (!nextCursor) return;
+    setCursors((prev) => [...prev.slice(0, page), nextCursor]);
+    setPage((p) => p + 1);
+  };
 
   const setKindFilter = (kind: "video" | "image" | "zip" | null) => {
     setMediaKindFilter(kind);
@@ -381,8 +358,7 @@ const filtered = useMemo(() => {
                       setSaveMsg(text || `Failed to add performer (${res.status})`);
                       return;
                     }
-                    const created = JSON.parse(text);
-                    setPerformers((prev) => [...prev, created].sort((a, b) => String(a.name).localeCompare(String(b.name))));
+                    setReloadKey((k) => k + 1);
                     setNewName("");
                     setNewAliases("");
                     setSaveMsg("Saved");
@@ -567,7 +543,7 @@ const filtered = useMemo(() => {
             </div>
 
             <div style={{ fontSize: 12, opacity: 0.7 }}>
-              Showing <b>{paged.length}</b> of <b>{total}</b>
+              Showing <b>{performers.length}</b> of <b>{total}</b>
             </div>
           </div>
 
@@ -576,29 +552,29 @@ const filtered = useMemo(() => {
             <div style={{ marginTop: 12, display: "flex", gap: 10, alignItems: "center", flexWrap: "wrap" }}>
               <button
                 onClick={() => setPage((p) => Math.max(1, p - 1))}
-                disabled={safePage <= 1}
+                disabled={page <= 1}
                 style={{
                   padding: "8px 10px",
                   borderRadius: 12,
                   border: "1px solid rgba(0,0,0,0.15)",
-                  background: safePage <= 1 ? "rgba(0,0,0,0.04)" : "white",
-                  cursor: safePage <= 1 ? "not-allowed" : "pointer",
+                  background: page <= 1 ? "rgba(0,0,0,0.04)" : "white",
+                  cursor: page <= 1 ? "not-allowed" : "pointer",
                 }}
               >
                 ← Prev
               </button>
               <div style={{ fontSize: 12, opacity: 0.75 }}>
-                Page <b>{safePage}</b> of <b>{totalPages}</b>
+                Page <b>{page}</b> of <b>{totalPages}</b>
               </div>
               <button
-                onClick={() => setPage((p) => Math.min(totalPages, p + 1))}
-                disabled={safePage >= totalPages}
+                onClick={goNext}
+                disabled={!hasNext}
                 style={{
                   padding: "8px 10px",
                   borderRadius: 12,
                   border: "1px solid rgba(0,0,0,0.15)",
-                  background: safePage >= totalPages ? "rgba(0,0,0,0.04)" : "white",
-                  cursor: safePage >= totalPages ? "not-allowed" : "pointer",
+                  background: !hasNext ? "rgba(0,0,0,0.04)" : "white",
+                  cursor: !hasNext ? "not-allowed" : "pointer",
                 }}
               >
                 Next →
@@ -614,7 +590,7 @@ const filtered = useMemo(() => {
               gap: 16,
             }}
           >
-            {paged.map((p) => (
+            {performers.map((p) => (
               <PerformerCard
                 key={p.id}
                 p={p}
@@ -628,6 +604,7 @@ const filtered = useMemo(() => {
                       return;
                     }
                     setPerformers((prev) => prev.filter((x) => x.id !== id));
+                    setReloadKey((k) => k + 1);
                   } catch (e: any) {
                     alert(e?.message || String(e));
                   }
@@ -635,10 +612,6 @@ const filtered = useMemo(() => {
               />
             ))}
           </div>
-
-          <div style={{ marginTop: 12, fontSize: 12, opacity: 0.6 }}>
-            Background loading: thumbnails are preloaded for all matching performers, even if they are on other pages.
-          </div>
         </section>
       </div>
       <style jsx global>{`
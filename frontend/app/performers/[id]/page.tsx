@@ -3,6 +3,7 @@
 import React, { useEffect, useMemo, useState } from "react";
 import { useRouter } from "next/navigation";
 import PerformerCard from "../../../components/PerformerCard";
+import VideoPlayer from "../../../components/VideoPlayer";
 
 type MediaItem = {
   id: number;
@@ -418,10 +419,8 @@ export default function PerformerDetail({ params }: { params: { id: string } })
                 >
                   ✕
                 </button>
-                <video
-                  src={`/api/media/stream?rel_path=${encodeURIComponent(playing)}`}
-                  controls
-                  autoPlay
+                <VideoPlayer
+                  relPath={playing}
                   style={{
                     maxWidth: "90vw",
                     maxHeight: "90vh",
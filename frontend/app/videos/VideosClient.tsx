@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useRef, useState, type CSSProperties } from "react";
 
 interface MediaItem {
   id: number;
@@ -10,6 +10,47 @@ interface MediaItem {
   mtime?: number | null;
 }
 
+type SpriteTile = { url: string; x: number; y: number; width: number; height: number; tile: number };
+
+// One sprite sheet of thumbnails per page, so a page can't exceed the API's
+// tiles-per-sprite limit (SPRITE_MAX_TILES).
+const PAGE_SIZE = 100;
+const FIELDS = "id,rel_path,kind,size,mtime";
+const SPRITE_TILE_SIZE = 320;
+
+function spriteStyle(t: SpriteTile): CSSProperties {
+  // Scale the sheet so one tile fills the (square) box, then move to the tile.
+  const px = t.width > t.tile ? (t.x / (t.width - t.tile)) * 100 : 0;
+  const py = t.height > t.tile ? (t.y / (t.height - t.tile)) * 100 : 0;
+  return {
+    backgroundImage: `url(${t.url})`,
+    backgroundSize: `${(t.width / t.tile) * 100}% ${(t.height / t.tile) * 100}%`,
+    backgroundPosition: `${px}% ${py}%`,
+    backgroundRepeat: "no-repeat",
+  };
+}
+
+async function loadSprite(ids: number[]): Promise<Record<number, SpriteTile | null>> {
+  const tiles: Record<number, SpriteTile | null> = Object.fromEntries(ids.map((id) => [id, null]));
+  try {
+    const res = await fetch(`/api/sprites`, {
+      method: "POST",
+      headers: { "content-type": "application/json" },
+      body: JSON.stringify({ media_ids: ids, size: SPRITE_TILE_SIZE }),
+    });
+    if (res.ok) {
+      const j = await res.json();
+      for (const t of j?.url ? j.tiles || [] : []) {
+        if (t.x == null || t.y == null) continue;
+        tiles[t.id] = { url: `/api${j.url}`, x: t.x, y: t.y, width: j.width, height: j.height, tile: j.tile_size };
+      }
+    }
+  } catch {
+    // every tile falls back to its single thumb
+  }
+  return tiles;
+}
+
 function formatSize(bytes?: number | null) {
   if (!bytes) return "";
   const units = ["B", "KB", "MB", "GB", "TB"];
@@ -27,35 +68,86 @@ export default function VideosClient() {
   const [err, setErr] = useState<string>("");
   const [loading, setLoading] = useState<boolean>(true);
   const [q, setQ] = useState<string>("");
+  // Path search, sent to the API; paging restarts whenever it changes
+  const [search, setSearch] = useState<string>("");
+  const [total, setTotal] = useState<number | null>(null);
+  // video id -> sprite tile; null = not in a sprite (use the single thumb); missing = still loading
+  const [spriteTiles, setSpriteTiles] = useState<Record<number, SpriteTile | null>>({});
+  // undefined: first page not fetched yet; null: no more pages
+  const cursorRef = useRef<string | null | undefined>(undefined);
+  // The search the loaded pages (and cursorRef) belong to
+  const loadedForRef = useRef<string | null>(null);
+  const loadingRef = useRef(false);
+  const sentinelRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
-    let cancelled = false;
-    setErr("");
+    const t = setTimeout(() => setSearch(q.trim()), 250);
+    return () => clearTimeout(t);
+  }, [q]);
+
+  // Keyset pages from the API instead of the whole library in one response.
+  const loadMore = useCallback(async () => {
+    if (loadingRef.current) return;
+    const fresh = loadedForRef.current !== search;
+    const cursor = fresh ? undefined : cursorRef.current;
+    if (cursor === null) return;
+    loadingRef.current = true;
     setLoading(true);
+    setErr("");
+    try {
+      const params = new URLSearchParams({ kind: "video", limit: String(PAGE_SIZE), fields: FIELDS });
+      if (search) params.set("q", search);
+      if (cursor) params.set("cursor", cursor);
+      else params.set("count", "estimate");
+      const res = await fetch(`/api/media/items?${params}`, { cache: "no-store" });
+      if (!res.ok) throw new Error(await res.text());
+      const data = await res.json();
+      const items: MediaItem[] = data?.items || [];
+      setVideos((prev) => (fresh ? items : [...prev, ...items]));
+      if (fresh) setSpriteTiles({});
+      if (items.length) loadSprite(items.map((m) => m.id)).then((tiles) => setSpriteTiles((prev) => ({ ...prev, ...tiles })));
+      if (typeof data?.total === "number") setTotal(data.total);
+      loadedForRef.current = search;
+      cursorRef.current = data?.next_cursor ?? null;
+    } catch (e: any) {
+      setErr(e?.message || String(e));
+    } finally {
+      loadingRef.current = false;
+      setLoading(false);
+    }
+  }, [search]);
 
-    (async () => {
-      try {
-        const res = await fetch(`/api/media/items?limit=-1&kind=video`, { cache: "no-store" });
-        if (!res.ok) throw new Error(await res.text());
-        const data = await res.json();
-        if (!cancelled) setVideos(Array.isArray(data) ? data : data?.items || []);
-      } catch (e: any) {
-        if (!cancelled) setErr(e?.message || String(e));
-      } finally {
-        if (!cancelled) setLoading(false);
+  // First page, again whenever the search changes (once a page still loading
+  // for the previous search is done).
+  useEffect(() => {
+    let cancelled = false;
+    const start = () => {
+      if (cancelled) return;
+      if (loadingRef.current) {
+        setTimeout(start, 50);
+        return;
       }
-    })();
-
+      loadMore();
+    };
+    start();
     return () => {
       cancelled = true;
     };
-  }, []);
+  }, [loadMore]);
 
-  const filtered = useMemo(() => {
-    const qq = q.trim().toLowerCase();
-    if (!qq) return videos;
-    return videos.filter((v) => v.rel_path.toLowerCase().includes(qq));
-  }, [q, videos]);
+  // Fetch the next page when the end of the grid scrolls into view.
+  useEffect(() => {
+    const el = sentinelRef.current;
+    if (!el) return;
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((e) => e.isIntersecting)) loadMore();
+      },
+      { rootMargin: "800px" },
+    );
+    observer.observe(el);
+    return () => observer.disconnect();
+  }, [loadMore, videos.length]); // re-observe after each page in case the sentinel is still in view
 
   return (
     <main style={{ padding: 24, maxWidth: 1400, margin: "0 auto" }}>
@@ -93,7 +185,10 @@ export default function VideosClient() {
             outline: "none",
           }}
         />
-        <div style={{ fontSize: 12, opacity: 0.7 }}>Showing {filtered.length} of {videos.length}</div>
+        <div style={{ fontSize: 12, opacity: 0.7 }}>
+          Showing {videos.length}
+          {total !== null ? ` of ~${Math.max(total, videos.length)}` : ""}
+        </div>
       </div>
 
       {err ? (
@@ -108,7 +203,7 @@ export default function VideosClient() {
           gap: 14,
         }}
       >
-        {filtered.map((m) => (
+        {videos.map((m) => (
           <div
             key={m.id}
             style={{
@@ -121,16 +216,25 @@ export default function VideosClient() {
               flexDirection: "column",
             }}
           >
-            <div style={{ position: "relative", aspectRatio: "16 / 9", background: "linear-gradient(135deg, rgba(0,0,0,0.05), rgba(0,0,0,0.08))" }}>
-              <img
-                src={`/api/media/thumb?rel_path=${encodeURIComponent(m.rel_path)}`}
-                alt={m.rel_path}
-                style={{ width: "100%", height: "100%", objectFit: "cover" }}
-                loading="lazy"
-                onError={(e) => {
-                  (e.currentTarget as HTMLImageElement).style.display = "none";
-                }}
-              />
+            <div style={{ position: "relative", aspectRatio: "16 / 9", overflow: "hidden", background: "linear-gradient(135deg, rgba(0,0,0,0.05), rgba(0,0,0,0.08))" }}>
+              {spriteTiles[m.id] ? (
+                // Square tile, centre-cropped to the 16:9 box like objectFit: cover
+                <div
+                  role="img"
+                  aria-label={m.rel_path}
+                  style={{ position: "absolute", left: 0, top: "50%", width: "100%", aspectRatio: "1 / 1", transform: "translateY(-50%)", ...spriteStyle(spriteTiles[m.id]!) }}
+                />
+              ) : spriteTiles[m.id] === null ? (
+                <img
+                  src={`/api/media/thumb?rel_path=${encodeURIComponent(m.rel_path)}`}
+                  alt={m.rel_path}
+                  style={{ width: "100%", height: "100%", objectFit: "cover" }}
+                  loading="lazy"
+                  onError={(e) => {
+                    (e.currentTarget as HTMLImageElement).style.display = "none";
+                  }}
+                />
+              ) : null}
               <div
                 style={{
                   position: "absolute",
@@ -154,6 +258,7 @@ export default function VideosClient() {
         ))}
       </div>
 
+      <div ref={sentinelRef} />
       {loading ? <div style={{ marginTop: 12, opacity: 0.7, fontSize: 13 }}>Loading videos…</div> : null}
     </main>
   );
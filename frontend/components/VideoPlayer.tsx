@@ -0,0 +1,168 @@
+"use client";
+
+import React, { useEffect, useRef, useState } from "react";
+
+// Containers browsers play from /api/media/stream; everything else (mkv, avi,
+// wmv, mov, ...) goes through the API's on-the-fly HLS packaging.
+const DIRECT_EXTS = new Set(["mp4", "m4v", "webm"]);
+
+function needsHls(relPath: string): boolean {
+  const ext = relPath.split(".").pop()?.toLowerCase() || "";
+  return !DIRECT_EXTS.has(ext);
+}
+
+// Scrub preview layout from /api/media/preview?format=json (the same data as its VTT track).
+type Preview = {
+  sprite_url: string;
+  duration: number;
+  frames: number;
+  interval: number;
+  columns: number;
+  tile_width: number;
+  tile_height: number;
+};
+
+function formatTime(seconds: number): string {
+  const s = Math.max(0, Math.floor(seconds));
+  const h = Math.floor(s / 3600);
+  const mm = String(Math.floor((s % 3600) / 60)).padStart(h ? 2 : 1, "0");
+  return `${h ? `${h}:` : ""}${mm}:${String(s % 60).padStart(2, "0")}`;
+}
+
+export default function VideoPlayer({ relPath, style }: { relPath: string; style?: React.CSSProperties }) {
+  const ref = useRef<HTMLVideoElement>(null);
+  const barRef = useRef<HTMLDivElement>(null);
+  const [preview, setPreview] = useState<Preview | null>(null);
+  const [duration, setDuration] = useState(0);
+  const [current, setCurrent] = useState(0);
+  // Position hovered on the scrub bar (px from its left edge) and the time there
+  const [hover, setHover] = useState<{ x: number; time: number } | null>(null);
+
+  useEffect(() => {
+    setPreview(null);
+    setHover(null);
+    const controller = new AbortController();
+    fetch(`/api/media/preview?rel_path=${encodeURIComponent(relPath)}&format=json`, { signal: controller.signal })
+      .then((res) => (res.ok ? res.json() : null))
+      .then((j) => setPreview(j?.frames ? j : null))
+      .catch(() => {});
+    return () => controller.abort();
+  }, [relPath]);
+
+  useEffect(() => {
+    const video = ref.current;
+    if (!video) return;
+    const q = encodeURIComponent(relPath);
+    const direct = `/api/media/stream?rel_path=${q}`;
+    const playlist = `/api/media/hls/index.m3u8?rel_path=${q}`;
+
+    if (!needsHls(relPath)) {
+      video.src = direct;
+      return;
+    }
+    if (video.canPlayType("application/vnd.apple.mpegurl")) {
+      // Native HLS (Safari). The playlist grows while packaging; start at the beginning, not the live edge.
+      video.src = playlist;
+      const rewind = () => (video.currentTime = 0);
+      video.addEventListener("loadedmetadata", rewind, { once: true });
+      return () => video.removeEventListener("loadedmetadata", rewind);
+    }
+
+    let cancelled = false;
+    let hls: { destroy(): void } | null = null;
+    import("hls.js")
+      .then(({ default: Hls }) => {
+        if (cancelled) return;
+        if (!Hls.isSupported()) {
+          video.src = direct;
+          return;
+        }
+        const player = new Hls({ startPosition: 0 });
+        player.loadSource(playlist);
+        player.attachMedia(video);
+        hls = player;
+      })
+      .catch(() => {
+        if (!cancelled) video.src = direct;
+      });
+    return () => {
+      cancelled = true;
+      hls?.destroy();
+    };
+  }, [relPath]);
+
+  // An HLS playlist still being packaged reports a growing (or infinite) duration.
+  const total = Number.isFinite(duration) && duration > 0 ? duration : preview?.duration || 0;
+
+  function timeAt(clientX: number): { x: number; time: number } | null {
+    const bar = barRef.current;
+    if (!bar || !total) return null;
+    const rect = bar.getBoundingClientRect();
+    const x = Math.min(Math.max(clientX - rect.left, 0), rect.width);
+    return { x, time: (x / rect.width) * total };
+  }
+
+  function hoverTile() {
+    if (!preview || !hover) return null;
+    const { tile_width: w, tile_height: h, columns } = preview;
+    const i = Math.min(preview.frames - 1, Math.floor(hover.time / preview.interval));
+    const barWidth = barRef.current?.clientWidth || w;
+    return (
+      <div
+        style={{
+          position: "absolute",
+          bottom: "100%",
+          left: Math.min(Math.max(hover.x - w / 2, 0), Math.max(barWidth - w, 0)),
+          marginBottom: 6,
+          pointerEvents: "none",
+          textAlign: "center",
+          color: "white",
+          fontSize: 12,
+          textShadow: "0 1px 4px rgba(0,0,0,0.8)",
+        }}
+      >
+        <div
+          style={{
+            width: w,
+            height: h,
+            // sprite_url is relative to the preview endpoint, like the VTT cues
+            backgroundImage: `url(/api/media/${preview.sprite_url})`,
+            backgroundPosition: `-${(i % columns) * w}px -${Math.floor(i / columns) * h}px`,
+            borderRadius: 6,
+            boxShadow: "0 4px 16px rgba(0,0,0,0.5)",
+          }}
+        />
+        {formatTime(hover.time)}
+      </div>
+    );
+  }
+
+  return (
+    <div style={{ display: "flex", flexDirection: "column" }}>
+      <video
+        ref={ref}
+        controls
+        autoPlay
+        style={style}
+        onDurationChange={(e) => setDuration(e.currentTarget.duration)}
+        onTimeUpdate={(e) => setCurrent(e.currentTarget.currentTime)}
+      />
+      {preview ? (
+        // Scrub bar with thumbnail previews; the native seek bar can't show them.
+        <div
+          ref={barRef}
+          onMouseMove={(e) => setHover(timeAt(e.clientX))}
+          onMouseLeave={() => setHover(null)}
+          onClick={(e) => {
+            const at = timeAt(e.clientX);
+            if (at && ref.current) ref.current.currentTime = at.time;
+          }}
+          style={{ position: "relative", height: 12, background: "rgba(255,255,255,0.15)", cursor: "pointer" }}
+        >
+          <div style={{ width: `${total ? Math.min(100, (current / total) * 100) : 0}%`, height: "100%", background: "#667eea" }} />
+          {hoverTile()}
+        </div>
+      ) : null}
+    </div>
+  );
+}